@@ -69,15 +69,17 @@ from .analysis.coincidences import Coincidences, CoincidencesESD
 from .analysis.find_mpv import FindMostProbableValueInSpectrum
 from .analysis.process_events import (ProcessEvents, ProcessEventsFromSource,
                                       ProcessEventsFromSourceWithTriggerOffset,
-                                      ProcessWeather, ProcessWeatherFromSource)
+                                      ProcessWeather, ProcessWeatherFromSource,
+                                      process_events_in_parallel)
 from .analysis.reconstructions import (ReconstructESDEvents,
                                        ReconstructESDEventsFromSource,
-                                       ReconstructESDCoincidences)
+                                       ReconstructESDCoincidences,
+                                       reconstruct_coincidences_in_parallel)
 from .analysis.time_deltas import ProcessTimeDeltas
 from .api import Network, Station
 from .clusters import HiSPARCStations, HiSPARCNetwork, ScienceParkCluster
 from .corsika.corsika_queries import CorsikaQuery
-from .esd import (quick_download, load_data, download_data,
+from .esd import (quick_download, load_data, download_data, download_many,
                   download_coincidences)
 from .simulations.groundparticles import (GroundParticlesSimulation,
                                           MultipleGroundParticlesSimulation)
@@ -107,13 +109,15 @@ __all__ = ['analysis',
            'ProcessEvents', 'ProcessEventsFromSource',
            'ProcessEventsFromSourceWithTriggerOffset',
            'ProcessWeather', 'ProcessWeatherFromSource',
+           'process_events_in_parallel',
            'ReconstructESDEvents', 'ReconstructESDEventsFromSource',
            'ReconstructESDCoincidences',
+           'reconstruct_coincidences_in_parallel',
            'ProcessTimeDeltas',
            'Network', 'Station',
            'HiSPARCStations', 'HiSPARCNetwork', 'ScienceParkCluster',
            'CorsikaQuery',
-           'quick_download', 'load_data', 'download_data',
+           'quick_download', 'load_data', 'download_data', 'download_many',
            'download_coincidences',
            'GroundParticlesSimulation', 'MultipleGroundParticlesSimulation',
            'KascadeLdfSimulation', 'NkgLdfSimulation',
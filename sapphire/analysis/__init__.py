@@ -39,6 +39,9 @@ This package contains modules for performing various analysis tasks:
 :mod:`~sapphire.analysis.time_deltas`
     determine time deltas for station pairs
 
+:mod:`~sapphire.analysis.trace_store`
+    store HiSPARC traces in a binary format
+
 """
 from . import calibration
 from . import coincidence_queries
@@ -52,6 +55,7 @@ from . import process_events
 from . import process_traces
 from . import reconstructions
 from . import time_deltas
+from . import trace_store
 
 
 __all__ = ['calibration',
@@ -65,4 +69,5 @@ __all__ = ['calibration',
            'process_events',
            'process_traces',
            'reconstructions',
-           'time_deltas']
+           'time_deltas',
+           'trace_store']
@@ -2,6 +2,8 @@ import re
 import itertools
 import warnings
 
+from numpy import (array, arange, bincount, concatenate, cumsum, empty,
+                   repeat, unique)
 import tables
 
 from .. import api
@@ -36,6 +38,10 @@ class CoincidenceQuery(object):
 
     """
 
+    #: Number of coincidences for which the events are gathered at once
+    #: when getting events in bulk.
+    BULK_SIZE = 10000
+
     def __init__(self, data, coincidence_group='/coincidences'):
         """Setup variables to point to the tables
 
@@ -230,6 +236,69 @@ class CoincidenceQuery(object):
             events.append((station_number, s_node.events[e_idx]))
         return events
 
+    def gather_events(self, coincidence_ids):
+        """Get the events belonging to many coincidences at once
+
+        The coincidence index is read once for all coincidences. The events
+        of each station are read with a single (sorted) read.
+
+        :param coincidence_ids: list of coincidence ids.
+        :return: :class:`CoincidenceEvents` with the events of each
+                 coincidence.
+
+        """
+        coincidence_ids = list(coincidence_ids)
+        c_idx = self.c_index[coincidence_ids] if coincidence_ids else []
+        lengths = array([len(idx) for idx in c_idx], dtype=int)
+        if lengths.sum():
+            s_idx, e_idx = concatenate(c_idx).T
+        else:
+            s_idx, e_idx = empty((2, 0), dtype=int)
+        coincidence = repeat(arange(len(lengths)), lengths)
+
+        keep = empty(len(s_idx), dtype=bool)
+        rows = empty(len(s_idx), dtype=int)
+        station_numbers = empty(len(s_idx), dtype=int)
+        events = {}
+        for s in unique(s_idx):
+            station = s_idx == s
+            s_node = self.s_nodes[s]
+            keep[station] = s_node is not None
+            if s_node is None:
+                warnings.warn('Missing station group for station id %d. '
+                              'Events from it are excluded.' % s)
+                continue
+            station_number = self.s_numbers[s]
+            e_unique, rows[station] = unique(e_idx[station],
+                                             return_inverse=True)
+            events[station_number] = s_node.events.read_coordinates(e_unique)
+            station_numbers[station] = station_number
+
+        counts = bincount(coincidence[keep], minlength=len(lengths))
+        offsets = concatenate([[0], cumsum(counts)])
+        return CoincidenceEvents(offsets, station_numbers[keep], rows[keep],
+                                 events)
+
+    def _get_events_in_bulk(self, coincidences):
+        """Get events belonging to coincidences, gathered in bulk
+
+        The events are gathered using :meth:`gather_events` for
+        ``BULK_SIZE`` coincidences at a time.
+
+        :param coincidences: list of coincidence rows.
+        :return: generator of lists of tuples containing station numbers
+                 and events, for each coincidence.
+
+        """
+        coincidences = iter(coincidences)
+        while True:
+            coincidence_ids = [coincidence['id'] for coincidence in
+                               itertools.islice(coincidences, self.BULK_SIZE)]
+            if not coincidence_ids:
+                break
+            for events in self.gather_events(coincidence_ids):
+                yield events
+
     def _get_reconstructions(self, coincidence):
         """Get event reconstructions belonging to a coincidence
 
@@ -266,16 +335,21 @@ class CoincidenceQuery(object):
                             'Perform reconstructions and reinitialize this '
                             'class.')
 
-    def all_events(self, coincidences, n=0):
+    def all_events(self, coincidences, n=0, bulk=False):
         """Get all events for the given coincidences.
 
         :param coincidences: list of coincidence rows.
         :param n: minimum number of events per coincidence.
+        :param bulk: if True, gather the events of many coincidences at
+                     once, see :meth:`gather_events`.
         :return: list of events for each coincidence.
 
         """
-        coincidence_events = (self._get_events(coincidence)
-                              for coincidence in coincidences)
+        if bulk:
+            coincidence_events = self._get_events_in_bulk(coincidences)
+        else:
+            coincidence_events = (self._get_events(coincidence)
+                                  for coincidence in coincidences)
         return self.minimum_events_for_coincidence(coincidence_events, n)
 
     def all_reconstructions(self, coincidences, n=0):
@@ -302,16 +376,22 @@ class CoincidenceQuery(object):
                                  if len(coincidence) >= n)
         return filtered_coincidences
 
-    def events_from_stations(self, coincidences, stations, n=2):
+    def events_from_stations(self, coincidences, stations, n=2,
+                             bulk=False):
         """Only get events for specific stations for coincidences.
 
         :param coincidences: list of coincidence rows.
         :param stations: list of station numbers to filter events for.
+        :param bulk: if True, gather the events of many coincidences at
+                     once, see :meth:`gather_events`.
         :return: list of filtered events for each coincidence.
 
         """
-        events_iterator = (self._get_events(coincidence)
-                           for coincidence in coincidences)
+        if bulk:
+            events_iterator = self._get_events_in_bulk(coincidences)
+        else:
+            events_iterator = (self._get_events(coincidence)
+                               for coincidence in coincidences)
         coincidences_events = (self._events_from_stations(events, stations)
                                for events in events_iterator)
         return self.minimum_events_for_coincidence(coincidences_events, n)
@@ -369,3 +449,53 @@ class CoincidenceQuery(object):
         filtered_events = self.events_from_stations(coincidences, stations, n)
 
         return filtered_events
+
+
+class CoincidenceEvents(object):
+
+    """Events of many coincidences, stored per station
+
+    The events of each station are stored in a single array, in
+    :attr:`events`. The events of coincidence ``i`` are found at positions
+    ``offsets[i]`` up to ``offsets[i + 1]`` of :attr:`station_numbers` and
+    :attr:`rows`, which give the station number and the row in the array
+    of events of that station.
+
+    Indexing or iterating gives the events of a coincidence in the same
+    form as :meth:`CoincidenceQuery.all_events`, a list of tuples
+    containing station numbers and events.
+
+    """
+
+    def __init__(self, offsets, station_numbers, rows, events):
+        """Store the events
+
+        :param offsets: array with the position of the first event of each
+                        coincidence, and the total number of events.
+        :param station_numbers: array of station numbers for each event.
+        :param rows: array with the row of each event in the events array
+                     of its station.
+        :param events: dictionary of the arrays of events of each station,
+                       keyed by station number.
+
+        """
+        self.offsets = offsets
+        self.station_numbers = station_numbers
+        self.rows = rows
+        self.events = events
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    def __getitem__(self, idx):
+        if not -len(self) <= idx < len(self):
+            raise IndexError('Coincidence index out of range')
+        idx %= len(self)
+        start, stop = self.offsets[idx], self.offsets[idx + 1]
+        return [(int(station_number), self.events[station_number][row])
+                for station_number, row in
+                zip(self.station_numbers[start:stop], self.rows[start:stop])]
+
+    def __iter__(self):
+        for idx in range(len(self)):
+            yield self[idx]
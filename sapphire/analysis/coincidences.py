@@ -31,16 +31,20 @@
 
 """
 import os.path
+from itertools import chain
 
 import tables
 import numpy as np
-from progressbar import ProgressBar, ETA, Bar, Percentage
 
 from . import process_events
 from .. import storage
 from ..utils import pbar
 
 
+# number of coincidences stored at once by CoincidencesESD
+STORE_BATCH_SIZE = 100000
+
+
 class Coincidences(object):
     """Search for and store coincidences between HiSPARC stations.
 
@@ -157,7 +161,8 @@ class Coincidences(object):
         self.process_events()
         self.store_coincidences()
 
-    def search_coincidences(self, window=10000, shifts=None, limit=None):
+    def search_coincidences(self, window=10000, shifts=None, limit=None,
+                            chunksize=None):
         """Search for coincidences.
 
         Search all data in the station_groups for coincidences, and store
@@ -170,10 +175,11 @@ class Coincidences(object):
         _src_c_index and _src_timestamps.  The former is a list of
         coincidences, which each consist of a list with indexes into the
         timestamps array as a pointer to the events making up the
-        coincidence. The latter is a list of tuples.  Each tuple consists
-        of a timestamp followed by an index into the stations list which
-        designates the detector station which measured the event, and
-        finally an index into that station's event table.
+        coincidence. The latter is an (N, 3) uint64 array with a row for
+        each event.  Each row consists of a timestamp followed by an index
+        into the stations list which designates the detector station which
+        measured the event, and finally an index into that station's event
+        table.
 
         :param window: the coincidence time window in nanoseconds. All events
             with delta t's smaller than this window will be considered a
@@ -184,18 +190,38 @@ class Coincidences(object):
             Use 'None' for no shift.
         :param limit: optionally limit the search for this number of
             events.
+        :param chunksize: optionally read and search the event tables in
+            chunks of this number of events, storing the results as they
+            are found.  This limits the memory usage, but requires the event
+            tables to be sorted by ``ext_timestamp``.
 
         """
-        c_index, timestamps = \
-            self._search_coincidences(window, shifts, limit)
-        timestamps = np.array(timestamps, dtype=np.uint64)
-        self.data.create_array(self.coincidence_group, '_src_timestamps',
-                               timestamps)
-        src_c_index = self.data.create_vlarray(self.coincidence_group,
-                                               '_src_c_index',
-                                               tables.UInt32Atom())
-        for coincidence in c_index:
-            src_c_index.append(coincidence)
+        if chunksize is None:
+            c_index, timestamps = \
+                self._search_coincidences(window, shifts, limit)
+            timestamps = np.array(timestamps, dtype=np.uint64)
+            self.data.create_array(self.coincidence_group, '_src_timestamps',
+                                   timestamps)
+            src_c_index = self.data.create_vlarray(self.coincidence_group,
+                                                   '_src_c_index',
+                                                   tables.UInt32Atom())
+            for coincidence in c_index:
+                src_c_index.append(coincidence)
+        else:
+            src_timestamps = self.data.create_earray(
+                self.coincidence_group, '_src_timestamps', tables.UInt64Atom(),
+                shape=(0, 3))
+            src_c_index = self.data.create_vlarray(self.coincidence_group,
+                                                   '_src_c_index',
+                                                   tables.UInt32Atom())
+            for _, timestamps, n_final, c_index in \
+                    self._search_coincidences_in_chunks(window, shifts, limit,
+                                                        chunksize):
+                src_timestamps.append(timestamps[:n_final])
+                for coincidence in c_index:
+                    src_c_index.append(coincidence)
+            src_timestamps.flush()
+            src_c_index.flush()
 
     def process_events(self, overwrite=None):
         """Process events using :mod:`~sapphire.analysis.process_events`
@@ -342,33 +368,148 @@ class Coincidences(object):
 
         :return: coincidences, timestamps. First a list of coincidences, which
             each consist of a list with indexes into the timestamps array as a
-            pointer to the events making up the coincidence. Then, a list of
-            tuples.  Each tuple consists of a timestamp followed by an index
-            into the stations list which designates the detector
-            station which measured the event, and finally an index into that
-            station's event table.
+            pointer to the events making up the coincidence. Then, an array
+            with a row for each event.  Each row consists of a timestamp
+            followed by an index into the stations list which designates the
+            detector station which measured the event, and finally an index
+            into that station's event table.
 
         """
-        # get the 'events' tables from the groups or groupnames
+        event_tables = self._get_event_tables()
+        timestamps, station_ids, event_ids = \
+            self._retrieve_timestamp_arrays(event_tables, shifts, limit)
+        coincidences = self._do_search_coincidences_arrays(timestamps, window)
+        timestamps = np.column_stack((timestamps, station_ids, event_ids))
+
+        return coincidences, timestamps
+
+    def _search_coincidences_in_chunks(self, window=10000, shifts=None,
+                                       limit=None, chunksize=100000):
+        """Search for coincidences, reading the event tables in chunks
+
+        The event tables are read in chunks of timestamps, which are merged
+        into a single stream of events sorted by timestamp, station index and
+        event index, exactly as in :meth:`_search_coincidences`.  The search
+        keeps a look-ahead of one coincidence window, so coincidences which
+        straddle chunk boundaries are found as usual.  The results are
+        identical to those of :meth:`_search_coincidences`, but the memory
+        usage does not depend on the number of events.
+
+        The event tables must be sorted by ``ext_timestamp``.
+
+        :param window: the time window in nanoseconds which will be searched
+            for coincidences.
+        :param shifts: a list of time shifts in seconds, use 'None' for no
+            shift.
+        :param limit: limit the number of events which are processed.
+        :param chunksize: the number of events to read from an event table
+            at once.
+
+        :return: generator which yields tuples of (offset, timestamps,
+            n_final, coincidences). The timestamps array contains the events
+            starting at index offset (of all events), the first n_final
+            of which will not be yielded again. The coincidences are lists
+            of indexes into all events, as returned by
+            :meth:`_search_coincidences`, which only refer to events in
+            this timestamps array.
+
+        """
+        # calculate the shifts in nanoseconds and cast them to int.
+        if shifts is not None:
+            shifts = [int(shift * 1e9) if shift is not None else shift
+                      for shift in shifts]
+        window = int(np.ceil(window))
+
+        readers = []
+        for s_id, event_table in enumerate(self._get_event_tables()):
+            try:
+                shift = shifts[s_id]
+            except (TypeError, IndexError):
+                shift = None
+            readers.append(_TimestampChunkReader(event_table, s_id, shift,
+                                                 limit, chunksize))
+
+        for reader in readers:
+            if not reader.exhausted:
+                reader.read_chunk()
+
+        carry = np.empty((0, 3), dtype=np.uint64)
+        offset = 0
+        prev_end = None
+
+        while True:
+            # all events before the horizon have been read, because the
+            # event tables are sorted.
+            active = [reader for reader in readers if not reader.exhausted]
+            if active:
+                horizon = min(reader.last for reader in active)
+            else:
+                horizon = None
+
+            # merge the new events, the carried events are all earlier
+            released = [reader.pop_before(horizon) for reader in readers]
+            released = np.concatenate([carry] + released)
+            new = released[len(carry):]
+            order = new[:, 0].argsort(kind='mergesort')
+            events = np.concatenate([carry, new[order]])
+            timestamps = events[:, 0]
+
+            # the end of a coincidence window is final if all events
+            # within that window have been read.
+            if horizon is None:
+                n_final = len(events)
+            elif horizon >= window:
+                n_final = timestamps.searchsorted(np.uint64(horizon - window),
+                                                  side='right')
+            else:
+                n_final = 0
+
+            if n_final:
+                starts = np.arange(n_final)
+                ends = timestamps.searchsorted(timestamps[:n_final] +
+                                               np.uint64(window), side='left')
+                candidates = starts[ends - starts > 1]
+                candidate_ends = ends[candidates]
+                is_new = np.ones(len(candidates), dtype=bool)
+                is_new[1:] = candidate_ends[1:] != candidate_ends[:-1]
+                if len(candidates) and prev_end is not None:
+                    is_new[0] = candidate_ends[0] + offset != prev_end
+                if len(candidates):
+                    prev_end = candidate_ends[-1] + offset
+
+                coincidences = [range(start, end) for start, end in
+                                zip((candidates[is_new] + offset).tolist(),
+                                    (candidate_ends[is_new] +
+                                     offset).tolist())]
+                yield offset, events, n_final, coincidences
+
+            carry = events[n_final:]
+            offset += n_final
+            if horizon is None:
+                break
+            # read on for the station which is furthest behind
+            min(active, key=lambda reader: reader.last).read_chunk()
+
+    def _get_event_tables(self):
+        """Get the 'events' tables from the groups or groupnames"""
+
         event_tables = []
         for station_group in self.station_groups:
             station_group = self.data.get_node(station_group)
             if 'events' in station_group:
                 event_tables.append(self.data.get_node(station_group,
                                                        'events'))
+        return event_tables
 
-        timestamps = self._retrieve_timestamps(event_tables, shifts, limit)
-        coincidences = self._do_search_coincidences(timestamps, window)
-
-        return coincidences, timestamps
-
-    def _retrieve_timestamps(self, event_tables, shifts=None, limit=None):
-        """Retrieve all timestamps from all stations, optionally shifting them
+    def _retrieve_timestamp_arrays(self, event_tables, shifts=None,
+                                   limit=None):
+        """Retrieve all timestamps from all stations as sorted arrays
 
         This function retrieves the timestamps from a list of event tables and
         will optionally shift the timestamps by a given amount.  This is
         necessary when one wants to compare the timestamps of stations who use
-        a different time (as in GPS, UTC or local time).
+        a different time (as in GPS, UTC or local time).  The events are
+        sorted by timestamp, station index and event index.
 
         :param event_tables: a list of HiSPARC event tables, usually from
             different stations.
@@ -376,10 +517,9 @@ class Coincidences(object):
             shift.
         :param limit: limit the number of events which are processed.
 
-        :return: list of tuples.  Each tuple consists of a timestamp followed
-            by an index into the stations list which designates the detector
-            station which measured the event, and finally an index of the
-            event into the station's event table.
+        :return: three parallel arrays: the timestamps (uint64), the indexes
+            into the stations list (uint16), and the indexes of the events
+            into the station's event table (uint32).
 
         """
         # calculate the shifts in nanoseconds and cast them to int.
@@ -389,35 +529,51 @@ class Coincidences(object):
                       for shift in shifts]
 
         timestamps = []
+        station_ids = []
+        event_ids = []
         for s_id, event_table in enumerate(event_tables):
-            ts = [(x, s_id, j) for j, x in
-                  enumerate(event_table.col('ext_timestamp')[:limit])]
-            try:
-                # shift data. carefully avoid upcasting (we're adding two
-                # ints, which is an int, and casting that back to uint64. if
-                # we're not careful, an intermediate value will be a float64,
-                # which doesn't hold the precision to store nanoseconds.
-                ts = [(np.uint64(int(x) + shifts[i]), i, j)
-                      for x, i, j in ts]
-            except (TypeError, IndexError):
-                # shift is None or doesn't exist
-                pass
-            timestamps.extend(ts)
+            ts = np.array(event_table.col('ext_timestamp')[:limit],
+                          dtype=np.uint64)
+            if shifts is not None and s_id < len(shifts) and \
+                    shifts[s_id] is not None:
+                # shift data, use integer arithmetic to keep the precision
+                # of the nanoseconds.
+                if shifts[s_id] >= 0:
+                    ts += np.uint64(shifts[s_id])
+                else:
+                    ts -= np.uint64(-shifts[s_id])
+            timestamps.append(ts)
+            station_ids.append(np.repeat(np.uint16(s_id), len(ts)))
+            event_ids.append(np.arange(len(ts), dtype=np.uint32))
+
+        if not timestamps:
+            return (np.array([], dtype=np.uint64),
+                    np.array([], dtype=np.uint16),
+                    np.array([], dtype=np.uint32))
+
+        timestamps = np.concatenate(timestamps)
+        station_ids = np.concatenate(station_ids)
+        event_ids = np.concatenate(event_ids)
 
-        # sort the timestamps
-        timestamps.sort()
+        # a stable sort keeps events with equal timestamps in order of
+        # station and event index.
+        order = timestamps.argsort(kind='mergesort')
 
-        return timestamps
+        return timestamps[order], station_ids[order], event_ids[order]
 
-    def _do_search_coincidences(self, timestamps, window):
-        """Search for coincidences in a set of timestamps
+    def _do_search_coincidences_arrays(self, timestamps, window):
+        """Search for coincidences in a sorted array of timestamps
 
         Given a set of timestamps, search for coincidences.  That is, search
         for events which occured almost at the same time and thus might be the
-        result of an extended air shower.
-
-        :param timestamps: a list of tuples (timestamp, station_idx,
-            event_idx) which will be searched
+        result of an extended air shower.  A coincidence starts at each event
+        and extends up to the last event within the window.  It is kept if it
+        contains more than one event and if it is not part of the previous
+        coincidence.  Because the end of the coincidence windows can only
+        increase, a coincidence is part of the previous one if it ends at
+        the same event.
+
+        :param timestamps: sorted array of timestamps.
         :param window: the time window in nanoseconds which will be searched
             for coincidences.  Events falling outside this window will not be
             part of the coincidence.
@@ -427,47 +583,25 @@ class Coincidences(object):
             making up the coincidence
 
         """
-        coincidences = []
-
-        # traverse all timestamps
-        prev_coincidence = []
-
-        if self.progress and len(timestamps):
-            pbar = ProgressBar(maxval=len(timestamps),
-                               widgets=[Percentage(), Bar(), ETA()]).start()
-
-        for i in xrange(len(timestamps)):
-
-            # build coincidence, starting with the current timestamp
-            c = [i]
-            t0 = timestamps[i][0]
-
-            # traverse the rest of the timestamps
-            for j in xrange(i + 1, len(timestamps)):
-                # if a timestamp is within the coincidence window, add it
-                if timestamps[j][0] - t0 < window:
-                    c.append(j)
-                else:
-                    # coincidence window has passed, break for-loop
-                    break
+        timestamps = np.asarray(timestamps, dtype=np.uint64)
+        # timestamps differ by integer nanoseconds, so a difference smaller
+        # than the window is smaller than the window rounded up.
+        window = int(np.ceil(window))
+        if not len(timestamps) or window <= 0:
+            return []
 
-            # if we have more than one event in the coincidence, save it
-            if len(c) > 1:
-                # is this coincidence part of the previous coincidence?
-                is_part_of_prev = np.array([u in prev_coincidence
-                                            for u in c]).all()
-                if not is_part_of_prev:
-                    # no, so it's a new one
-                    coincidences.append(c)
-                    prev_coincidence = c
+        starts = np.arange(len(timestamps))
+        ends = timestamps.searchsorted(timestamps + np.uint64(window),
+                                       side='left')
 
-            if self.progress and not i % 5000:
-                pbar.update(i)
+        candidates = starts[ends - starts > 1]
+        candidate_ends = ends[candidates]
+        is_new = np.ones(len(candidates), dtype=bool)
+        is_new[1:] = candidate_ends[1:] != candidate_ends[:-1]
 
-        if self.progress and len(timestamps):
-            pbar.finish()
-
-        return coincidences
+        return [range(start, end) for start, end in
+                zip(candidates[is_new].tolist(),
+                    candidate_ends[is_new].tolist())]
 
 
 class CoincidencesESD(Coincidences):
@@ -539,15 +673,24 @@ class CoincidencesESD(Coincidences):
 
     """
     def search_and_store_coincidences(self, window=10000,
-                                      station_numbers=None):
+                                      station_numbers=None, chunksize=None):
         """Search and store coincidences.
 
         This is a semi-automatic method to search for coincidences
         and then store the results in the coincidences group.
 
+        :param chunksize: optionally read and search the event tables in
+            chunks of this number of events, storing the coincidences as
+            they are found.  This limits the memory usage, but requires the
+            event tables to be sorted by ``ext_timestamp``.
+
         """
-        self.search_coincidences(window=window)
-        self.store_coincidences(station_numbers=station_numbers)
+        if chunksize is None:
+            self.search_coincidences(window=window)
+            self.store_coincidences(station_numbers=station_numbers)
+        else:
+            self._search_and_store_coincidences_in_chunks(
+                window, station_numbers, chunksize)
 
     def search_coincidences(self, window=10000, shifts=None, limit=None):
         """Search for coincidences.
@@ -562,10 +705,13 @@ class CoincidencesESD(Coincidences):
         attributes ``_src_c_index`` and ``_src_timestamps``.  The
         former is a list of coincidences, which each consist of a list with
         indexes into the timestamps array as a pointer to the events making up
-        the coincidence. The latter is a list of tuples.  Each tuple consists
-        of a timestamp followed by an index into the stations list which
-        designates the detector station which measured the event, and finally
-        an index into that station's event table.
+        the coincidence. The latter is an (N, 3) uint64 array with a row for
+        each event.  Each row consists of a timestamp followed by an index
+        into the stations list which designates the detector station which
+        measured the event, and finally an index into that station's event
+        table.  When searching and storing in chunks, see
+        :meth:`search_and_store_coincidences`, it only holds the events of
+        the current chunk and is reset to None afterwards.
 
         :param window: the coincidence time window.  All events with delta
             t's smaller than this window will be considered a coincidence.
@@ -596,6 +742,53 @@ class CoincidencesESD(Coincidences):
 
         """
         n_coincidences = len(self._src_c_index)
+        self._create_coincidences_table(station_numbers, n_coincidences)
+        self.c_index = self.data.create_vlarray(
+            self.coincidence_group, 'c_index', tables.UInt32Col(shape=2),
+            expectedrows=n_coincidences)
+
+        for start in pbar(range(0, n_coincidences, STORE_BATCH_SIZE),
+                          show=self.progress):
+            self._store_coincidences_batch(
+                self._src_c_index[start:start + STORE_BATCH_SIZE])
+        self.c_index.flush()
+
+        self._store_s_index()
+
+    def _search_and_store_coincidences_in_chunks(self, window=10000,
+                                                 station_numbers=None,
+                                                 chunksize=100000):
+        """Search and store coincidences, reading the events in chunks
+
+        The coincidences are stored as they are found, using
+        :meth:`~Coincidences._search_coincidences_in_chunks`.  The results
+        are identical to those of :meth:`search_coincidences` followed by
+        :meth:`store_coincidences`.
+
+        """
+        self._create_coincidences_table(station_numbers)
+        self.c_index = self.data.create_vlarray(
+            self.coincidence_group, 'c_index', tables.UInt32Col(shape=2))
+
+        for offset, timestamps, _, coincidences in \
+                self._search_coincidences_in_chunks(window,
+                                                    chunksize=chunksize):
+            self._src_timestamps = timestamps
+            self._store_coincidences_batch(coincidences, offset)
+        self.c_index.flush()
+        self._src_timestamps = None
+
+        self._store_s_index()
+
+    def _create_coincidences_table(self, station_numbers=None,
+                                   expectedrows=10000):
+        """Create the coincidences table
+
+        :param station_numbers: optional list of station_numbers, see
+            :meth:`store_coincidences`.
+        :param expectedrows: expected number of coincidences.
+
+        """
         if station_numbers is not None:
             if len(station_numbers) != len(self.station_groups):
                 raise RuntimeError(
@@ -612,19 +805,10 @@ class CoincidencesESD(Coincidences):
         description.columns.update(s_columns)
         self.coincidences = self.data.create_table(
             self.coincidence_group, 'coincidences', description,
-            expectedrows=n_coincidences)
-
-        self.c_index = []
+            expectedrows=expectedrows)
 
-        for coincidence in pbar(self._src_c_index, show=self.progress):
-            self._store_coincidence(coincidence)
-
-        c_index = self.data.create_vlarray(
-            self.coincidence_group, 'c_index', tables.UInt32Col(shape=2),
-            expectedrows=n_coincidences)
-        for observables_idx in pbar(self.c_index, show=self.progress):
-            c_index.append(observables_idx)
-        c_index.flush()
+    def _store_s_index(self):
+        """Store the paths to the station groups in the s_index"""
 
         s_index = self.data.create_vlarray(
             self.coincidence_group, 's_index', tables.VLStringAtom(),
@@ -633,43 +817,153 @@ class CoincidencesESD(Coincidences):
             s_index.append(station_group)
         s_index.flush()
 
-    def _store_coincidence(self, coincidence):
-        """Store a single coincidence in the coincidence group.
+    def _store_coincidences_batch(self, coincidences, offset=0):
+        """Store a batch of coincidences in the coincidence group.
+
+        Stores the coincidences in the coincidences table and references
+        to the events making up each coincidence in ``c_index``.  The rows
+        for the coincidences table are built as a single array, the event
+        timestamps are read with one query per station.
 
-        Stores coincidence in the coincidences table and references
-        to the observables making up each coincidence in ``c_index``.
+        :param coincidences: list of coincidences, each a list of indexes
+            into ``_src_timestamps``, minus the offset.
+        :param offset: index of the first row of ``_src_timestamps`` in the
+            timestamps of all events.
 
         """
-        row = self.coincidences.row
-        coincidence_id = len(self.coincidences)
-        row['id'] = coincidence_id
-        row['N'] = len(coincidence)
+        n_coincidences = len(coincidences)
+        if not n_coincidences:
+            return
 
-        observables_idx = []
-        timestamps = []
-        for index in coincidence:
-            event_desc = self._src_timestamps[index]
-            station_id = event_desc[1]
-            event_index = event_desc[2]
-            if self.station_numbers is not None:
-                station_number = self.station_numbers[station_id]
-                row['s%d' % station_number] = True
-            else:
-                row['s%d' % station_id] = True
+        lengths = np.fromiter((len(c) for c in coincidences), dtype=np.int64,
+                              count=n_coincidences)
+        indexes = np.fromiter(chain.from_iterable(coincidences),
+                              dtype=np.int64, count=lengths.sum())
+        src_timestamps = self._src_timestamps[indexes - offset]
+        station_ids = src_timestamps[:, 1].astype(np.int64)
+        event_ids = src_timestamps[:, 2]
+        coincidence_ids = np.repeat(np.arange(n_coincidences), lengths)
+        starts = lengths.cumsum() - lengths
+
+        if self.station_numbers is not None:
+            s_columns = ['s%d' % number for number in self.station_numbers]
+        else:
+            s_columns = ['s%d' % n for n, _ in enumerate(self.station_groups)]
 
-            group = self.data.get_node(self.station_groups[station_id])
-            event = group.events[event_index]
-            observables_idx.append((station_id, event_index))
-            timestamps.append((event['ext_timestamp'], event['timestamp'],
-                               event['nanoseconds']))
+        rows = np.zeros(n_coincidences, dtype=self.coincidences.dtype)
+        for name, default in self.coincidences.coldflts.iteritems():
+            rows[name] = default
+        rows['id'] = len(self.coincidences) + np.arange(n_coincidences)
+        rows['N'] = lengths
 
-        first_timestamp = sorted(timestamps)[0]
-        row['ext_timestamp'], row['timestamp'], row['nanoseconds'] = \
-            first_timestamp
-        row.append()
-        self.c_index.append(observables_idx)
+        ext_timestamps = np.empty(len(indexes), dtype=np.uint64)
+        timestamps = np.empty(len(indexes), dtype=np.uint32)
+        nanoseconds = np.empty(len(indexes), dtype=np.uint32)
+        for station_id in np.unique(station_ids):
+            is_station = station_ids == station_id
+            rows[s_columns[station_id]][coincidence_ids[is_station]] = True
+
+            group = self.data.get_node(self.station_groups[station_id])
+            event_idx, inverse = np.unique(event_ids[is_station],
+                                           return_inverse=True)
+            events = group.events.read_coordinates(event_idx)[inverse]
+            ext_timestamps[is_station] = events['ext_timestamp']
+            timestamps[is_station] = events['timestamp']
+            nanoseconds[is_station] = events['nanoseconds']
+
+        # the first event of each coincidence, sorted by timestamp
+        order = np.lexsort((nanoseconds, timestamps, ext_timestamps,
+                            coincidence_ids))
+        first = order[starts]
+        rows['ext_timestamp'] = ext_timestamps[first]
+        rows['timestamp'] = timestamps[first]
+        rows['nanoseconds'] = nanoseconds[first]
+        self.coincidences.append(rows)
         self.coincidences.flush()
 
+        observables_idx = np.column_stack((station_ids, event_ids))
+        for observables in np.split(observables_idx, starts[1:]):
+            self.c_index.append(observables)
+
+
+class _TimestampChunkReader(object):
+
+    """Read the timestamps of an event table in chunks
+
+    The timestamps are kept in a buffer until they are popped in order.
+    The event table must be sorted by ``ext_timestamp``.
+
+    """
+
+    def __init__(self, event_table, station_id, shift=None, limit=None,
+                 chunksize=100000):
+        """Initialize the reader
+
+        :param event_table: the event table.
+        :param station_id: index of the station in the list of stations.
+        :param shift: optional time shift in nanoseconds.
+        :param limit: limit the number of events which are read.
+        :param chunksize: the number of events to read at once.
+
+        """
+        self.event_table = event_table
+        self.station_id = station_id
+        self.shift = shift
+        self.chunksize = chunksize
+        self.stop = len(event_table)
+        if limit is not None:
+            self.stop = min(limit, self.stop)
+        self.position = 0
+        self.last = None
+        self.exhausted = not self.stop
+        self.buffer = np.empty((0, 3), dtype=np.uint64)
+
+    def read_chunk(self):
+        """Read the next chunk of timestamps into the buffer"""
+
+        start = self.position
+        stop = min(start + self.chunksize, self.stop)
+        timestamps = self.event_table.read(start, stop, field='ext_timestamp')
+        timestamps = timestamps.astype(np.uint64)
+        if self.shift is not None:
+            if self.shift >= 0:
+                timestamps += np.uint64(self.shift)
+            else:
+                timestamps -= np.uint64(-self.shift)
+
+        if (timestamps[1:] < timestamps[:-1]).any() or \
+                (self.last is not None and timestamps[0] < self.last):
+            raise RuntimeError("Events in %s are not sorted by "
+                               "ext_timestamp." % self.event_table._v_pathname)
+
+        chunk = np.empty((len(timestamps), 3), dtype=np.uint64)
+        chunk[:, 0] = timestamps
+        chunk[:, 1] = self.station_id
+        chunk[:, 2] = np.arange(start, stop)
+        self.buffer = np.concatenate([self.buffer, chunk])
+
+        self.position = stop
+        self.last = int(timestamps[-1])
+        self.exhausted = self.position >= self.stop
+
+    def pop_before(self, timestamp=None):
+        """Remove and return all buffered events before timestamp
+
+        :param timestamp: timestamp of the first event to keep, if None
+            all buffered events are returned.
+        :return: array of events, each consisting of timestamp, station
+            index and event index.
+
+        """
+        if timestamp is None:
+            idx = len(self.buffer)
+        else:
+            idx = self.buffer[:, 0].searchsorted(np.uint64(timestamp),
+                                                 side='left')
+        events = self.buffer[:idx]
+        self.buffer = self.buffer[idx:]
+        return events
+
 
 def get_events(data, stations, coincidence, timestamps, get_raw_traces=False):
     """Get event data of a coincidence
@@ -17,9 +17,10 @@
 """
 from __future__ import division
 from itertools import izip_longest, combinations
-import warnings
 
-from numpy import isnan, nan, cos, sqrt, mean, array
+from numpy import (isnan, nan, cos, sqrt, array, asarray, where, errstate,
+                   arange, newaxis, inf, full, ones, stack, broadcast_to,
+                   argsort, minimum)
 
 from .event_utils import station_density, detector_density
 from ..utils import pbar
@@ -297,35 +298,92 @@ class AverageIntersectionAlgorithm(object):
         if len(p) < 4 or len(x) < 4 or len(y) < 4:
             raise Exception('This algorithm requires at least 4 detections.')
 
-        phit = []
-        xhit = []
-        yhit = []
-        for i in range(len(p)):
-            if p[i] > .01:
-                phit.append(p[i])
-                xhit.append(x[i])
-                yhit.append(y[i])
-
-        statindex = range(len(phit))
-        subsets = combinations(statindex, 3)
+        core_x, core_y = cls.reconstruct_common_many([p], [x], [y])
+
+        return core_x[0], core_y[0]
+
+    @classmethod
+    def reconstruct_common_many(cls, p, x, y, z=None):
+        """Reconstruct the cores of many coincidences at once
+
+        This gives the same results as :meth:`reconstruct_common` for each
+        coincidence. The lines and intersections for all combinations of
+        detections are calculated at once. Coincidences with fewer than 4
+        detections give nan.
+
+        :param p: detector particle densities in m^-2, array with shape
+                  (number of coincidences, number of detectors), missing
+                  detections are indicated by nan densities.
+        :param x,y: positions of detectors in m, arrays with the same
+                    shape as p, or with one position for each detector.
+        :param z: height of detectors is ignored.
+        :return: arrays of core x and y positions in m.
+
+        """
+        p = asarray(p, dtype=float)
+        x, y = (broadcast_to(asarray(values, dtype=float), p.shape)
+                for values in (x, y))
+        detected = ~isnan(p)
+        p_detected = where(detected, p, 0.)
+        hit = p_detected > .01
+
+        total = p_detected.sum(axis=1)
+        with errstate(invalid='ignore', divide='ignore'):
+            newx = (p_detected * where(detected, x, 0.)).sum(axis=1) / total
+            newy = (p_detected * where(detected, y, 0.)).sum(axis=1) / total
+
+        slope, intercept = cls._lines_many(p, x, y, hit)
+        xint, yint = cls._intersections_many(slope, intercept)
+
+        n_points, meanx, meany = cls._select_many(newx, newy, xint, yint,
+                                                  120.)
+        refine = n_points > 3
+        newx = where(refine, meanx, newx)
+        newy = where(refine, meany, newy)
+        n_refined, meanx_refined, meany_refined = cls._select_many(
+            newx, newy, xint, yint, 100.)
+        n_points = where(refine, n_refined, n_points)
+        meanx = where(refine, meanx_refined, meanx)
+        meany = where(refine, meany_refined, meany)
+        average = n_points > 2
+        newx = where(average, meanx, newx)
+        newy = where(average, meany, newy)
+
+        enough = detected.sum(axis=1) >= 4
+        return where(enough, newx, nan), where(enough, newy, nan)
+
+    @staticmethod
+    def _lines_many(p, x, y, hit):
+        """Get the lines through the possible cores of station triplets
+
+        Only the lines of the first triplets are returned, as many as
+        there are hit detectors. These are the lines which are
+        intersected by :meth:`reconstruct_common`.
+
+        :param p: detector particle densities in m^-2, array with shape
+                  (number of coincidences, number of detectors).
+        :param x,y: positions of detectors in m, arrays with the same
+                    shape as p.
+        :param hit: boolean array indicating which detectors are hit.
+        :return: arrays of slopes and intercepts of the lines, with shape
+                 (number of coincidences, number of detectors), padded
+                 with nan.
+
+        """
+        n_detectors = p.shape[1]
+        triplets = array(list(combinations(range(n_detectors), 3)),
+                         dtype=int).reshape(-1, 3)
+        zero, one, two = triplets.T
         m = 3.0  # average value in powerlaw  r ^(-m)  for density
 
-        linelist0 = []
-        linelist1 = []
-        for zero, one, two in subsets:
-            pp = (phit[zero] / phit[one]) ** (2. / m)
-            qq = (phit[zero] / phit[two]) ** (2. / m)
-            if pp == 1:
-                pp = 1.000001
-            if qq == 1:
-                qq = 1.000001
-
-            x0 = xhit[zero]
-            x1 = xhit[one]
-            x2 = xhit[two]
-            y0 = yhit[zero]
-            y1 = yhit[one]
-            y2 = yhit[two]
+        with errstate(invalid='ignore', divide='ignore'):
+            pp = (p[:, zero] / p[:, one]) ** (2. / m)
+            qq = (p[:, zero] / p[:, two]) ** (2. / m)
+            pp = where(pp == 1, 1.000001, pp)
+            qq = where(qq == 1, 1.000001, qq)
+
+            x0, x1, x2 = x[:, zero], x[:, one], x[:, two]
+            y0, y1, y2 = y[:, zero], y[:, one], y[:, two]
             a = (x1 - pp * x0) / (1 - pp)
             b = (y1 - pp * y0) / (1 - pp)
             c = (x2 - qq * x0) / (1 - qq)
@@ -333,46 +391,72 @@ class AverageIntersectionAlgorithm(object):
             rsquare = pp * ((x1 - x0) ** 2 + (y1 - y0) ** 2) / ((1 - pp) ** 2)
             ssquare = qq * ((x2 - x0) ** 2 + (y2 - y0) ** 2) / ((1 - qq) ** 2)
             e = c - a
-            f = d - b
-            if d == b:
-                f = 0.000000001
+            f = where(d == b, 0.000000001, d - b)
             g = sqrt(e * e + f * f)
             k = 0.5 * (g * g + rsquare - ssquare) / g
-            linelist0.append(-e / f)
-            linelist1.append((a * e + b * f + g * k) / f)
-
-        newx, newy = CenterMassAlgorithm.reconstruct_common(p, x, y, z,
-                                                            initial)
-        subsets = combinations(statindex, 2)
-
-        xpointlist = []
-        ypointlist = []
-        for zero, one in subsets:
-            a = linelist0[zero]
-            b = linelist1[zero]
-            c = linelist0[one]
-            d = linelist1[one]
+            slope = -e / f
+            intercept = (a * e + b * f + g * k) / f
+
+        # Move the lines of triplets of hit detectors to the front
+        valid = hit[:, zero] & hit[:, one] & hit[:, two]
+        width = min(n_detectors, len(triplets))
+        order = argsort(~valid, axis=1, kind='mergesort')[:, :width]
+        rows = arange(len(p))[:, newaxis]
+        n_lines = minimum(valid.sum(axis=1), hit.sum(axis=1))
+        used = arange(width) < n_lines[:, newaxis]
+
+        slope = where(used, slope[rows, order], nan)
+        intercept = where(used, intercept[rows, order], nan)
+
+        return slope, intercept
+
+    @staticmethod
+    def _intersections_many(slope, intercept):
+        """Get the intersection points of all combinations of 2 lines
+
+        :param slope,intercept: arrays of slopes and intercepts of the
+                                lines, padded with nan.
+        :return: arrays of x and y of the intersection points, nan for
+                 collinear or missing lines.
+
+        """
+        pairs = array(list(combinations(range(slope.shape[1]), 2)),
+                      dtype=int).reshape(-1, 2)
+        first, second = pairs.T
+        a = slope[:, first]
+        b = intercept[:, first]
+        c = slope[:, second]
+        d = intercept[:, second]
+
+        with errstate(invalid='ignore', divide='ignore'):
             aminc = a - c
-            if a == c:
-                aminc = 0.000000001
             xint = (d - b) / aminc
             yint = (a * d - b * c) / aminc
-            if a != c:
-                xpointlist.append(xint)
-                ypointlist.append(yint)
-
-        subxplist, subyplist = cls.select_newlist(
-            newx, newy, xpointlist, ypointlist, 120.)
-        if len(subxplist) > 3:
-            newx = mean(subxplist)
-            newy = mean(subyplist)
-            subxplist, subyplist = cls.select_newlist(
-                newx, newy, xpointlist, ypointlist, 100.)
-        if len(subxplist) > 2:
-            newx = mean(subxplist)
-            newy = mean(subyplist)
-
-        return newx, newy
+        valid = (a != c) & ~isnan(a) & ~isnan(c)
+
+        return where(valid, xint, nan), where(valid, yint, nan)
+
+    @staticmethod
+    def _select_many(newx, newy, xint, yint, distance):
+        """Select intersection points close to the current cores
+
+        :param newx,newy: arrays of the current core positions in m.
+        :param xint,yint: arrays of intersection points in m, padded with
+                          nan.
+        :param distance: maximum distance to the current core in m.
+        :return: arrays of the number of selected points and their mean
+                 x and y positions.
+
+        """
+        with errstate(invalid='ignore', divide='ignore'):
+            dr = sqrt((xint - newx[:, newaxis]) ** 2 +
+                      (yint - newy[:, newaxis]) ** 2)
+            selected = dr < distance
+            n_points = selected.sum(axis=1)
+            meanx = where(selected, xint, 0.).sum(axis=1) / n_points
+            meany = where(selected, yint, 0.).sum(axis=1) / n_points
+
+        return n_points, meanx, meany
 
     @staticmethod
     def select_newlist(newx, newy, xpointlist, ypointlist, distance):
@@ -411,6 +495,9 @@ class EllipsLdfAlgorithm(object):
         phi = initial.get('phi', 0.)
         return cls.reconstruct(p, x, y, theta, phi)[:2]
 
+    #: Grid sizes in m of the successive grid searches, coarse to fine.
+    GRID_SIZES = (5., 2.)
+
     @classmethod
     def reconstruct(cls, p, x, y, theta, phi):
         """Reconstruct the number of electrons that fits best.
@@ -420,81 +507,185 @@ class EllipsLdfAlgorithm(object):
         :param theta,phi: zenith and azimuth angle in rad.
 
         """
-        xcmass, ycmass = CenterMassAlgorithm.reconstruct_common(p, x, y)
-        chi2best = 10 ** 99
-        xbest = xcmass
-        ybest = ycmass
-        factorbest = 1.
-        gridsize = 5.
-        xbest1, ybest1, chi2best1, factorbest1 = cls.selectbest(
-            p, x, y, xbest, ybest, factorbest, chi2best, gridsize, theta, phi)
-
-        xlines, ylines = AverageIntersectionAlgorithm.reconstruct_common(p, x,
-                                                                         y)
-        chi2best = 10 ** 99
-        xbest = xcmass
-        ybest = ycmass
-        factorbest = 1.
-        xbest2, ybest2, chi2best2, factorbest2 = cls.selectbest(
-            p, x, y, xbest, ybest, factorbest, chi2best, gridsize, theta, phi)
-
-        if chi2best1 < chi2best2:
-            chi2best = chi2best1
-            xbest = xbest1
-            ybest = ybest1
-            factorbest = factorbest1
-        else:
-            chi2best = chi2best2
-            xbest = xbest2
-            ybest = ybest2
-            factorbest = factorbest2
+        if len(p) < 4 or len(x) < 4 or len(y) < 4:
+            raise Exception('This algorithm requires at least 4 detections.')
 
-        gridsize = 2.
-        core_x, core_y, chi2best, factorbest = cls.selectbest(
-            p, x, y, xbest, ybest, factorbest, chi2best, gridsize, theta, phi)
+        core_x, core_y, chi2best, size = cls.reconstruct_many(
+            [p], [x], [y], theta, phi)
 
-        return core_x, core_y, chi2best, factorbest * ldf.EllipsLdf._Ne
+        return core_x[0], core_y[0], chi2best[0], size[0]
 
-    @staticmethod
-    def selectbest(p, x, y, xstart, ystart, factorbest, chi2best, gridsize,
-                   theta, phi):
+    @classmethod
+    def reconstruct_many(cls, p, x, y, theta, phi):
+        """Reconstruct the number of electrons for many coincidences at once
+
+        This gives the same results as :meth:`reconstruct` for each
+        coincidence. Coincidences with fewer than 4 detections give nan.
+
+        Starting at the center of mass, the best core position is searched
+        in a grid for each of the ``GRID_SIZES``.
+
+        :param p: detector particle densities in m^-2, array with shape
+                  (number of coincidences, number of detectors), missing
+                  detections are indicated by nan densities.
+        :param x,y: positions of detectors in m, arrays with the same
+                    shape as p, or with one position for each detector.
+        :param theta,phi: zenith and azimuth angles in rad, one for each
+                          coincidence or a single value for all.
+        :return: arrays of core x, core y, chi2 and shower size.
+
+        """
+        p = asarray(p, dtype=float)
+        x, y = (broadcast_to(asarray(values, dtype=float), p.shape)
+                for values in (x, y))
+        theta, phi = (broadcast_to(asarray(values, dtype=float), p.shape[:1])
+                      for values in (theta, phi))
+        valid = ~isnan(p)
+        p_valid = where(valid, p, 0.)
+
+        total = p_valid.sum(axis=1)
+        with errstate(invalid='ignore', divide='ignore'):
+            xbest = (p_valid * where(valid, x, 0.)).sum(axis=1) / total
+            ybest = (p_valid * where(valid, y, 0.)).sum(axis=1) / total
+        chi2best = full(len(p), 10. ** 99)
+        factorbest = ones(len(p))
+
+        for gridsize in cls.GRID_SIZES:
+            xbest, ybest, chi2best, factorbest = cls.selectbest_many(
+                p, x, y, xbest, ybest, factorbest, chi2best, gridsize, theta,
+                phi)
+
+        enough = valid.sum(axis=1) >= 4
+        core_x = where(enough, xbest, nan)
+        core_y = where(enough, ybest, nan)
+        chi2best = where(enough, chi2best, nan)
+        size = where(enough, factorbest * ldf.EllipsLdf._Ne, nan)
+
+        return core_x, core_y, chi2best, size
+
+    @classmethod
+    def selectbest(cls, p, x, y, xstart, ystart, factorbest, chi2best,
+                   gridsize, theta, phi):
         """selects the best core position in grid around (xstart, ystart).
 
         :param p: detector particle density in m^-2.
         :param x,y: positions of detectors in m.
-        :param xcmass,ycmass: start position of core in m.
+        :param xstart,ystart: start position of core in m.
 
         """
-        xbest = xstart
-        ybest = ystart
-
-        a = ldf.EllipsLdf(zenith=theta, azimuth=phi)
-        for i in range(41):
-            xtry = xstart + (i - 20) * gridsize
-            for j in range(11):
-                ytry = ystart + (i - 20) * gridsize
-                xstations = array(x)
-                ystations = array(y)
-                r, angle = a.calculate_core_distance_and_angle(
-                    xstations, ystations, xtry, ytry)
-                rho = a.calculate_ldf_value(r, angle)
-
-                mmdivl = 0.
-                m = 0.
-                l = 0.
-
-                for i, j in zip(p, rho):
-                    mmdivl += 1. * i * i / j
-                    m += i
-                    l += j
-
-                sizefactor = sqrt(mmdivl / l)
-                with warnings.catch_warnings(record=True):
-                    chi2 = 2. * (sizefactor * l - m)
-                if chi2 < chi2best:
-                    factorbest = sizefactor
-                    xbest = xtry
-                    ybest = ytry
-                    chi2best = chi2
+        xbest, ybest, chi2best, factorbest = cls.selectbest_many(
+            [p], [x], [y], [xstart], [ystart], [factorbest], [chi2best],
+            gridsize, [theta], [phi])
+        return xbest[0], ybest[0], chi2best[0], factorbest[0]
+
+    @classmethod
+    def selectbest_many(cls, p, x, y, xstart, ystart, factorbest, chi2best,
+                        gridsize, theta, phi):
+        """Select the best core positions in grids around the start positions
+
+        :param p: detector particle densities in m^-2, array with shape
+                  (number of coincidences, number of detectors), missing
+                  detections are indicated by nan densities.
+        :param x,y: positions of detectors in m, arrays with the same
+                    shape as p.
+        :param xstart,ystart: arrays of start positions of the cores in m.
+        :param factorbest,chi2best: arrays of the current best size factors
+                                    and chi2 values.
+        :param gridsize: distance between grid points in m.
+        :param theta,phi: arrays of zenith and azimuth angles in rad.
+        :return: arrays of best core x, core y, chi2 and size factor.
+
+        """
+        p, xstart, ystart, factorbest, chi2best = (
+            asarray(values, dtype=float)
+            for values in (p, xstart, ystart, factorbest, chi2best))
+        xtry, ytry = cls._grid(p, xstart, ystart, gridsize)
+        chi2, sizefactor = cls.grid_chi2(p, x, y, xtry, ytry, theta, phi)
+
+        # The first of the smallest chi2 values, if better than chi2best
+        chi2 = where(isnan(chi2), inf, chi2)
+        rows = arange(len(chi2))
+        idx = chi2.argmin(axis=1)
+        better = chi2[rows, idx] < chi2best
+
+        xbest = where(better, xtry[rows, idx], xstart)
+        ybest = where(better, ytry[rows, idx], ystart)
+        chi2best = where(better, chi2[rows, idx], chi2best)
+        factorbest = where(better, sizefactor[rows, idx], factorbest)
 
         return xbest, ybest, chi2best, factorbest
+
+    @staticmethod
+    def _grid(p, xstart, ystart, gridsize):
+        """Get the core positions to try around the start positions
+
+        For each of the 41 x offsets the grid contains the position with
+        the same y offset, and the position with the y offset given by
+        the last detector density, ``(p[-1] - 20) * gridsize``. These are
+        the positions which were tried by the nested loops previously used
+        in :meth:`selectbest`, because the inner loop reused the loop
+        variable.
+
+        :param p: detector particle densities, array with shape (number
+                  of coincidences, number of detectors).
+        :param xstart,ystart: arrays of start positions of the cores in m.
+        :param gridsize: distance between grid points in m.
+        :return: arrays of x and y of the positions to try, with shape
+                 (number of coincidences, number of positions).
+
+        """
+        valid = ~isnan(p)
+        last = valid.shape[1] - 1 - valid[:, ::-1].argmax(axis=1)
+        p_last = p[arange(len(p)), last]
+
+        offsets = (arange(41) - 20) * gridsize
+        xtry = xstart[:, newaxis] + offsets
+        ytry_diagonal = ystart[:, newaxis] + offsets
+        ytry_last = (ystart + (p_last - 20) * gridsize)[:, newaxis]
+        ytry_last = broadcast_to(ytry_last, ytry_diagonal.shape)
+
+        xtry = stack([xtry, xtry], axis=2).reshape(len(p), -1)
+        ytry = stack([ytry_diagonal, ytry_last], axis=2).reshape(len(p), -1)
+
+        return xtry, ytry
+
+    @staticmethod
+    def grid_chi2(p, x, y, xtry, ytry, theta, phi):
+        """Calculate chi2 and size factor for many core positions
+
+        The LDF is evaluated for all coincidences and core positions at
+        once.
+
+        :param p: detector particle densities in m^-2, array with shape
+                  (number of coincidences, number of detectors), missing
+                  detections are indicated by nan densities.
+        :param x,y: positions of detectors in m, arrays with the same
+                    shape as p.
+        :param xtry,ytry: core positions to try in m, arrays with shape
+                          (number of coincidences, number of positions).
+        :param theta,phi: arrays of zenith and azimuth angles in rad.
+        :return: arrays of chi2 and size factor, with the same shape as
+                 xtry.
+
+        """
+        p, x, y, xtry, ytry, theta, phi = (
+            asarray(values, dtype=float)
+            for values in (p, x, y, xtry, ytry, theta, phi))
+        a = ldf.EllipsLdf(zenith=theta[:, newaxis, newaxis],
+                          azimuth=phi[:, newaxis, newaxis])
+        r, angle = a.calculate_core_distance_and_angle(
+            x[:, newaxis, :], y[:, newaxis, :], xtry[:, :, newaxis],
+            ytry[:, :, newaxis])
+        rho = a.calculate_ldf_value(r, angle)
+
+        p = p[:, newaxis, :]
+        valid = ~isnan(p)
+        with errstate(invalid='ignore', divide='ignore'):
+            mmdivl = where(valid, p * p / rho, 0.).sum(axis=2)
+            m = where(valid, p, 0.).sum(axis=2)
+            rho_sum = where(valid, rho, 0.).sum(axis=2)
+
+            sizefactor = sqrt(mmdivl / rho_sum)
+            chi2 = 2. * (sizefactor * rho_sum - m)
+
+        return chi2, sizefactor
@@ -12,14 +12,21 @@
     optionally z positions and previous reconstruction results. The data
     is then prepared for the algorithm and passed to
     the :meth:`~DirectAlgorithm.reconstruct` method which returns the
-    reconstructed theta and phi coordinates.
+    reconstructed theta and phi coordinates. Some algorithms also have a
+    :meth:`~RegressionAlgorithm.reconstruct_common_many` method, which
+    reconstructs many events at once from arrays of arrival times and
+    positions.
 
 """
 import warnings
+from bisect import bisect_right
+from collections import defaultdict
 from itertools import izip_longest, combinations
 
 from numpy import (nan, isnan, arcsin, arccos, arctan2, sin, cos, tan,
-                   sqrt, where, pi, inf, array, cross, dot)
+                   sqrt, where, pi, inf, array, cross, dot, asarray,
+                   broadcast_to, broadcast_arrays, zeros, zeros_like, ones,
+                   errstate, fmin, maximum, newaxis, stack)
 from scipy.optimize import minimize
 
 from .event_utils import (station_arrival_time, detector_arrival_time,
@@ -66,21 +73,7 @@ class EventDirectionReconstruction(object):
         :return: theta, phi, and detector ids.
 
         """
-        t, x, y, z, ids = ([], [], [], [], [])
-        if detector_ids is None:
-            detector_ids = range(4)
-        self.station.cluster.set_timestamp(event['timestamp'])
-        if isinstance(offsets, Station):
-            offsets = offsets.detector_timing_offset(event['timestamp'])
-        for id in detector_ids:
-            t_detector = detector_arrival_time(event, id, offsets)
-            if not isnan(t_detector):
-                dx, dy, dz = self.station.detectors[id].get_coordinates()
-                t.append(t_detector)
-                x.append(dx)
-                y.append(dy)
-                z.append(dz)
-                ids.append(id)
+        t, x, y, z, ids = self._get_detections(event, detector_ids, offsets)
         if len(t) == 3:
             theta, phi = self.direct.reconstruct_common(t, x, y, z, initial)
         elif len(t) > 3:
@@ -105,6 +98,11 @@ class EventDirectionReconstruction(object):
 
         """
         events = pbar(events, show=progress)
+        if (hasattr(self.direct, 'reconstruct_common_many') or
+                hasattr(self.fit, 'reconstruct_common_many')):
+            return self._reconstruct_events_in_bulk(events, detector_ids,
+                                                    offsets, initials)
+
         events_init = izip_longest(events, initials, fillvalue={})
         angles = [self.reconstruct_event(event, detector_ids, offsets, initial)
                   for event, initial in events_init]
@@ -114,6 +112,137 @@ class EventDirectionReconstruction(object):
             theta, phi, ids = ((), (), ())
         return theta, phi, ids
 
+    def _reconstruct_events_in_bulk(self, events, detector_ids=None,
+                                    offsets=NO_OFFSET, initials=[]):
+        """Reconstruct events, grouped by layout epoch and valid detectors
+
+        The results are the same as those of :meth:`reconstruct_event`.
+        The detector positions and offsets are only determined once for
+        each layout epoch, see :meth:`_get_layout_timestamps`. All events
+        from the same epoch with the same valid detectors are reconstructed
+        at once using the ``reconstruct_common_many`` method of the
+        algorithm, if it has one.
+
+        """
+        layout_timestamps = self._get_layout_timestamps(offsets)
+        layouts = {}
+        epochs = []
+        detections = []
+        for event in events:
+            epoch = bisect_right(layout_timestamps, event['timestamp'])
+            if epoch not in layouts:
+                layouts[epoch] = self._get_layout(event['timestamp'], offsets)
+            epochs.append(epoch)
+            detection = self._get_detections(event, detector_ids,
+                                             layout=layouts[epoch])
+            detections.append(detection)
+        initials = [initial for _, initial in
+                    izip_longest(detections, initials, fillvalue={})]
+        theta = [nan] * len(detections)
+        phi = [nan] * len(detections)
+
+        groups = defaultdict(list)
+        for idx, (epoch, detection) in enumerate(zip(epochs, detections)):
+            groups[epoch, tuple(detection[4])].append(idx)
+
+        for (_, ids), group in groups.items():
+            if len(ids) == 3:
+                algorithm = self.direct
+            elif len(ids) > 3:
+                algorithm = self.fit
+            else:
+                continue
+
+            if hasattr(algorithm, 'reconstruct_common_many'):
+                # All events in the group share the detector positions
+                _, x, y, z, _ = detections[group[0]]
+                t = [detections[idx][0] for idx in group]
+                angles = zip(*algorithm.reconstruct_common_many(t, x, y, z))
+            else:
+                angles = [algorithm.reconstruct_common(
+                    *(detections[idx][:4] + (initials[idx],)))
+                    for idx in group]
+            for idx, (event_theta, event_phi) in zip(group, angles):
+                theta[idx] = event_theta
+                phi[idx] = event_phi
+
+        ids = tuple(detection[4] for detection in detections)
+        return tuple(theta), tuple(phi), ids
+
+    def _get_layout_timestamps(self, offsets=NO_OFFSET):
+        """Get the timestamps at which the station layout may change
+
+        Between two consecutive timestamps the positions of the detectors,
+        and the detector offsets if they come from a
+        :class:`~sapphire.api.Station` object, are constant.
+
+        :param offsets: time offsets for each detector or a
+            :class:`~sapphire.api.Station` object.
+        :return: sorted list of timestamps.
+
+        """
+        timestamps = set(self.station.timestamps)
+        for detector in self.station.detectors:
+            timestamps.update(detector.timestamps)
+        if isinstance(offsets, Station):
+            timestamps.update(offsets.detector_timing_offsets['timestamp'])
+        return sorted(timestamps)
+
+    def _get_layout(self, timestamp, offsets=NO_OFFSET):
+        """Get the detector positions and offsets valid for a timestamp
+
+        :param timestamp: timestamp in seconds.
+        :param offsets: time offsets for each detector or a
+            :class:`~sapphire.api.Station` object.
+        :return: list of the positions of all detectors and the detector
+                 offsets.
+
+        """
+        self.station.cluster.set_timestamp(timestamp)
+        if isinstance(offsets, Station):
+            offsets = offsets.detector_timing_offset(timestamp)
+        positions = [detector.get_coordinates()
+                     for detector in self.station.detectors]
+        return positions, offsets
+
+    def _get_detections(self, event, detector_ids=None, offsets=NO_OFFSET,
+                        layout=None):
+        """Get the arrival times and positions of the detections
+
+        :param event: an event (e.g. from an events table).
+        :param detector_ids: list of the detectors to use.
+        :param offsets: time offsets for each detector or a
+            :class:`~sapphire.api.Station` object.
+        :param layout: detector positions and offsets valid for the event,
+            as returned by :meth:`_get_layout`. If given, offsets is
+            ignored.
+        :return: lists of arrival times, x, y, and z positions and
+                 detector ids of the detectors with a valid arrival time.
+
+        """
+        t, x, y, z, ids = ([], [], [], [], [])
+        if detector_ids is None:
+            detector_ids = range(4)
+        if layout is None:
+            self.station.cluster.set_timestamp(event['timestamp'])
+            if isinstance(offsets, Station):
+                offsets = offsets.detector_timing_offset(event['timestamp'])
+        else:
+            positions, offsets = layout
+        for id in detector_ids:
+            t_detector = detector_arrival_time(event, id, offsets)
+            if not isnan(t_detector):
+                if layout is None:
+                    dx, dy, dz = self.station.detectors[id].get_coordinates()
+                else:
+                    dx, dy, dz = positions[id]
+                t.append(t_detector)
+                x.append(dx)
+                y.append(dy)
+                z.append(dz)
+                ids.append(id)
+        return t, x, y, z, ids
+
 
 class CoincidenceDirectionReconstruction(object):
 
@@ -128,6 +257,10 @@ class CoincidenceDirectionReconstruction(object):
 
     """
 
+    #: Number of coincidences with a core which are reconstructed at once
+    #: by the ``reconstruct_common_many`` method of the curved algorithm.
+    BULK_SIZE = 10000
+
     def __init__(self, cluster):
         self.direct = DirectAlgorithmCartesian3D
         self.fit = RegressionAlgorithm3D
@@ -152,32 +285,8 @@ class CoincidenceDirectionReconstruction(object):
         if len(coincidence_events) < 3:
             return nan, nan, []
 
-        # Subtract base timestamp to prevent loss of precision
-        ts0 = int(coincidence_events[0][1]['timestamp'])
-        ets0 = ts0 * int(1e9)
-        self.cluster.set_timestamp(ts0)
-        t, x, y, z, nums = ([], [], [], [], [])
-
-        # Get relevant offsets. TODO: station offsets
-        offsets = {s: o if not isinstance(o, Station)
-                   else o.detector_timing_offset(ts0)
-                   for s, o in offsets.iteritems()}
-
-        for station_number, event in coincidence_events:
-            if station_numbers is not None:
-                if station_number not in station_numbers:
-                    continue
-            t_off = offsets.get(station_number, NO_OFFSET)
-            station = self.cluster.get_station(station_number)
-            t_first = station_arrival_time(event, ets0, offsets=t_off,
-                                           station=station)
-            if not isnan(t_first):
-                sx, sy, sz = station.calc_center_of_mass_coordinates()
-                t.append(t_first)
-                x.append(sx)
-                y.append(sy)
-                z.append(sz)
-                nums.append(station_number)
+        t, x, y, z, nums = self._get_detections(coincidence_events,
+                                                station_numbers, offsets)
 
         if len(t) >= 3 and 'core_x' in initial and 'core_y' in initial:
             theta, phi = self.curved.reconstruct_common(t, x, y, z, initial)
@@ -209,15 +318,136 @@ class CoincidenceDirectionReconstruction(object):
         """
         coincidences = pbar(coincidences, show=progress)
         coin_init = izip_longest(coincidences, initials, fillvalue={})
-        angles = [self.reconstruct_coincidence(coincidence, station_numbers,
-                                               offsets, initial)
-                  for coincidence, initial in coin_init]
+        if hasattr(self.curved, 'reconstruct_common_many'):
+            angles = self._reconstruct_coincidences_with_cores(
+                coin_init, station_numbers, offsets)
+        else:
+            angles = [self.reconstruct_coincidence(coincidence,
+                                                   station_numbers, offsets,
+                                                   initial)
+                      for coincidence, initial in coin_init]
         if len(angles):
             theta, phi, nums = zip(*angles)
         else:
             theta, phi, nums = ((), (), ())
         return theta, phi, nums
 
+    def _reconstruct_coincidences_with_cores(self, coin_init,
+                                             station_numbers=None,
+                                             offsets={}):
+        """Reconstruct coincidences, those with a core all at once
+
+        The results are the same as those of
+        :meth:`reconstruct_coincidence`. Coincidences for which the
+        initial values include a core position are reconstructed together,
+        in chunks of :attr:`BULK_SIZE` coincidences, using the
+        ``reconstruct_common_many`` method of the ``curved`` algorithm.
+        The others are reconstructed one by one.
+
+        :param coin_init: iterable of (coincidence, initial) tuples.
+        :param station_numbers: list of station numbers, to only use
+                                events from those stations.
+        :param offsets: dictionary with detector offsets for each station.
+        :return: list of theta, phi, and station numbers tuples.
+
+        """
+        angles = []
+        curved = []
+        detections = []
+        initials = []
+        for coincidence, initial in coin_init:
+            if ('core_x' not in initial or 'core_y' not in initial or
+                    len(coincidence) < 3):
+                angles.append(self.reconstruct_coincidence(
+                    coincidence, station_numbers, offsets, initial))
+                continue
+            t, x, y, z, nums = self._get_detections(coincidence,
+                                                    station_numbers, offsets)
+            angles.append((nan, nan, nums))
+            if len(t) >= 3:
+                curved.append(len(angles) - 1)
+                detections.append((t, x, y, z))
+                initials.append(initial)
+                if len(curved) >= self.BULK_SIZE:
+                    self._reconstruct_curved_many(angles, curved, detections,
+                                                  initials)
+                    curved, detections, initials = [], [], []
+
+        if curved:
+            self._reconstruct_curved_many(angles, curved, detections,
+                                          initials)
+
+        return angles
+
+    def _reconstruct_curved_many(self, angles, curved, detections,
+                                 initials):
+        """Reconstruct a chunk of coincidences with a core at once
+
+        :param angles: list of theta, phi, and station numbers tuples, the
+                       angles of the reconstructed coincidences are
+                       updated in place.
+        :param curved: indexes in angles of the coincidences to
+                       reconstruct.
+        :param detections: arrival times and x, y, and z positions of the
+                           detections of each coincidence.
+        :param initials: the initial values of each coincidence.
+
+        """
+        # Pad the detections with nan to get equal numbers of detections
+        n = max(len(t) for t, _, _, _ in detections)
+        t, x, y, z = (
+            [list(values) + [nan] * (n - len(values))
+             for values in detection_values]
+            for detection_values in zip(*detections))
+        theta, phi = self.curved.reconstruct_common_many(t, x, y, z,
+                                                         initials)
+        for idx, coincidence_theta, coincidence_phi in zip(curved, theta,
+                                                           phi):
+            angles[idx] = (coincidence_theta, coincidence_phi, angles[idx][2])
+
+    def _get_detections(self, coincidence_events, station_numbers=None,
+                        offsets={}):
+        """Get the arrival times and positions of the stations
+
+        :param coincidence_events: a coincidence list consisting of
+                                   (station_number, event) tuples.
+        :param station_numbers: list of station numbers, to only use
+                                events from those stations.
+        :param offsets: dictionary with detector offsets for each station.
+        :return: lists of arrival times, x, y, and z positions and the
+                 station numbers of the stations with a valid arrival
+                 time.
+
+        """
+        # Subtract base timestamp to prevent loss of precision
+        ts0 = int(coincidence_events[0][1]['timestamp'])
+        ets0 = ts0 * int(1e9)
+        self.cluster.set_timestamp(ts0)
+        t, x, y, z, nums = ([], [], [], [], [])
+
+        # Get relevant offsets. TODO: station offsets
+        offsets = {s: o if not isinstance(o, Station)
+                   else o.detector_timing_offset(ts0)
+                   for s, o in offsets.iteritems()}
+
+        for station_number, event in coincidence_events:
+            if station_numbers is not None:
+                if station_number not in station_numbers:
+                    continue
+            t_off = offsets.get(station_number, NO_OFFSET)
+            station = self.cluster.get_station(station_number)
+            t_first = station_arrival_time(event, ets0, offsets=t_off,
+                                           station=station)
+            if not isnan(t_first):
+                sx, sy, sz = station.calc_center_of_mass_coordinates()
+                t.append(t_first)
+                x.append(sx)
+                y.append(sy)
+                z.append(sz)
+                nums.append(station_number)
+
+        return t, x, y, z, nums
+
 
 class CoincidenceDirectionReconstructionDetectors(
         CoincidenceDirectionReconstruction):
@@ -229,24 +459,20 @@ class CoincidenceDirectionReconstructionDetectors(
 
     """
 
-    def reconstruct_coincidence(self, coincidence_events, station_numbers=None,
-                                offsets={}, initial={}):
-        """Reconstruct a single coincidence
+    def _get_detections(self, coincidence_events, station_numbers=None,
+                        offsets={}):
+        """Get the arrival times and positions of the detectors
 
-        :param coincidence_events: a coincidence list consisting of three
-                                   or more (station_number, event) tuples.
+        :param coincidence_events: a coincidence list consisting of
+                                   (station_number, event) tuples.
         :param station_numbers: list of station numbers, to only use
                                 events from those stations.
         :param offsets: dictionary with detector offsets for each station.
-                        These detector offsets should be relative to one
-                        detector from a specific station.
-        :param initial: dictionary with already fitted shower parameters.
-        :return: list of theta, phi, and station numbers.
+        :return: lists of arrival times, x, y, and z positions of the
+                 detectors with a valid arrival time, and the station
+                 numbers of the stations with at least one of those.
 
         """
-        if len(coincidence_events) < 3:
-            return nan, nan, []
-
         # Subtract base timestamp to prevent loss of precision
         ts0 = int(coincidence_events[0][1]['timestamp'])
         ets0 = ts0 * int(1e9)
@@ -277,16 +503,7 @@ class CoincidenceDirectionReconstructionDetectors(
             if not all(isnan(t_detectors)):
                 nums.append(station_number)
 
-        if len(t) >= 3 and 'core_x' in initial and 'core_y' in initial:
-            theta, phi = self.curved.reconstruct_common(t, x, y, z, initial)
-        elif len(t) == 3:
-            theta, phi = self.direct.reconstruct_common(t, x, y, z, initial)
-        elif len(t) > 3:
-            theta, phi = self.fit.reconstruct_common(t, x, y, z, initial)
-        else:
-            theta, phi = (nan, nan)
-
-        return theta, phi, nums
+        return t, x, y, z, nums
 
 
 class DirectAlgorithm(object):
@@ -640,6 +857,85 @@ class DirectAlgorithmCartesian3D(object):
 
         return theta, phi
 
+    @classmethod
+    def reconstruct_common_many(cls, t, x, y, z=None):
+        """Reconstruct angles for many events with 3 detections at once
+
+        :param t: arrival times in detector 0, 1 and 2 in ns, array with
+                  shape (number of events, 3).
+        :param x,y,z: positions of detector 0, 1 and 2 in m, arrays with
+                      the same shape as t, or with one position for each
+                      detector.
+        :return: arrays of theta and phi.
+
+        """
+        if z is None:
+            z = zeros_like(x)
+
+        t, x, y, z = _as_detection_arrays(t, x, y, z)
+
+        if t.shape[1] > 3:
+            warning_only_three()
+
+        dt = t[:, 1:3] - t[:, :1]
+        dx = x[:, 1:3] - x[:, :1]
+        dy = y[:, 1:3] - y[:, :1]
+        dz = z[:, 1:3] - z[:, :1]
+
+        return cls.reconstruct_many(dt[:, 0], dt[:, 1], dx[:, 0], dx[:, 1],
+                                    dy[:, 0], dy[:, 1], dz[:, 0], dz[:, 1])
+
+    @staticmethod
+    def reconstruct_many(dt1, dt2, dx1, dx2, dy1, dy2, dz1=0, dz2=0):
+        """Reconstruct angles for many events with 3 detections at once
+
+        This gives the same results as :meth:`reconstruct` for each event.
+
+        :param dt#: arrays of arrival times in detector 1 and 2 relative
+                    to detector 0 in ns.
+        :param dx#,dy#,dz#: arrays of positions of detector 1 and 2
+                            relative to detector 0 in m.
+        :return: arrays of theta and phi.
+
+        """
+        dt1, dt2, dx1, dx2, dy1, dy2, dz1, dz2 = broadcast_arrays(
+            *[asarray(value, dtype=float)
+              for value in (dt1, dt2, dx1, dx2, dy1, dy2, dz1, dz2)])
+
+        d1 = stack([dx1, dy1, dz1], axis=-1)
+        d2 = stack([dx2, dy2, dz2], axis=-1)
+        u = c * (dt2[..., newaxis] * d1 - dt1[..., newaxis] * d2)
+        v = cross(d1, d2)
+        uxv = cross(u, v)
+
+        usquared = (u * u).sum(axis=-1)
+        vsquared = (v * v).sum(axis=-1)
+        underroot = vsquared - usquared
+        valid = (underroot > 0) & (vsquared != 0)
+
+        with errstate(invalid='ignore', divide='ignore'):
+            term = v * sqrt(underroot)[..., newaxis]
+            nplus = (uxv + term) / vsquared[..., newaxis]
+            nmin = (uxv - term) / vsquared[..., newaxis]
+
+            phiplus = arctan2(nplus[..., 1], nplus[..., 0])
+            thetaplus = arccos(nplus[..., 2])
+
+            phimin = arctan2(nmin[..., 1], nmin[..., 0])
+            thetamin = arccos(nmin[..., 2])
+
+        thetaplus = where(isnan(thetaplus), pi, thetaplus)
+        thetamin = where(isnan(thetamin), pi, thetamin)
+
+        # Allow solution only if it is the only one above horizon
+        plus = valid & (thetaplus <= pi / 2.) & (thetamin > pi / 2.)
+        minus = valid & (thetaplus > pi / 2.) & (thetamin <= pi / 2.)
+
+        theta = where(plus, thetaplus, where(minus, thetamin, nan))
+        phi = where(plus, phiplus, where(minus, phimin, nan))
+
+        return theta, phi
+
 
 class SphereAlgorithm(object):
 
@@ -942,6 +1238,76 @@ class RegressionAlgorithm(object):
 
         return theta, phi
 
+    @classmethod
+    def reconstruct_common_many(cls, t, x, y, z=None):
+        """Reconstruct angles for many events with 3 or more detections
+
+        :param t: arrival times in the detectors in ns, array with shape
+                  (number of events, number of detectors), missing
+                  detections are indicated by nan arrival times.
+        :param x,y,z: positions of the detectors in m, arrays with the same
+                      shape as t, or with one position for each detector.
+                      The height is ignored.
+        :return: arrays of theta and phi.
+
+        """
+        return cls.reconstruct_many(t, x, y)
+
+    @classmethod
+    def reconstruct_many(cls, t, x, y, z=None):
+        """Reconstruct angles for many events at once
+
+        This gives the same results as :meth:`reconstruct` for each event.
+        The detections of each event are on a row, missing detections are
+        indicated by nan arrival times.
+
+        :param t: arrival times in the detectors in ns, array with shape
+                  (number of events, number of detectors).
+        :param x,y: positions of the detectors in m, arrays with the same
+                    shape as t, or with one position for each detector.
+        :param z: is ignored.
+        :return: arrays of theta and phi.
+
+        """
+        t, x, y = _as_detection_arrays(t, x, y)
+        valid = ~isnan(t)
+        passed = logic_checks_many(t, x, y, zeros_like(t))
+
+        t = where(valid, t, 0.)
+        x = where(valid, x, 0.)
+        y = where(valid, y, 0.)
+
+        xx = (x * x).sum(axis=1)
+        xy = (x * y).sum(axis=1)
+        tx = (x * t).sum(axis=1)
+        yy = (y * y).sum(axis=1)
+        ty = (y * t).sum(axis=1)
+        xs = x.sum(axis=1)
+        ys = y.sum(axis=1)
+        ts = t.sum(axis=1)
+        k = valid.sum(axis=1)
+
+        with errstate(invalid='ignore', divide='ignore'):
+            denom = (k * xy * xy + xs * xs * yy + ys * ys * xx - k * xx * yy -
+                     2 * xs * ys * xy)
+            denom = where(denom == 0, nan, denom)
+
+            numer = (tx * (k * yy - ys * ys) + xy * (ts * ys - k * ty) +
+                     xs * ys * ty - ts * xs * yy)
+            nx = c * numer / denom
+
+            numer = (ty * (k * xx - xs * xs) + xy * (ts * xs - k * tx) +
+                     xs * ys * tx - ts * ys * xx)
+            ny = c * numer / denom
+
+            horiz = nx * nx + ny * ny
+            passed &= ~(horiz > 1.)
+            nz = sqrt(1 - nx * nx - ny * ny)
+            phi = where(passed, arctan2(ny, nx), nan)
+            theta = where(passed, arccos(nz), nan)
+
+        return theta, phi
+
 
 class RegressionAlgorithm3D(object):
 
@@ -1008,6 +1374,73 @@ class RegressionAlgorithm3D(object):
 
         return theta, phi
 
+    @classmethod
+    def reconstruct_common_many(cls, t, x, y, z=None):
+        """Reconstruct angles for many events with 3 or more detections
+
+        :param t: arrival times in the detectors in ns, array with shape
+                  (number of events, number of detectors), missing
+                  detections are indicated by nan arrival times.
+        :param x,y,z: positions of the detectors in m, arrays with the same
+                      shape as t, or with one position for each detector.
+                      The height for all detectors will be set to 0 if not
+                      given.
+        :return: arrays of theta and phi.
+
+        """
+        if z is None:
+            z = zeros_like(x)
+
+        return cls.reconstruct_many(t, x, y, z)
+
+    @classmethod
+    def reconstruct_many(cls, t, x, y, z):
+        """Reconstruct angles for many events at once
+
+        This gives the same results as :meth:`reconstruct` for each event.
+        The detections of each event are on a row, missing detections are
+        indicated by nan arrival times.  Each iteration only the events
+        which have not yet converged are projected and fitted again.
+
+        :param t: arrival times in the detectors in ns, array with shape
+                  (number of events, number of detectors).
+        :param x,y,z: positions of the detectors in m, arrays with the same
+                      shape as t, or with one position for each detector.
+        :return: arrays of theta and phi.
+
+        """
+        t, x, y, z = _as_detection_arrays(t, x, y, z)
+        passed = logic_checks_many(t, x, y, z)
+
+        theta, phi = RegressionAlgorithm.reconstruct_many(t, x, y)
+        theta[~passed] = nan
+        phi[~passed] = nan
+
+        active = passed.copy()
+        iteration = 0
+        while active.any():
+            iteration += 1
+            if iteration > cls.MAX_ITERATIONS:
+                theta[active] = nan
+                phi[active] = nan
+                break
+            idx = active.nonzero()[0]
+            theta_prev = theta[idx]
+            phi_prev = phi[idx]
+            with errstate(invalid='ignore', divide='ignore'):
+                nxnz = (tan(theta_prev) * cos(phi_prev))[:, newaxis]
+                nynz = (tan(theta_prev) * sin(phi_prev))[:, newaxis]
+                nz = cos(theta_prev)[:, newaxis]
+                dxproj = x[idx] - z[idx] * nxnz
+                dyproj = y[idx] - z[idx] * nynz
+                dtproj = t[idx] + z[idx] / (c * nz)
+            theta[idx], phi[idx] = RegressionAlgorithm.reconstruct_many(
+                dtproj, dxproj, dyproj)
+            with errstate(invalid='ignore'):
+                active[idx] = abs(theta[idx] - theta_prev) > 0.001
+
+        return theta, phi
+
 
 class CurvedRegressionAlgorithm(object):
 
@@ -1160,6 +1593,89 @@ class CurvedRegressionAlgorithm3D(object):
 
         return theta, phi
 
+    def reconstruct_common_many(self, t, x, y, z=None, initials=[]):
+        """Reconstruct angles for many coincidences with 3 or more detections
+
+        :param t: arrival times in the detectors in ns, array with shape
+                  (number of coincidences, number of detectors), missing
+                  detections are indicated by nan arrival times.
+        :param x,y,z: positions of the detectors in m, arrays with the same
+                      shape as t, or with one position for each detector.
+                      The height for all detectors will be set to 0 if not
+                      given.
+        :param initials: list of dictionaries containing values from
+                         previous reconstructions, including core position,
+                         one for each coincidence.
+        :return: arrays of theta and phi.
+
+        """
+        core_x = array([initial.get('core_x', nan) for initial in initials],
+                       dtype=float)
+        core_y = array([initial.get('core_y', nan) for initial in initials],
+                       dtype=float)
+        if z is None:
+            z = zeros_like(x)
+
+        return self.reconstruct_many(t, x, y, z, core_x, core_y)
+
+    def reconstruct_many(self, t, x, y, z, core_x, core_y):
+        """Reconstruct angles for many coincidences at once
+
+        This gives the same results as :meth:`reconstruct` for each
+        coincidence. The detections of each coincidence are on a row,
+        missing detections are indicated by nan arrival times. Each
+        iteration only the coincidences which have not yet converged are
+        projected and fitted again.
+
+        :param t: arrival times in the detectors in ns, array with shape
+                  (number of coincidences, number of detectors).
+        :param x,y,z: positions of the detectors in m, arrays with the same
+                      shape as t, or with one position for each detector.
+        :param core_x,core_y: arrays of core positions at z = 0 in m, one
+                              for each coincidence.
+        :return: arrays of theta and phi.
+
+        """
+        t, x, y, z = _as_detection_arrays(t, x, y, z)
+        core_x = broadcast_to(asarray(core_x, dtype=float), t.shape[:1])
+        core_y = broadcast_to(asarray(core_y, dtype=float), t.shape[:1])
+        passed = (logic_checks_many(t, x, y, z) & ~isnan(core_x) &
+                  ~isnan(core_y))
+
+        theta, phi = RegressionAlgorithm.reconstruct_many(t, x, y)
+        theta[~passed] = nan
+        phi[~passed] = nan
+
+        active = passed.copy()
+        iteration = 0
+        while active.any():
+            iteration += 1
+            if iteration > self.MAX_ITERATIONS:
+                theta[active] = nan
+                phi[active] = nan
+                break
+            idx = active.nonzero()[0]
+            theta_prev = theta[idx]
+            phi_prev = phi[idx]
+            with errstate(invalid='ignore', divide='ignore'):
+                nxnz = (tan(theta_prev) * cos(phi_prev))[:, newaxis]
+                nynz = (tan(theta_prev) * sin(phi_prev))[:, newaxis]
+                nz = cos(theta_prev)[:, newaxis]
+                xproj = x[idx] - z[idx] * nxnz
+                yproj = y[idx] - z[idx] * nynz
+                tproj = (t[idx] + z[idx] / (c * nz) -
+                         self.time_delay(xproj, yproj,
+                                         core_x[idx, newaxis],
+                                         core_y[idx, newaxis],
+                                         theta_prev[:, newaxis],
+                                         phi_prev[:, newaxis]))
+            theta[idx], phi[idx] = RegressionAlgorithm.reconstruct_many(
+                tproj, xproj, yproj)
+            with errstate(invalid='ignore'):
+                active[idx] = abs(theta[idx] - theta_prev) > 0.001
+
+        return theta, phi
+
     def time_delay(self, x, y, core_x, core_y, theta, phi):
         r = self.radial_core_distance(x, y, core_x, core_y, theta, phi)
         return self.front.delay_at_r(r)
@@ -1252,5 +1768,90 @@ def logic_checks(t, x, y, z):
     return True
 
 
+def logic_checks_many(t, x, y, z):
+    """Check for impossible reconstructions of many events
+
+    This is the equivalent of :func:`logic_checks` for many events.  The
+    detections of each event are on a row, missing detections are
+    indicated by nan arrival times.
+
+    :param t: arrival times in the detectors in ns, array with shape
+              (number of events, number of detectors).
+    :param x,y,z: positions of the detectors in m, arrays with the same
+                  shape as t, or with one position for each detector.
+    :return: boolean array, True for events which pass the checks.
+
+    """
+    t, x, y, z = _as_detection_arrays(t, x, y, z)
+    valid = ~isnan(t)
+    three = valid.sum(axis=1) == 3
+    passed = ones(len(t), dtype=bool)
+    n_detectors = t.shape[1]
+
+    with errstate(invalid='ignore', divide='ignore'):
+        # Check for identical positions and if the time difference is
+        # larger than expected by c, only for three detections
+        for i, j in combinations(range(n_detectors), 2):
+            pair = three & valid[:, i] & valid[:, j]
+            dt = abs(t[:, i] - t[:, j])
+            dx = x[:, i] - x[:, j]
+            dy = y[:, i] - y[:, j]
+            dz = z[:, i] - z[:, j]
+            identical = (dx == 0) & (dy == 0) & (dz == 0)
+            dt_max = vector_length(dx, dy, dz) / c
+            passed &= ~(pair & (identical | (dt_max < dt)))
+
+        # Check if all the positions are (almost) on a single line
+        largest_of_smallest_angles = zeros(len(t))
+        for i, j, k in combinations(range(n_detectors), 3):
+            triple = valid[:, i] & valid[:, j] & valid[:, k]
+            dx1 = x[:, i] - x[:, j]
+            dy1 = y[:, i] - y[:, j]
+            dz1 = z[:, i] - z[:, j]
+            dx2 = x[:, i] - x[:, k]
+            dy2 = y[:, i] - y[:, k]
+            dz2 = z[:, i] - z[:, k]
+            dx3 = dx2 - dx1
+            dy3 = dy2 - dy1
+            dz3 = dz2 - dz1
+            lenvec01 = vector_length(dx1, dy1, dz1)
+            lenvec02 = vector_length(dx2, dy2, dz2)
+            lenvec12 = vector_length(dx3, dy3, dz3)
+
+            area = abs(dx1 * dy2 - dx2 * dy1 + dy1 * dz2 - dy2 * dz1 +
+                       dz1 * dx2 - dz2 * dx1)
+
+            sin1 = area / lenvec01 / lenvec02
+            sin2 = area / lenvec01 / lenvec12
+            sin3 = area / lenvec02 / lenvec12
+
+            # like min() in logic_checks, ignoring sines which are nan due
+            # to identical positions
+            smallest_angle = where(isnan(sin1), 0.,
+                                   fmin(sin1, fmin(sin2, sin3)))
+            largest_of_smallest_angles = maximum(
+                largest_of_smallest_angles,
+                where(triple, smallest_angle, 0.))
+
+    passed &= largest_of_smallest_angles >= 0.1
+
+    return passed
+
+
+def _as_detection_arrays(t, *positions):
+    """Convert arrival times and positions to float arrays of equal shape
+
+    :param t: arrival times, array with shape (number of events, number of
+              detectors).
+    :param positions: positions with the same shape as t, or one for each
+                      detector.
+    :return: list of arrays of arrival times and positions.
+
+    """
+    t = asarray(t, dtype=float)
+    return [t] + [broadcast_to(asarray(values, dtype=float), t.shape)
+                  for values in positions]
+
+
 def warning_only_three():
     warnings.warn('Only the first three detections will be used')
@@ -6,10 +6,15 @@ and shower arrival time in detectors or a station. These functions are
 aware of processed events (i.e. reconstructed number of MIPs, arrival
 times and trigger time) and stations.
 
+The arrival time functions also have a ``_many`` variant which takes an
+array of events and returns arrays with the results for all events.
+
 """
+import warnings
+
 from ..utils import ERR
 
-from numpy import nan, nanmin, nanmean
+from numpy import nan, nanmin, nanmean, array, asarray, where, newaxis
 
 
 NO_OFFSET = [0., 0., 0., 0.]
@@ -168,6 +173,120 @@ def detector_arrival_time(event, detector_id, offsets=NO_OFFSET):
     return t
 
 
+def station_arrival_time_many(events, reference_ext_timestamps,
+                              detector_ids=None, offsets=NO_OFFSET,
+                              station=None):
+    """Get station arrival times for many events, i.e. first detector hits
+
+    Array version of :func:`station_arrival_time`.
+
+    :param events: array of processed events.
+    :param reference_ext_timestamps: reference extended timestamp (in ns)
+        for each event, or a single one for all events.
+    :param detector_ids: list of detectors ids for which to consider.
+    :param offsets: list of detector time offsets, or an array with the
+        detector time offsets for each event.
+    :param station: :class:`~sapphire.clusters.Station` object, used to
+        determine the number of detectors.
+    :return: array of shower arrival times of the station relative to the
+             reference timestamps.
+
+    """
+    arrival_times = detector_arrival_times_many(events, detector_ids,
+                                                offsets, station)
+    with warnings.catch_warnings():
+        # Events without any detector hit give nan
+        warnings.simplefilter('ignore', RuntimeWarning)
+        t_first = nanmin(arrival_times, axis=1)
+    t = (_ext_timestamp_differences(events, reference_ext_timestamps) -
+         _trigger_times(events) + t_first)
+    return t
+
+
+def relative_detector_arrival_times_many(events, reference_ext_timestamps,
+                                         detector_ids=None, offsets=NO_OFFSET,
+                                         station=None):
+    """Get relative arrival times for all detectors for many events
+
+    Array version of :func:`relative_detector_arrival_times`.
+
+    :param events: array of processed events.
+    :param reference_ext_timestamps: reference extended timestamp (in ns)
+        for each event, or a single one for all events.
+    :param detector_ids: list of detectors ids for which to get arrival times.
+    :param offsets: list of detector time offsets, or an array with the
+        detector time offsets for each event.
+    :param station: :class:`~sapphire.clusters.Station` object, used to
+        determine the number of detectors.
+    :return: array of shower arrival times relative to the reference
+             timestamps, with shape (number of events, number of detectors).
+
+    """
+    arrival_times = detector_arrival_times_many(events, detector_ids,
+                                                offsets, station)
+    t = ((_ext_timestamp_differences(events, reference_ext_timestamps) -
+          _trigger_times(events))[:, newaxis] + arrival_times)
+    return t
+
+
+def detector_arrival_times_many(events, detector_ids=None, offsets=NO_OFFSET,
+                                station=None):
+    """Get corrected arrival times for all detectors for many events
+
+    Array version of :func:`detector_arrival_times`. If neither detector
+    ids nor a station are given the arrival times of all four detectors
+    are returned, with nan for detectors which are not present in an
+    event.
+
+    :param events: array of processed events.
+    :param detector_ids: list of detectors ids for which to get arrival times.
+    :param offsets: list of detector time offsets, or an array with the
+        detector time offsets for each event.
+    :param station: :class:`~sapphire.clusters.Station` object, used to
+        determine the number of detectors.
+    :return: array of shower arrival times relative to the start of the
+             trace, with shape (number of events, number of detectors).
+
+    """
+    present = True
+    if detector_ids is None:
+        if station is not None:
+            detector_ids = get_detector_ids(station)
+        else:
+            detector_ids = range(4)
+            present = events['pulseheights'][:, :4] != -1
+    detector_ids = list(detector_ids)
+    arrival_times = array([events['t%d' % (id + 1)] for id in detector_ids],
+                          dtype=float).T.reshape(len(events),
+                                                 len(detector_ids))
+    offsets = asarray(offsets, dtype=float)[..., detector_ids]
+    valid = present
+    for err in ERR:
+        valid = valid & (arrival_times != err)
+    t = where(valid, arrival_times - offsets, nan)
+    return t
+
+
+def _ext_timestamp_differences(events, reference_ext_timestamps):
+    """Get the extended timestamps relative to the reference timestamps
+
+    The differences are calculated with integers, because floats do not
+    have enough precision to represent large timestamps in nanoseconds.
+
+    """
+    return (events['ext_timestamp'].astype('int64') -
+            asarray(reference_ext_timestamps).astype('int64'))
+
+
+def _trigger_times(events):
+    """Get the trigger times, with nan for error values"""
+
+    t_trigger = events['t_trigger'].astype(float)
+    for err in ERR:
+        t_trigger = where(t_trigger == err, nan, t_trigger)
+    return t_trigger
+
+
 def get_detector_ids(station=None, event=None):
     """Determine the detector ids based on the station object or event data
 
@@ -27,23 +27,31 @@
                     proc.process_and_store_results()
 
 """
-import zlib
 from itertools import izip
+from multiprocessing import Pool
 import operator
 import os
+import shutil
+import tempfile
 import warnings
 
 import tables
 import numpy as np
+from lazy import lazy
 
+from . import trace_store
 from ..api import Station
-from ..utils import pbar, ERR
+from ..utils import pbar, ERR, trace_cache
 from .find_mpv import FindMostProbableValueInSpectrum
 from .process_traces import (ADC_TIME_PER_SAMPLE, ADC_LOW_THRESHOLD,
                              ADC_HIGH_THRESHOLD)
 
 ADC_THRESHOLD = 20  #: Threshold for arrival times, relative to the baseline
 ADC_LIMIT = 2 ** 12
+#: Number of events for which the traces are decoded at once
+TRACE_BLOCK_SIZE = 500
+#: Value used to pad traces to a common length, below any threshold
+TRACE_PADDING = np.iinfo(np.int16).min
 
 #: Default trigger for 2-detector station
 #: 2 low and no high, no external
@@ -87,6 +95,11 @@ class ProcessEvents(object):
         'n4': tables.Float32Col(pos=20, dflt=-1),
         't_trigger': tables.Float32Col(pos=21, dflt=-1)}
 
+    #: Reconstruct the arrival times for blocks of events at once.
+    #: Subclasses which reconstruct the arrival times of each event or trace
+    #: separately disable this.
+    process_traces_in_blocks = True
+
     def __init__(self, data, group, source=None, progress=True):
         """Initialize the class.
 
@@ -315,6 +328,9 @@ class ProcessEvents(object):
             progress bar.  Optional.
 
         """
+        if self.process_traces_in_blocks:
+            return self._process_traces_from_event_blocks(events, length)
+
         result = []
         for event in pbar(events, length=length, show=self.progress):
             timings = self._reconstruct_time_from_traces(event)
@@ -323,6 +339,58 @@ class ProcessEvents(object):
 
         return timings
 
+    def _process_traces_from_event_blocks(self, events, length=None):
+        """Process traces from a list of events, in blocks of events.
+
+        The events are collected in blocks of :data:`TRACE_BLOCK_SIZE`
+        events, for which the arrival times are reconstructed at once.
+
+        :param events: an iterable of the events
+        :param length: an indication of the number of events, for use as a
+            progress bar.  Optional.
+
+        """
+        result = []
+        block = []
+        for event in pbar(events, length=length, show=self.progress):
+            block.append((event['baseline'], event['pulseheights'],
+                          event['traces']))
+            if len(block) == TRACE_BLOCK_SIZE:
+                result.append(self._reconstruct_time_from_event_block(block))
+                block = []
+        if block or not result:
+            result.append(self._reconstruct_time_from_event_block(block))
+        timings = np.concatenate(result)
+
+        return timings
+
+    def _reconstruct_time_from_event_block(self, block):
+        """Reconstruct arrival times for a block of events.
+
+        This is the equivalent of :meth:`_reconstruct_time_from_traces` for
+        multiple events, decoding all traces of the block at once.
+
+        :param block: list of (baseline, pulseheights, traces) of the
+                      events.
+        :return: array of arrival times in the detectors relative to trace
+                 start in ns, one row for each event.
+
+        """
+        if not block:
+            return np.empty((0, 4))
+        baselines, pulseheights, trace_idx = (np.array(values) for values
+                                              in zip(*block))
+
+        timings = np.where(pulseheights < 0, pulseheights, -999)
+        has_signal = pulseheights >= ADC_THRESHOLD
+        traces = self._get_traces(trace_idx[has_signal])
+        thresholds = baselines[has_signal] + ADC_THRESHOLD
+        timings[has_signal] = self.first_above_thresholds(traces, thresholds)
+
+        timings = np.where(np.in1d(timings, ERR).reshape(timings.shape),
+                           timings, timings * ADC_TIME_PER_SAMPLE)
+        return timings
+
     def _reconstruct_time_from_traces(self, event):
         """Reconstruct arrival times for a single event.
 
@@ -354,21 +422,72 @@ class ProcessEvents(object):
     def _get_trace(self, idx):
         """Returns a trace given an index into the blobs array.
 
-        Decompress a trace from the blobs array.
+        Read the trace from the trace store, if present, otherwise
+        decompress it from the blobs array.
 
         :param idx: index into the blobs array
         :return: iterator over the pulseheight values
 
         """
-        blobs = self._get_blobs()
+        trace = self._read_trace(idx)
+        return iter(trace.tolist())
 
-        try:
-            trace = zlib.decompress(blobs[idx]).split(',')
-        except zlib.error:
-            trace = zlib.decompress(blobs[idx][1:-1]).split(',')
-        if trace[-1] == '':
-            del trace[-1]
-        trace = (int(x) for x in trace)
+    def _get_traces(self, indexes):
+        """Returns traces given indexes into the blobs array.
+
+        Read the traces from the trace store, if present, otherwise
+        decompress and decode them from the blobs array.
+
+        :param indexes: indexes into the blobs array
+        :return: 2D array with a trace on each row, traces shorter than
+                 the longest trace are padded with :data:`TRACE_PADDING`.
+
+        """
+        traces = [self._read_trace(idx) for idx in indexes]
+        lengths = np.array([len(trace) for trace in traces], dtype=int)
+
+        max_length = lengths.max() if len(lengths) else 0
+        result = np.full((len(traces), max_length), TRACE_PADDING,
+                         dtype=np.int16)
+        if traces:
+            result[np.arange(max_length) < lengths[:, np.newaxis]] = \
+                np.concatenate(traces)
+        return result
+
+    def _read_trace(self, idx):
+        """Read a trace from the trace store or the blobs array
+
+        :param idx: index into the blobs array
+        :return: array of pulseheight values.
+
+        """
+        if self._trace_store is not None and self._trace_store.has_trace(idx):
+            return self._trace_store.get_trace(idx)
+        return self._get_decoded_trace(self._get_blobs()[idx])
+
+    @lazy
+    def _trace_store(self):
+        """The trace store in the group of the blobs, None if absent"""
+
+        group = self._get_blobs()._v_parent
+        if trace_store.has_trace_store(group):
+            return trace_store.TraceStore(group)
+        return None
+
+    @staticmethod
+    def _get_decoded_trace(blob):
+        """Decode a trace blob, using the trace cache
+
+        The decoded traces are kept in the :data:`~sapphire.utils.trace_cache`,
+        using the compressed trace as key.
+
+        :param blob: compressed trace from the blobs array.
+        :return: read-only array of pulseheight values.
+
+        """
+        trace = trace_cache.get(blob)
+        if trace is None:
+            trace = trace_cache.put(blob, trace_store.decode_blob(blob))
         return trace
 
     def _get_blobs(self):
@@ -398,6 +517,24 @@ class ProcessEvents(object):
         """
         return next((i for i, x in enumerate(trace) if x >= threshold), -999)
 
+    @staticmethod
+    def first_above_thresholds(traces, thresholds):
+        """Find the first element in each trace equal or above its threshold
+
+        This is the equivalent of :meth:`first_above_threshold` for
+        multiple traces at once.  If no element matches the condition -999
+        will be returned for that trace.
+
+        :param traces: 2D array with a trace on each row.
+        :param thresholds: array with a threshold for each trace.
+        :return: array with the index of the first element in each trace.
+
+        """
+        above = traces >= np.asarray(thresholds)[:, np.newaxis]
+        idx = above.argmax(axis=1)
+        idx[~above.any(axis=1)] = -999
+        return idx
+
     def _store_number_of_particles(self):
         """Store number of particles in the detectors.
 
@@ -521,6 +658,8 @@ class ProcessEventsWithLINT(ProcessEvents):
 
     """
 
+    process_traces_in_blocks = False
+
     def _reconstruct_time_from_trace(self, trace, baseline):
         """Reconstruct time of measurement from a trace (LINT timings).
 
@@ -607,6 +746,8 @@ class ProcessEventsWithTriggerOffset(ProcessEvents):
 
     """
 
+    process_traces_in_blocks = False
+
     def __init__(self, data, group, source=None, progress=True, station=None):
         """Initialize the class.
 
@@ -963,6 +1104,120 @@ class ProcessEventsFromSourceWithTriggerOffset(ProcessEventsFromSource,
             self.station = Station(station)
 
 
+def process_events_in_parallel(path, groups, destination=None,
+                               trigger_offset=False, stations=None,
+                               overwrite=False, n_workers=None,
+                               progress=True):
+    """Process the events of several stations in parallel
+
+    The events of each station group are processed in a separate process,
+    using :class:`ProcessEventsFromSource` or
+    :class:`ProcessEventsFromSourceWithTriggerOffset`.  Each process reads
+    the events and blobs of its station from the (read-only) source file
+    and writes the results to a temporary file.  When all stations are
+    processed the results are copied into the destination groups.
+
+    When the results are stored in the source file, the result is the same
+    as that of :meth:`ProcessEvents.process_and_store_results` for each
+    group: the processed events are stored in the ``events`` table and the
+    cleaned original events in the ``_events`` table.
+
+    The file should not be opened for writing elsewhere during processing.
+
+    :param path: path to the PyTables datafile containing the station
+        groups.
+    :param groups: list of paths of the groups containing the station data.
+    :param destination: path to the file in which to store the results,
+        using the same group paths.  The default, None, stores the results
+        in the source file.
+    :param trigger_offset: if True, also reconstruct the trigger offset.
+    :param stations: optional list of station numbers, one for each group,
+        used to get the trigger settings when reconstructing the trigger
+        offset.
+    :param overwrite: if True, overwrite previously obtained results.
+    :param n_workers: number of processes, the default, None, uses the
+        number of cores.
+    :param progress: show progressbar.
+
+    """
+    if stations is not None and len(stations) != len(groups):
+        raise RuntimeError("Number of stations must equal number of groups.")
+    if destination is None:
+        destination = path
+
+    with tables.open_file(destination, 'a') as data:
+        for group in groups:
+            if (group in data and 'events' in data.get_node(group) and
+                    (destination != path or
+                     '_events' in data.get_node(group)) and not overwrite):
+                raise RuntimeError("I will not overwrite previous results "
+                                   "(unless you specify overwrite=True)")
+
+    tmp_dir = tempfile.mkdtemp()
+    try:
+        tasks = []
+        for idx, group in enumerate(groups):
+            tmp_path = os.path.join(tmp_dir, '%d.h5' % idx)
+            station = stations[idx] if stations is not None else None
+            tasks.append((path, tmp_path, group, trigger_offset, station))
+
+        pool = Pool(n_workers)
+        try:
+            results = list(pbar(pool.imap_unordered(_process_events_of_group,
+                                                    tasks),
+                                length=len(tasks), show=progress))
+        finally:
+            pool.terminate()
+
+        with tables.open_file(destination, 'a') as data:
+            for group, tmp_path in sorted(results):
+                with tables.open_file(tmp_path, 'r') as tmp_data:
+                    _copy_processed_events(tmp_data, data, group)
+    finally:
+        shutil.rmtree(tmp_dir)
+
+
+def _process_events_of_group(task):
+    """Process the events of one group into a temporary file
+
+    :param task: tuple of the path to the source file, the path to the
+        temporary file, the group, whether to reconstruct the trigger offset
+        and the station number.
+    :return: the group and the path to the temporary file.
+
+    """
+    path, tmp_path, group, trigger_offset, station = task
+    with tables.open_file(path, 'r') as source_data, \
+            tables.open_file(tmp_path, 'w') as dest_data:
+        if trigger_offset:
+            process = ProcessEventsFromSourceWithTriggerOffset(
+                source_data, dest_data, group, group, station=station)
+        else:
+            process = ProcessEventsFromSource(source_data, dest_data, group,
+                                              group)
+        process.process_and_store_results()
+    return group, tmp_path
+
+
+def _copy_processed_events(tmp_data, data, group):
+    """Copy the processed events of a group into the destination
+
+    :param tmp_data: the PyTables file with the processed events.
+    :param data: the PyTables file in which to store the events.
+    :param group: path of the group containing the station data.
+
+    """
+    tmp_group = tmp_data.get_node(group)
+    if group in data:
+        dest_group = data.get_node(group)
+    else:
+        parent, name = os.path.split(group)
+        dest_group = data.create_group(parent, name, createparents=True)
+    for name in ['_events', 'events']:
+        node = tmp_group._f_get_child(name)
+        node._f_copy(dest_group, name, overwrite=True)
+
+
 class ProcessWeather(ProcessEvents):
 
     """Process HiSPARC weather to clean the data.
@@ -10,6 +10,8 @@
 from numpy import around, convolve, ones, where
 from lazy import lazy
 
+from .trace_store import get_traces_for_event
+
 ADC_TIME_PER_SAMPLE = 2.5  # in ns
 
 # Trigger windows in number of samples (default windows)
@@ -66,6 +68,20 @@ class TraceObservables(object):
         if self.n not in [2, 4]:
             raise Exception('Unsupported number of detectors')
 
+    @classmethod
+    def from_event(cls, group, event):
+        """Reconstruct trace observables for an event
+
+        The traces are read from the trace store in the group, if present,
+        see :mod:`~sapphire.analysis.trace_store`.  Otherwise they are
+        decoded from the blobs.
+
+        :param group: the group containing the station data.
+        :param event: a row from the events table.
+
+        """
+        return cls(get_traces_for_event(group, event))
+
     @lazy
     def baselines(self):
         """Mean value of the first 50 samples of the trace
@@ -1,7 +1,9 @@
 from itertools import izip, izip_longest
+from multiprocessing import Pool
 import os
 
-from numpy import isnan, histogram, linspace, percentile, std
+from numpy import (isnan, histogram, linspace, percentile, std, array,
+                   concatenate, searchsorted, allclose)
 from scipy.optimize import curve_fit
 import tables
 
@@ -14,7 +16,7 @@ from .core_reconstruction import (EventCoreReconstruction,
                                   CoincidenceCoreReconstruction)
 from .coincidence_queries import CoincidenceQuery
 from .calibration import determine_detector_timing_offsets
-from .event_utils import station_arrival_time
+from .event_utils import station_arrival_time_many
 from ..utils import pbar, gauss, c
 
 
@@ -43,11 +45,18 @@ class ReconstructESDEvents(object):
         >>> plt.polar(rec.reconstructions.col('azimuth'),
         ...           rec.reconstructions.col('zenith'), 'ko', alpha=0.2)
 
+    To only reconstruct events which were added to the events table
+    since the previous reconstruction::
+
+        >>> rec = ReconstructESDEvents(data, station_path, 506,
+        ...                            incremental=True)
+        >>> rec.reconstruct_and_store()
+
     """
 
     def __init__(self, data, station_group, station,
                  overwrite=False, progress=True,
-                 destination='reconstructions'):
+                 destination='reconstructions', incremental=False):
         """Initialize the class.
 
         :param data: the PyTables datafile.
@@ -60,6 +69,9 @@ class ReconstructESDEvents(object):
         :param overwrite: if True, overwrite existing reconstruction table.
         :param progress: if True, show a progressbar while reconstructing.
         :param destination: alternative name for reconstruction table.
+        :param incremental: if True, and the reconstruction table exists,
+            only reconstruct events with an id beyond the last
+            reconstructed event and append them to the table.
 
         """
         self.data = data
@@ -68,7 +80,9 @@ class ReconstructESDEvents(object):
         self.overwrite = overwrite
         self.progress = progress
         self.destination = destination
+        self.incremental = incremental
         self.offsets = [0., 0., 0., 0.]
+        self.start = 0
 
         if isinstance(station, Station):
             self.station = station
@@ -92,9 +106,13 @@ class ReconstructESDEvents(object):
 
         self.prepare_output()
         if self.api_station is None:
-            self.offsets = determine_detector_timing_offsets(self.events,
-                                                             self.station)
-            self.store_offsets()
+            if self.incremental and 'detector_offsets' in self.station_group:
+                # Use the offsets of the previous reconstructions
+                self.offsets = self.station_group.detector_offsets.read()
+            else:
+                self.offsets = determine_detector_timing_offsets(
+                    self.events, self.station)
+                self.store_offsets()
         else:
             self.offsets = self.api_station
         self.reconstruct_directions(detector_ids=detector_ids)
@@ -112,9 +130,9 @@ class ReconstructESDEvents(object):
                         for x, y in izip(self.core_x, self.core_y))
         else:
             initials = []
-        angles = self.direction.reconstruct_events(self.events, detector_ids,
-                                                   self.offsets, self.progress,
-                                                   initials)
+        angles = self.direction.reconstruct_events(self._new_events(),
+                                                   detector_ids, self.offsets,
+                                                   self.progress, initials)
         self.theta, self.phi, self.detector_ids = angles
 
     def reconstruct_cores(self, detector_ids=None):
@@ -128,7 +146,7 @@ class ReconstructESDEvents(object):
                         for theta, phi in izip(self.theta, self.phi))
         else:
             initials = []
-        cores = self.core.reconstruct_events(self.events, detector_ids,
+        cores = self.core.reconstruct_events(self._new_events(), detector_ids,
                                              self.progress, initials)
         self.core_x, self.core_y = cores
 
@@ -139,6 +157,10 @@ class ReconstructESDEvents(object):
             if self.overwrite:
                 self.data.remove_node(self.station_group, self.destination,
                                       recursive=True)
+            elif self.incremental:
+                self._continue_output(self.data.get_node(self.station_group,
+                                                         self.destination))
+                return
             else:
                 raise RuntimeError("Reconstructions table already exists for "
                                    "%s, and overwrite is False" %
@@ -148,6 +170,32 @@ class ReconstructESDEvents(object):
             expectedrows=self.events.nrows)
         self.reconstructions._v_attrs.station = self.station
 
+    def _continue_output(self, reconstructions):
+        """Continue with an existing output table
+
+        Only events with an id beyond the last reconstructed event will
+        be reconstructed.
+
+        :param reconstructions: the existing reconstructions table.
+
+        """
+        if (_get_layout(reconstructions._v_attrs.station.cluster,
+                        [reconstructions._v_attrs.station]) !=
+                _get_layout(self.station.cluster, [self.station])):
+            raise RuntimeError("Reconstructions table for %s was made with a "
+                               "different station, use overwrite instead" %
+                               self.station_group)
+        self.reconstructions = reconstructions
+        self.start = _get_first_new_row(self.events.col('event_id'),
+                                        reconstructions.col('id'))
+
+    def _new_events(self):
+        """Get the events which are to be reconstructed"""
+
+        if self.start:
+            return self.events.read(self.start)
+        return self.events
+
     def store_offsets(self):
         """Store the determined offset in a table."""
 
@@ -171,7 +219,7 @@ class ReconstructESDEvents(object):
 
         """
         for event, core_x, core_y, theta, phi, detector_ids in izip_longest(
-                self.events, self.core_x, self.core_y,
+                self._new_events(), self.core_x, self.core_y,
                 self.theta, self.phi, self.detector_ids):
             self._store_reconstruction(event, core_x, core_y, theta, phi,
                                        detector_ids)
@@ -204,7 +252,7 @@ class ReconstructESDEventsFromSource(ReconstructESDEvents):
 
     def __init__(self, source_data, dest_data, source_group, dest_group,
                  station, overwrite=False, progress=True,
-                 destination='reconstructions'):
+                 destination='reconstructions', incremental=False):
         """Initialize the class.
 
         :param data: the PyTables datafile.
@@ -217,11 +265,14 @@ class ReconstructESDEventsFromSource(ReconstructESDEvents):
         :param overwrite: if True, overwrite existing reconstruction table.
         :param progress: if True, show a progressbar while reconstructing.
         :param destination: alternative name for reconstruction table.
+        :param incremental: if True, and the reconstruction table exists,
+            only reconstruct events with an id beyond the last
+            reconstructed event and append them to the table.
 
         """
         super(ReconstructESDEventsFromSource, self).__init__(
             source_data, source_group, station, overwrite, progress,
-            destination)
+            destination, incremental)
         self.dest_data = dest_data
         self.dest_group = dest_group
 
@@ -233,6 +284,9 @@ class ReconstructESDEventsFromSource(ReconstructESDEvents):
         if dest_path in self.dest_data:
             if self.overwrite:
                 self.dest_data.remove_node(dest_path, recursive=True)
+            elif self.incremental:
+                self._continue_output(self.dest_data.get_node(dest_path))
+                return
             else:
                 raise RuntimeError("Reconstructions table already exists for "
                                    "%s, and overwrite is False" %
@@ -256,11 +310,18 @@ class ReconstructESDCoincidences(object):
         >>> rec = ReconstructESDCoincidences(data, overwrite=True)
         >>> rec.reconstruct_and_store()
 
+    To only reconstruct coincidences which were added since the previous
+    reconstruction::
+
+        >>> rec = ReconstructESDCoincidences(data, incremental=True)
+        >>> rec.reconstruct_and_store()
+
     """
 
     def __init__(self, data, coincidences_group='/coincidences',
                  overwrite=False, progress=True,
-                 destination='reconstructions', cluster=None):
+                 destination='reconstructions', cluster=None,
+                 incremental=False):
         """Initialize the class.
 
         :param data: the PyTables datafile.
@@ -269,6 +330,9 @@ class ReconstructESDCoincidences(object):
         :param progress: if True, show a progressbar while reconstructing.
         :param destination: alternative name for reconstruction table.
         :param cluster: a Cluster object to use for the reconstructions.
+        :param incremental: if True, and the reconstruction table exists,
+            only reconstruct coincidences with an id beyond the last
+            reconstructed coincidence and append them to the table.
 
         """
         self.data = data
@@ -277,7 +341,9 @@ class ReconstructESDCoincidences(object):
         self.overwrite = overwrite
         self.progress = progress
         self.destination = destination
+        self.incremental = incremental
         self.offsets = {}
+        self.start = 0
 
         self.cq = CoincidenceQuery(data, self.coincidences_group)
         if cluster is None:
@@ -301,8 +367,8 @@ class ReconstructESDCoincidences(object):
     def reconstruct_and_store(self, station_numbers=None):
         """Shorthand function to reconstruct coincidences and store results"""
 
-        self.prepare_output()
         self.get_station_timing_offsets()
+        self.prepare_output()
         self.reconstruct_directions(station_numbers=station_numbers)
         self.reconstruct_cores(station_numbers=station_numbers)
         self.store_reconstructions()
@@ -318,11 +384,12 @@ class ReconstructESDCoincidences(object):
                         for x, y in izip(self.core_x, self.core_y))
         else:
             initials = []
-        coincidences = pbar(self.cq.all_coincidences(iterator=True),
-                            length=self.coincidences.nrows, show=self.progress)
+        coincidences = pbar(self.coincidences.iterrows(self.start),
+                            length=self.coincidences.nrows - self.start,
+                            show=self.progress)
         angles = self.direction.reconstruct_coincidences(
-            self.cq.all_events(coincidences, n=0), station_numbers,
-            self.offsets, progress=False, initials=initials)
+            self.cq.all_events(coincidences, n=0, bulk=True),
+            station_numbers, self.offsets, progress=False, initials=initials)
         self.theta, self.phi, self.station_numbers = angles
 
     def reconstruct_cores(self, station_numbers=None):
@@ -336,11 +403,12 @@ class ReconstructESDCoincidences(object):
                         for theta, phi in izip(self.theta, self.phi))
         else:
             initials = []
-        coincidences = pbar(self.cq.all_coincidences(iterator=True),
-                            length=self.coincidences.nrows, show=self.progress)
+        coincidences = pbar(self.coincidences.iterrows(self.start),
+                            length=self.coincidences.nrows - self.start,
+                            show=self.progress)
         cores = self.core.reconstruct_coincidences(
-            self.cq.all_events(coincidences, n=0), station_numbers,
-            progress=False, initials=initials)
+            self.cq.all_events(coincidences, n=0, bulk=True),
+            station_numbers, progress=False, initials=initials)
         self.core_x, self.core_y = cores
 
     def prepare_output(self):
@@ -350,6 +418,10 @@ class ReconstructESDCoincidences(object):
             if self.overwrite:
                 self.data.remove_node(self.coincidences_group,
                                       self.destination, recursive=True)
+            elif self.incremental:
+                self._continue_output(self.data.get_node(
+                    self.coincidences_group, self.destination))
+                return
             else:
                 raise RuntimeError("Reconstructions table already exists for "
                                    "%s, and overwrite is False" %
@@ -364,6 +436,33 @@ class ReconstructESDCoincidences(object):
             expectedrows=self.coincidences.nrows)
         self.reconstructions._v_attrs.cluster = self.cluster
 
+    def _continue_output(self, reconstructions):
+        """Continue with an existing output table
+
+        The cluster and the station offsets have to be the same as those
+        used for the existing reconstructions. Only coincidences with an
+        id beyond the last reconstructed coincidence will be
+        reconstructed.
+
+        :param reconstructions: the existing reconstructions table.
+
+        """
+        cluster = reconstructions._v_attrs.cluster
+        if (_get_layout(cluster, cluster.stations) !=
+                _get_layout(self.cluster, self.cluster.stations)):
+            raise RuntimeError("Reconstructions table for %s was made with a "
+                               "different cluster, use overwrite instead" %
+                               self.coincidences_group)
+        if ('offsets' not in reconstructions._v_attrs or
+                not _same_offsets(reconstructions._v_attrs.offsets,
+                                  self.offsets)):
+            raise RuntimeError("Reconstructions table for %s was made with "
+                               "different station offsets, use overwrite "
+                               "instead" % self.coincidences_group)
+        self.reconstructions = reconstructions
+        self.start = _get_first_new_row(self.coincidences.col('id'),
+                                        reconstructions.col('id'))
+
     def get_station_timing_offsets(self):
         """Get predetermined station offsets
 
@@ -431,29 +530,32 @@ class ReconstructESDCoincidences(object):
 
             stations = [ref_station_number, station.number]
             coincidences = self.cq.all(stations)
-            c_events = self.cq.events_from_stations(coincidences, stations)
+            c_events = self.cq.events_from_stations(coincidences, stations,
+                                                    bulk=True)
 
-            dt = []
+            ref_events = []
+            station_events = []
             for events in c_events:
                 # Filter for possibility of same station twice in coincidence
                 if len(events) is not 2:
                     continue
                 if events[0][0] == ref_station_number:
-                    ref_event = events[0][1]
-                    event = events[1][1]
+                    ref_events.append(events[0][1])
+                    station_events.append(events[1][1])
                 else:
-                    ref_event = events[1][1]
-                    event = events[0][1]
+                    ref_events.append(events[1][1])
+                    station_events.append(events[0][1])
 
-                ref_ts = ref_event['ext_timestamp']
-                ref_t = station_arrival_time(ref_event, ref_ts, ref_d_ids,
-                                             ref_d_off)
-                if isnan(ref_t):
-                    continue
-                t = station_arrival_time(event, ref_ts, d_ids, d_off)
-                if isnan(t):
-                    continue
-                dt.append(t - ref_t)
+            dt = []
+            if ref_events:
+                ref_events = array(ref_events)
+                ref_ts = ref_events['ext_timestamp']
+                ref_t = station_arrival_time_many(ref_events, ref_ts,
+                                                  ref_d_ids, ref_d_off)
+                t = station_arrival_time_many(array(station_events), ref_ts,
+                                              d_ids, d_off)
+                dt = t - ref_t
+                dt = dt[~isnan(dt)]
 
             bins = linspace(percentile(dt, 2), percentile(dt, 98), 200)
             y, bins = histogram(dt, bins=bins)
@@ -475,10 +577,11 @@ class ReconstructESDCoincidences(object):
 
         """
         for coincidence, x, y, theta, phi, station_numbers in izip_longest(
-                self.coincidences, self.core_x, self.core_y,
-                self.theta, self.phi, self.station_numbers):
+                self.coincidences.iterrows(self.start), self.core_x,
+                self.core_y, self.theta, self.phi, self.station_numbers):
             self._store_reconstruction(coincidence, x, y, theta, phi,
                                        station_numbers)
+        self.reconstructions._v_attrs.offsets = self.offsets
         self.reconstructions.flush()
 
     def _store_reconstruction(self, coincidence, core_x, core_y, theta, phi,
@@ -527,7 +630,8 @@ class ReconstructESDCoincidencesFromSource(ReconstructESDCoincidences):
 
     def __init__(self, source_data, dest_data, source_group, dest_group,
                  overwrite=False, progress=True,
-                 destination='reconstructions', cluster=None):
+                 destination='reconstructions', cluster=None,
+                 incremental=False):
         """Initialize the class.
 
         :param data: the PyTables datafile.
@@ -540,11 +644,14 @@ class ReconstructESDCoincidencesFromSource(ReconstructESDCoincidences):
         :param overwrite: if True, overwrite existing reconstruction table.
         :param progress: if True, show a progressbar while reconstructing.
         :param destination: alternative name for reconstruction table.
+        :param incremental: if True, and the reconstruction table exists,
+            only reconstruct coincidences with an id beyond the last
+            reconstructed coincidence and append them to the table.
 
         """
         super(ReconstructESDCoincidencesFromSource, self).__init__(
             source_data, source_group, overwrite, progress, destination,
-            cluster)
+            cluster, incremental)
         self.dest_data = dest_data
         self.dest_group = dest_group
 
@@ -556,6 +663,9 @@ class ReconstructESDCoincidencesFromSource(ReconstructESDCoincidences):
         if dest_path in self.dest_data:
             if self.overwrite:
                 self.dest_data.remove_node(dest_path, recursive=True)
+            elif self.incremental:
+                self._continue_output(self.dest_data.get_node(dest_path))
+                return
             else:
                 raise RuntimeError("Reconstructions table already exists for "
                                    "%s, and overwrite is False" %
@@ -569,3 +679,160 @@ class ReconstructESDCoincidencesFromSource(ReconstructESDCoincidences):
             self.dest_group, self.destination, description,
             expectedrows=self.coincidences.nrows, createparents=True)
         self.reconstructions._v_attrs.cluster = self.cluster
+
+
+def reconstruct_coincidences_in_parallel(path,
+                                         coincidences_group='/coincidences',
+                                         overwrite=False, progress=True,
+                                         destination='reconstructions',
+                                         cluster=None, station_numbers=None,
+                                         n_workers=None, chunk_size=10000,
+                                         incremental=False):
+    """Reconstruct the coincidences in a datafile in parallel
+
+    The coincidences table is split into ranges of coincidences, which
+    are reconstructed in separate processes.  Each process opens the
+    (read-only) datafile, reconstructs the directions and cores of its
+    coincidences and returns the results.  When all coincidences are
+    reconstructed the results are stored in order.  The stored table is
+    the same as that of
+    :meth:`ReconstructESDCoincidences.reconstruct_and_store`.
+
+    The file should not be opened for writing elsewhere during the
+    reconstruction.
+
+    :param path: path to the PyTables datafile.
+    :param coincidences_group: the coincidences group, the results will
+        also be stored in this group.
+    :param overwrite: if True, overwrite existing reconstruction table.
+    :param progress: if True, show a progressbar while reconstructing.
+    :param destination: alternative name for reconstruction table.
+    :param cluster: a Cluster object to use for the reconstructions.
+    :param station_numbers: list of station numbers, to only use events
+        from those stations.
+    :param n_workers: number of processes, the default, None, uses the
+        number of cores.
+    :param chunk_size: number of coincidences reconstructed by a process
+        at a time.
+    :param incremental: if True, and the reconstruction table exists,
+        only reconstruct coincidences with an id beyond the last
+        reconstructed coincidence and append them to the table.
+
+    """
+    with tables.open_file(path, 'r') as data:
+        rec = ReconstructESDCoincidences(data, coincidences_group, overwrite,
+                                         destination=destination,
+                                         cluster=cluster,
+                                         incremental=incremental)
+        rec.get_station_timing_offsets()
+        if destination in rec.coincidences_group and not overwrite:
+            if not incremental:
+                raise RuntimeError("Reconstructions table already exists for "
+                                   "%s, and overwrite is False" %
+                                   rec.coincidences_group)
+            # Check the existing table and find the new coincidences
+            rec.prepare_output()
+        tasks = [(path, coincidences_group, start,
+                  min(start + chunk_size, rec.coincidences.nrows),
+                  rec.direction, rec.core, rec.offsets, station_numbers)
+                 for start in range(rec.start, rec.coincidences.nrows,
+                                    chunk_size)]
+        cluster = rec.cluster
+
+    pool = Pool(n_workers)
+    try:
+        results = list(pbar(pool.imap(_reconstruct_coincidences_chunk, tasks),
+                            length=len(tasks), show=progress))
+    finally:
+        pool.terminate()
+
+    with tables.open_file(path, 'a') as data:
+        rec = ReconstructESDCoincidences(data, coincidences_group, overwrite,
+                                         destination=destination,
+                                         cluster=cluster,
+                                         incremental=incremental)
+        rec.get_station_timing_offsets()
+        rec.prepare_output()
+        if results:
+            theta, phi, numbers, core_x, core_y = zip(*results)
+            rec.theta = concatenate(theta)
+            rec.phi = concatenate(phi)
+            rec.station_numbers = sum(numbers, [])
+            rec.core_x = concatenate(core_x)
+            rec.core_y = concatenate(core_y)
+        rec.store_reconstructions()
+
+
+def _reconstruct_coincidences_chunk(task):
+    """Reconstruct a range of coincidences
+
+    :param task: tuple of the path to the datafile, the coincidences group,
+        the start and stop of the range of coincidences, the direction and
+        core reconstruction objects, the station offsets and the station
+        numbers to use.
+    :return: arrays of theta, phi, list of station numbers used, and arrays
+        of core x and core y.
+
+    """
+    (path, coincidences_group, start, stop, direction, core, offsets,
+     station_numbers) = task
+    with tables.open_file(path, 'r') as data:
+        cq = CoincidenceQuery(data, coincidences_group)
+        coincidences = cq.coincidences.iterrows(start, stop)
+        theta, phi, numbers = direction.reconstruct_coincidences(
+            cq.all_events(coincidences, n=0, bulk=True), station_numbers,
+            offsets, progress=False)
+        initials = ({'theta': t, 'phi': p} for t, p in izip(theta, phi))
+        coincidences = cq.coincidences.iterrows(start, stop)
+        core_x, core_y = core.reconstruct_coincidences(
+            cq.all_events(coincidences, n=0, bulk=True), station_numbers,
+            progress=False, initials=initials)
+    return (array(theta, dtype=float), array(phi, dtype=float),
+            list(numbers), array(core_x, dtype=float),
+            array(core_y, dtype=float))
+
+
+def _get_layout(cluster, stations):
+    """Get the positions describing the layout of stations in a cluster
+
+    :param cluster: :class:`~sapphire.clusters.BaseCluster` object.
+    :param stations: list of stations from the cluster.
+    :return: nested lists of the cluster position and the station
+        numbers, positions and detector positions with their timestamps.
+
+    """
+    layout = [[cluster.x, cluster.y, cluster.z, cluster.alpha]]
+    for station in stations:
+        layout.append(
+            [station.number] +
+            [list(values) for values in (station.x, station.y, station.z,
+                                         station.angle, station.timestamps)] +
+            [[list(values) for values in (detector.x, detector.y, detector.z,
+                                          detector.orientation,
+                                          detector.timestamps)]
+             for detector in station.detectors])
+    return layout
+
+
+def _same_offsets(offsets, other_offsets):
+    """Check if two dictionaries of station offsets are the same"""
+
+    if sorted(offsets.keys()) != sorted(other_offsets.keys()):
+        return False
+    return all(allclose(offsets[number], other_offsets[number])
+               for number in offsets)
+
+
+def _get_first_new_row(ids, reconstructed_ids):
+    """Get the first row with an id beyond the last reconstructed id
+
+    The rows are assumed to be ordered by id, new rows are appended.
+
+    :param ids: the ids of all rows.
+    :param reconstructed_ids: the ids of the reconstructed rows.
+    :return: index of the first row which is not yet reconstructed.
+
+    """
+    if not len(reconstructed_ids):
+        return 0
+    return searchsorted(ids, reconstructed_ids.max(), side='right')
@@ -25,13 +25,13 @@ import re
 from itertools import combinations
 
 import tables
-from numpy import isnan
+from numpy import isnan, array
 
 from ..utils import pbar
 from ..api import Station
 from ..storage import TimeDelta
 from .coincidence_queries import CoincidenceQuery
-from .event_utils import station_arrival_time
+from .event_utils import station_arrival_time_many
 
 
 class ProcessTimeDeltas(object):
@@ -105,13 +105,17 @@ class ProcessTimeDeltas(object):
                  t - t_ref. Not corrected for altitude differences.
 
         """
-        dt = []
         ets = []
+        ref_events = []
+        station_events = []
+        ref_detector_offsets = []
+        detector_offsets = []
         previous_ets = 0
 
         coincidences = self.cq.all([ref_station, station], iterator=True)
         coin_events = self.cq.events_from_stations(coincidences,
-                                                   [ref_station, station])
+                                                   [ref_station, station],
+                                                   bulk=True)
 
         ref_offsets = self.detector_timing_offsets[ref_station]
         offsets = self.detector_timing_offsets[station]
@@ -134,19 +138,24 @@ class ProcessTimeDeltas(object):
                 id = 0
 
             ref_event = events[ref_id][1]
-            ref_detector_offsets = ref_offsets(ref_event['timestamp'])
+            ref_events.append(ref_event)
+            ref_detector_offsets.append(ref_offsets(ref_event['timestamp']))
             event = events[id][1]
-            detector_offsets = offsets(event['timestamp'])
-
-            ref_t = station_arrival_time(ref_event, ref_ets, [0, 1, 2, 3],
-                                         ref_detector_offsets)
-            t = station_arrival_time(event, ref_ets, [0, 1, 2, 3],
-                                     detector_offsets)
-            if isnan(t) or isnan(ref_t):
-                continue
-            dt.append(t - ref_t)
+            station_events.append(event)
+            detector_offsets.append(offsets(event['timestamp']))
             ets.append(ref_ets)
-        return ets, dt
+
+        if not ets:
+            return [], []
+
+        # Determine the arrival times of all events at once
+        ref_t = station_arrival_time_many(array(ref_events), ets,
+                                          [0, 1, 2, 3], ref_detector_offsets)
+        t = station_arrival_time_many(array(station_events), ets, [0, 1, 2, 3],
+                                      detector_offsets)
+        dt = t - ref_t
+        valid = ~isnan(dt)
+        return list(array(ets)[valid]), list(dt[valid])
 
     def store_time_deltas(self, ext_timestamps, time_deltas, pair):
         """Store determined dt values"""
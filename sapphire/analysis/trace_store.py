@@ -0,0 +1,211 @@
+""" Store HiSPARC traces in a binary format
+
+    The traces of HiSPARC events are stored in the ``blobs`` array of a
+    station group as zlib compressed comma separated text.  Reading a trace
+    requires decompression, splitting the text and parsing the integers.
+
+    This module can convert those blobs into a binary trace store in the
+    same group.  The samples of all traces are stored as int16 in a single
+    chunked array (``trace_samples``), compressed using Blosc with the
+    shuffle filter.  An index (``trace_index``) contains the offset and
+    length of the samples for each blob, so the ``traces`` column of the
+    events table can still be used to find the traces.  Reading the traces
+    of an event from the trace store only takes a few slices.
+
+    :class:`~sapphire.analysis.process_events.ProcessEvents` and
+    :meth:`~sapphire.analysis.process_traces.TraceObservables.from_event`
+    use the trace store if it is present.
+
+    Example usage::
+
+        import tables
+
+        from sapphire.analysis.trace_store import convert_blobs
+
+        with tables.open_file('data.h5', 'a') as data:
+            convert_blobs(data, '/s501')
+
+"""
+import zlib
+
+import tables
+import numpy as np
+
+from ..utils import pbar
+
+#: Name of the array containing the samples of all traces.
+TRACE_SAMPLES = 'trace_samples'
+#: Name of the array containing the offset and length of each trace.
+TRACE_INDEX = 'trace_index'
+#: Compression of the trace samples.
+TRACE_FILTERS = tables.Filters(complevel=5, complib='blosc', shuffle=True)
+#: Number of blobs converted at once.
+CONVERT_BLOCK_SIZE = 10000
+
+
+def convert_blobs(data, group, overwrite=False, progress=True):
+    """Convert the trace blobs of a group into a trace store
+
+    Blobs which can not be decoded as trace, like error messages, get a
+    length of -1 in the index.
+
+    :param data: the PyTables datafile.
+    :param group: the group containing the station data and the blobs.
+    :param overwrite: if True, replace an existing trace store.
+    :param progress: show progressbar.
+
+    """
+    group = data.get_node(group)
+    blobs = group.blobs
+
+    if TRACE_SAMPLES in group or TRACE_INDEX in group:
+        if not overwrite:
+            raise RuntimeError("I will not overwrite the existing trace "
+                               "store (unless you specify overwrite=True)")
+        for name in [TRACE_SAMPLES, TRACE_INDEX]:
+            if name in group:
+                data.remove_node(group, name)
+
+    samples = data.create_earray(group, TRACE_SAMPLES, tables.Int16Atom(),
+                                 shape=(0,), filters=TRACE_FILTERS,
+                                 expectedrows=len(blobs) * 2400,
+                                 title='HiSPARC trace samples')
+    index = np.empty((len(blobs), 2), dtype=np.int64)
+    offset = 0
+    for start in pbar(range(0, len(blobs), CONVERT_BLOCK_SIZE),
+                      show=progress):
+        traces = []
+        for idx, blob in enumerate(blobs.read(start,
+                                              start + CONVERT_BLOCK_SIZE),
+                                   start):
+            try:
+                trace = decode_blob(blob)
+            except (zlib.error, ValueError):
+                index[idx] = (offset, -1)
+            else:
+                index[idx] = (offset, len(trace))
+                offset += len(trace)
+                traces.append(trace)
+        if traces:
+            samples.append(np.concatenate(traces))
+    samples.flush()
+
+    data.create_array(group, TRACE_INDEX, index,
+                      title='Offset and length of HiSPARC traces')
+
+
+def has_trace_store(group):
+    """Check if a group contains a trace store
+
+    :param group: the group containing the station data.
+
+    """
+    return TRACE_SAMPLES in group and TRACE_INDEX in group
+
+
+class TraceStore(object):
+
+    """Read traces from a trace store
+
+    The index is read into memory, the samples are read when needed.
+
+    """
+
+    def __init__(self, group):
+        """Initialize the class.
+
+        :param group: the group containing the trace store.
+
+        """
+        self.samples = group._f_get_child(TRACE_SAMPLES)
+        self.index = group._f_get_child(TRACE_INDEX).read()
+
+    def __len__(self):
+        return len(self.index)
+
+    def has_trace(self, idx):
+        """Check if the trace store contains the trace for a blob
+
+        Blobs which were added after converting are not in the store.
+
+        :param idx: index into the blobs array.
+
+        """
+        return 0 <= idx < len(self.index) and self.index[idx, 1] >= 0
+
+    def get_trace(self, idx):
+        """Get a trace
+
+        :param idx: index into the blobs array.
+        :return: array of pulseheight values.
+
+        """
+        if not self.has_trace(idx):
+            raise KeyError("Trace %d is not in the trace store." % idx)
+        offset, length = self.index[idx]
+        return self.samples[offset:offset + length]
+
+    def get_traces(self, indexes):
+        """Get multiple traces
+
+        :param indexes: indexes into the blobs array.
+        :return: list of arrays of pulseheight values.
+
+        """
+        return [self.get_trace(idx) for idx in indexes]
+
+
+def get_traces_for_event(group, event):
+    """Get the traces of an event
+
+    The traces are read from the trace store, if present, otherwise they
+    are decoded from the blobs.
+
+    :param group: the group containing the station data.
+    :param event: a row from the events table.
+    :return: the traces: an array of pulseheight values, with the first
+             sample of each trace in the first row.
+
+    """
+    indexes = [idx for idx in event['traces'] if idx >= 0]
+    if indexes and has_trace_store(group):
+        # only read the part of the index needed for this event
+        trace_index = group._f_get_child(TRACE_INDEX)
+        first, last = min(indexes), max(indexes)
+        if last < len(trace_index):
+            index = trace_index[first:last + 1][np.array(indexes) - first]
+            if (index[:, 1] >= 0).all():
+                samples = group._f_get_child(TRACE_SAMPLES)
+                return np.array([samples[offset:offset + length]
+                                 for offset, length in index]).T
+    blobs = group.blobs
+    return np.array([decode_blob(blobs[idx]) for idx in indexes]).T
+
+
+def decompress_blob(blob):
+    """Decompress a trace blob
+
+    :param blob: compressed trace from the blobs array.
+    :return: string with comma separated pulseheight values.
+
+    """
+    try:
+        return zlib.decompress(blob)
+    except zlib.error:
+        return zlib.decompress(blob[1:-1])
+
+
+def decode_blob(blob):
+    """Decompress and decode a trace blob
+
+    :param blob: compressed trace from the blobs array.
+    :return: array of pulseheight values.
+
+    """
+    trace = decompress_blob(blob).rstrip(',')
+    if not trace:
+        return np.array([], dtype=np.int16)
+    values = np.fromstring(trace, dtype=np.int16, sep=',')
+    if len(values) != trace.count(',') + 1:
+        raise ValueError("Unable to decode trace.")
+    return values
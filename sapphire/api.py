@@ -31,9 +31,9 @@ from StringIO import StringIO
 
 from lazy import lazy
 from numpy import (genfromtxt, atleast_1d, zeros, ones, logical_and,
-                   count_nonzero, negative)
+                   count_nonzero, negative, array)
 
-from .utils import get_active_index, memoize
+from .utils import get_active_index, memoize, trace_cache
 from .transformations.clock import process_time
 
 logger = logging.getLogger('api')
@@ -663,16 +663,22 @@ class Station(API):
         :param timestamp,nanoseconds: the extended timestamp for which
             to get the traces.
         :param raw: get the raw trace, without the subtracted baselines.
-        :return: an array with the traces for each detector in ADCcounts
-
-        """
-        ext_timestamp = '%d%09d' % (timestamp, nanoseconds)
-        path = (self.urls['event_trace'].format(station_number=self.station,
-                                                ext_timestamp=ext_timestamp)
-                .strip("/"))
-        if raw is True:
-            path += '?raw'
-        return self._get_json(path)
+        :return: an array with the traces for each detector in ADCcounts.
+            The traces are kept in the :data:`~sapphire.utils.trace_cache`.
+
+        """
+        key = (self.station, timestamp, nanoseconds, raw is True)
+        traces = trace_cache.get(key)
+        if traces is None:
+            ext_timestamp = '%d%09d' % (timestamp, nanoseconds)
+            path = (self.urls['event_trace']
+                    .format(station_number=self.station,
+                            ext_timestamp=ext_timestamp)
+                    .strip("/"))
+            if raw is True:
+                path += '?raw'
+            traces = trace_cache.put(key, array(self._get_json(path)))
+        return traces.tolist()
 
     def event_time(self, year='', month='', day=''):
         """Get the number of events per hour histogram
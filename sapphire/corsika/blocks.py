@@ -61,6 +61,29 @@ class Format(object):
                                  self.particles_per_subblock)
         self.particles_size = self.particle_size * self.particles_per_subblock
 
+    @property
+    def subblock_dtype(self):
+        """NumPy dtype of a sub-block
+
+        The first field is available both as a string id and as part of
+        the data fields, since it is the first particle field in particle
+        data sub-blocks.
+
+        """
+        n_fields = self.subblock_size // self.field_size
+        return numpy.dtype({'names': ['id', 'fields'],
+                            'formats': ['S4', ('f4', n_fields)],
+                            'offsets': [0, 0]})
+
+    @property
+    def block_dtype(self):
+        """NumPy dtype of a block, including the Fortran record padding"""
+
+        return numpy.dtype([('head', 'i4'),
+                            ('subblocks', self.subblock_dtype,
+                             self.subblocks_per_block),
+                            ('tail', 'i4')])
+
 
 # From here on, things should not depend on the field size as everything is
 
@@ -431,6 +454,48 @@ def particle_data(subblock):
             observation_level, phi)
 
 
+def particles_data(particles):
+    """Get particle data for many particles at once.
+
+    Array version of :func:`particle_data`.
+
+    :param particles: array with a row of CORSIKA particle fields
+                      for each particle.
+    :return: structured array with the columns p_x, p_y, p_z, x, y, t,
+             id, r, hadron_generation, observation_level, phi, and
+             weight for thinned particles.
+
+    """
+    particles = numpy.asarray(particles, dtype='f8')
+    thinned = particles.shape[1] > 7
+    dtype = [('p_x', 'f8'), ('p_y', 'f8'), ('p_z', 'f8'), ('x', 'f8'),
+             ('y', 'f8'), ('t', 'f8'), ('id', 'i8'), ('r', 'f8'),
+             ('hadron_generation', 'i8'), ('observation_level', 'i8'),
+             ('phi', 'f8')]
+    if thinned:
+        dtype.append(('weight', 'f8'))
+    data = numpy.empty(len(particles), dtype=dtype)
+
+    description = particles[:, 0].astype('i8')
+    data['p_x'] = particles[:, 1] * units.GeV
+    data['p_y'] = particles[:, 2] * units.GeV
+    data['p_z'] = -(particles[:, 3] * units.GeV)
+    data['x'] = -(particles[:, 5] * units.cm)
+    data['y'] = particles[:, 4] * units.cm
+    data['t'] = particles[:, 6] * units.ns
+    data['id'] = description // 1000
+    data['hadron_generation'] = description // 10 % 100
+    data['observation_level'] = description % 10
+    # numpy.power gives the same rounding as the scalar ** in particle_data
+    data['r'] = numpy.sqrt(numpy.power(data['x'], 2.) +
+                           numpy.power(data['y'], 2.))
+    data['phi'] = numpy.arctan2(data['y'], data['x'])
+    if thinned:
+        data['weight'] = particles[:, 7]
+
+    return data
+
+
 class ParticleData(object):
 
     """The particle data sub-block
@@ -535,9 +600,15 @@ class FormatThin(Format):
         # number of particle records
         # With the thinned option, each of these is 8 fields long
         # for a total of 39 records per sub block
-        self.particle_format = '8f'
+        self.fields_per_particle = 8
+        self.particle_format = '%df' % self.fields_per_particle
         self.particle_size = struct.calcsize(self.particle_format)
 
+        # Full particle sub block
+        self.particles_format = (self.particle_format *
+                                 self.particles_per_subblock)
+        self.particles_size = self.particle_size * self.particles_per_subblock
+
 
 class ParticleDataThin(ParticleData):
 
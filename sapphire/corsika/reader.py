@@ -7,7 +7,8 @@
     * :class:`~sapphire.corsika.reader.CorsikaFile`: The file class provides a
       generator over all events in the file.
     * :class:`~sapphire.corsika.reader.CorsikaEvent`: The event class that
-      provides a generator over all particles at ground.
+      provides a generator over all particles at ground, or all particles
+      at once as columns in an array.
 
     and the following classes that correspond to the sub-blocks defined in
     the CORSIKA manual:
@@ -49,6 +50,11 @@
     More Info
     =========
 
+    The file is memory-mapped as an array of blocks
+    (:meth:`CorsikaFile.get_blocks`), which is used to find the sub-blocks
+    by their id and to read all particles of an event at once
+    (:meth:`CorsikaEvent.get_particles_array`).
+
     For short information on fortran unformatted binary files, take a look
     at http://paulbourke.net/dataformats/reading/
 
@@ -69,9 +75,11 @@ from struct import unpack
 import warnings
 import os
 
+import numpy
+
 from .blocks import (RunHeader, RunEnd, EventHeader, EventEnd,
                      ParticleData, Format, ParticleDataThin, FormatThin,
-                     particle_data)
+                     particle_data, particles_data)
 
 
 class CorsikaEvent(object):
@@ -145,6 +153,37 @@ class CorsikaEvent(object):
 
                 yield particle
 
+    def get_particles_array(self):
+        """Get all particles in the event at once.
+
+        This is the array version of :meth:`get_particles`, with the same
+        filtering of particles. The particle data is read from the
+        memory-mapped file and converted in bulk.
+
+        :return: structured array with a row for each particle, see
+                 :func:`~sapphire.corsika.blocks.particles_data`.
+
+        """
+        particles = self._raw_file._get_particles_array(self._header_index,
+                                                        self._end_index)
+        type = particles['id']
+        level = particles['observation_level']
+
+        # skip padding, used to fill a subblock
+        keep = type != 0
+        # muon additional information
+        muon_info = (type == 75) | (type == 76)
+        if muon_info.any():
+            warnings.warn('Ignoring muon additional information.')
+            keep &= ~muon_info
+        # ignore all observation levels except for nr. 1
+        other_level = keep & (level != 1)
+        if other_level.any():
+            warnings.warn('Only observation level 1 will be read!')
+            keep &= ~other_level
+
+        return particles[keep]
+
 
 class CorsikaFile(object):
 
@@ -169,6 +208,8 @@ class CorsikaFile(object):
         self._end_index = None
         self._header = None
         self._end = None
+        self._blocks = None
+        self._subblock_ids = None
         self.format = Format()
 
     def check(self):
@@ -190,19 +231,32 @@ class CorsikaFile(object):
         if self._size % self.format.block_size != 0:
             raise Exception('File "{name}" does not have an integer number '
                             'of blocks!'.format(name=self._filename))
-        block_size = self.format.block_size
-        padding = self.format.block_padding_size
-        n_blocks = self._size / block_size
-        for block in range(n_blocks):
-            self._file.seek(block * block_size)
-            a = unpack('i', self._file.read(padding))[0]
-            self._file.seek((block + 1) * block_size - padding)
-            b = unpack('i', self._file.read(padding))[0]
-            if a != b:
-                raise Exception('Block #{block} is not right: ({head}, {tail})'
-                                .format(block=block, head=a, tail=b))
+        blocks = self.get_blocks()
+        wrong = numpy.flatnonzero(blocks['head'] != blocks['tail'])
+        if len(wrong):
+            block = wrong[0]
+            raise Exception('Block #{block} is not right: ({head}, {tail})'
+                            .format(block=block, head=blocks['head'][block],
+                                    tail=blocks['tail'][block]))
         return True
 
+    def get_blocks(self):
+        """Get the blocks in the file as a memory-mapped array
+
+        The dtype of the array is the block dtype of the format, so the
+        Fortran record padding is available as the head and tail fields
+        and the sub-blocks as the subblocks field.
+
+        :return: read-only numpy.memmap of the blocks.
+
+        """
+        if self._blocks is None:
+            n_blocks = self._size // self.format.block_size
+            self._blocks = numpy.memmap(self._filename, mode='r',
+                                        dtype=self.format.block_dtype,
+                                        shape=(n_blocks,))
+        return self._blocks
+
     def get_sub_blocks(self):
         """Get the sub-blocks in the file.
 
@@ -257,9 +311,7 @@ class CorsikaFile(object):
 
         """
         event_head = None
-        for block in self._subblocks_indices():
-            self._file.seek(block)
-            tag = unpack('4s', self._file.read(self.format.field_size))[0]
+        for block, tag in self._find_subblocks('EVTH', 'EVTE'):
             if tag == 'EVTH':
                 event_head = block
             elif tag == 'EVTE':
@@ -284,18 +336,45 @@ class CorsikaFile(object):
                     continue
                 yield pos
 
+    def _get_subblock_ids(self):
+        """Get the first field of every sub-block as a string"""
+
+        if self._subblock_ids is None:
+            self._subblock_ids = self.get_blocks()['subblocks']['id'].ravel()
+        return self._subblock_ids
+
+    def _subblock_index(self, word):
+        """Get the index of a sub-block from the index where it starts"""
+
+        block, offset = divmod(word, self.format.block_size)
+        offset -= self.format.block_padding_size
+        return (block * self.format.subblocks_per_block +
+                offset // self.format.subblock_size)
+
+    def _subblock_word(self, index):
+        """Get the index where a sub-block starts from its index"""
+
+        block, subblock = divmod(index, self.format.subblocks_per_block)
+        return (block * self.format.block_size +
+                self.format.block_padding_size +
+                subblock * self.format.subblock_size)
+
+    def _find_subblocks(self, *tags):
+        """Find the sub-blocks with one of the given ids
+
+        :return: list of (word, id) tuples, in order of the file.
+
+        """
+        ids = self._get_subblock_ids()
+        indices = numpy.flatnonzero(numpy.in1d(ids, tags))
+        words = self._subblock_word(indices).tolist()
+        return zip(words, ids[indices].tolist())
+
     def _get_events(self):
         """Get the start and end blocks indices for all events"""
 
-        heads = []
-        tails = []
-        for block in self._subblocks_indices():
-            self._file.seek(block)
-            type = unpack('4s', self._file.read(self.format.field_size))[0]
-            if type == 'EVTH':
-                heads.append(block)
-            elif type == 'EVTE':
-                tails.append(block)
+        heads = [block for block, _ in self._find_subblocks('EVTH')]
+        tails = [block for block, _ in self._find_subblocks('EVTE')]
         return (heads, tails)
 
     def _get_event_header(self, word):
@@ -310,9 +389,8 @@ class CorsikaFile(object):
 
     def _get_run_indices(self):
         """Get the indices for the start of the run header and end"""
-        for block in self._subblocks_indices():
-            self._file.seek(block)
-            type = unpack('4s', self._file.read(self.format.field_size))[0]
+
+        for block, type in self._find_subblocks('RUNH', 'RUNE'):
             if type == 'RUNH':
                 head = block
             elif type == 'RUNE':
@@ -347,6 +425,23 @@ class CorsikaFile(object):
                         self.format.fields_per_particle)
         return (particle_data(particle) for particle in particles)
 
+    def _get_particles_array(self, min_sub_block, max_sub_block):
+        """Get all particles between two subblocks as an array
+
+        :param min_sub_block,max_sub_block: the indices where the
+            subblocks before and after the particle subblocks start.
+
+        """
+        first = self._subblock_index(min_sub_block) + 1
+        last = self._subblock_index(max_sub_block)
+        subblocks = self.get_blocks()['subblocks']['fields']
+        blocks, subblock = divmod(numpy.arange(first, last),
+                                  self.format.subblocks_per_block)
+        n_fields = self.format.fields_per_particle
+        n_particle_fields = n_fields * self.format.particles_per_subblock
+        particles = subblocks[blocks, subblock, :n_particle_fields]
+        return particles_data(particles.reshape(-1, n_fields))
+
     def _unpack_subblock(self, word):
         """Unpack a subblock block
 
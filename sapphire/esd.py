@@ -9,12 +9,18 @@
         >>> from sapphire import quick_download
         >>> data = quick_download(501)
 
-    For regular use, look up :func:`download_data`.
+    For regular use, look up :func:`download_data`.  To download data
+    for many stations and days at once, look up :func:`download_many`.
 
 """
 import urllib2
 import urllib
-from httplib import BadStatusLine
+import urlparse
+import httplib
+import socket
+import threading
+from multiprocessing.pool import ThreadPool
+from cStringIO import StringIO
 import csv
 import os.path
 import calendar
@@ -24,6 +30,7 @@ import itertools
 import collections
 import re
 
+import numpy as np
 import tables
 from progressbar import ProgressBar, ETA, Bar, Percentage
 
@@ -35,6 +42,18 @@ EVENTS_URL = 'http://data.hisparc.nl/data/{station_number:d}/events/?{query}'
 WEATHER_URL = 'http://data.hisparc.nl/data/{station_number:d}/weather/?{query}'
 COINCIDENCES_URL = 'http://data.hisparc.nl/data/network/coincidences/?{query}'
 
+#: Number of TSV lines which are parsed and stored in one go.
+BLOCK_SIZE = 10000
+
+#: Maximum number of attempts for a download request.
+MAX_ATTEMPTS = 5
+#: Delay in seconds before the first retry, doubled after each retry.
+RETRY_DELAY = 1.
+#: Minimum time in seconds between checkpoints of a coincidence download.
+CHECKPOINT_INTERVAL = 1.
+#: Maximum number of redirects which are followed for a download request.
+MAX_REDIRECTS = 5
+
 
 def quick_download(station_number, date=None):
     """Quickly download some data
@@ -102,22 +121,21 @@ def load_data(file, group, tsv_file, type='events'):
     """
     if type == 'events':
         table = _get_or_create_events_table(file, group)
-        read_and_store_class = _read_line_and_store_event_class
+        read_and_store_class = _read_lines_and_store_event_class
     elif type == 'weather':
         table = _get_or_create_weather_table(file, group)
-        read_and_store_class = _read_line_and_store_weather_class
+        read_and_store_class = _read_lines_and_store_weather_class
     else:
         raise ValueError("Data type not recognized.")
 
     with open(tsv_file, 'rb') as data:
-        reader = csv.reader(data, delimiter='\t')
         with read_and_store_class(table) as writer:
-            for line in reader:
-                writer.store_line(line)
+            for lines in _iter_line_blocks(data):
+                writer.store_lines(lines)
 
 
 def download_data(file, group, station_number, start=None, end=None,
-                  type='events', progress=True):
+                  type='events', progress=True, update=False):
     """Download event summary data
 
     :param file: the PyTables datafile handler
@@ -129,6 +147,8 @@ def download_data(file, group, station_number, start=None, end=None,
         interval
     :param type: the datatype to download, either 'events' or 'weather'.
     :param progress: if True, show a progressbar while downloading.
+    :param update: if True, only download data newer than the data already
+        in the destination table.
 
     If group is None, use '/s<station_number>' as a default.
 
@@ -137,6 +157,11 @@ def download_data(file, group, station_number, start=None, end=None,
     worth of data is downloaded, starting at the datetime specified with
     start.
 
+    While downloading, a checkpoint is kept in the attributes of the group.
+    If the download fails, calling this function again with the same
+    arguments resumes the download from the checkpoint, without duplicating
+    rows. The checkpoint is removed once the download is complete.
+
     Example::
 
         >>> import tables
@@ -152,50 +177,69 @@ def download_data(file, group, station_number, start=None, end=None,
         group = '/s%d' % station_number
 
     # sensible defaults for start and end
-    if start is None:
-        if end is not None:
-            raise RuntimeError("Start is None, but end is not. "
-                               "I can't go on like this.")
-        else:
-            yesterday = datetime.date.today() - datetime.timedelta(days=1)
-            start = datetime.datetime.combine(yesterday, datetime.time(0, 0))
-    if end is None:
-        end = start + datetime.timedelta(days=1)
+    start, end = _get_start_and_end(start, end)
 
-    # build and open url, create tables and set read function
-    query = urllib.urlencode({'start': start, 'end': end})
+    # create tables and set read function
     if type == 'events':
-        url = EVENTS_URL.format(station_number=station_number, query=query)
+        url = EVENTS_URL
         table = _get_or_create_events_table(file, group)
-        read_and_store = _read_line_and_store_event_class
+        read_and_store = _read_lines_and_store_event_class
     elif type == 'weather':
-        url = WEATHER_URL.format(station_number=station_number, query=query)
+        url = WEATHER_URL
         table = _get_or_create_weather_table(file, group)
-        read_and_store = _read_line_and_store_weather_class
+        read_and_store = _read_lines_and_store_weather_class
     else:
         raise ValueError("Data type not recognized.")
 
-    try:
-        data = urllib2.urlopen(url)
-    except BadStatusLine:
-        # Unexplained transient error, retry once
-        data = urllib2.urlopen(url)
-
     # keep track of event timestamp within [start, end] interval for
     # progressbar
     t_start = calendar.timegm(start.utctimetuple())
     t_end = calendar.timegm(end.utctimetuple())
     t_delta = t_end - t_start
+
+    # resume an incomplete download or continue after the existing data
+    checkpoint_node = table._v_parent
+    checkpoint_key = '%s_s%d' % (type, station_number)
+    interval = {'start': start, 'end': end}
+    checkpoint = _get_checkpoint(checkpoint_node, checkpoint_key)
+    if checkpoint is not None and checkpoint['query'] == interval:
+        _rollback(file, checkpoint['rows'])
+        t_resume = checkpoint['timestamp']
+    elif update and len(table):
+        t_resume = max(t_start, int(table.cols.timestamp[-1]))
+        if t_resume >= t_end:
+            return
+        _rollback(file, {table._v_pathname:
+                         _first_row_at_or_after(table, t_resume)})
+    else:
+        t_resume = t_start
+    _commit_checkpoint(file, checkpoint_node, checkpoint_key, interval,
+                       t_resume, {table._v_pathname: len(table)})
+
+    # build and open url
+    if t_resume != t_start:
+        start = datetime.datetime.utcfromtimestamp(t_resume)
+    query = urllib.urlencode({'start': start, 'end': end})
+    url = url.format(station_number=station_number, query=query)
+    data = _retry_with_backoff(urllib2.urlopen, url)
+
     if progress:
         pbar = ProgressBar(maxval=1.,
                            widgets=[Percentage(), Bar(), ETA()]).start()
 
-    # loop over lines in tsv as they come streaming in
+    # loop over blocks of lines in tsv as they come streaming in
     prev_update = time.time()
-    reader = csv.reader(data, delimiter='\t')
+    line = '#'
     with read_and_store(table) as writer:
-        for line in reader:
-            timestamp = writer.store_line(line)
+        for lines in _iter_line_blocks(data):
+            timestamp = writer.store_lines(lines)
+            line = lines[-1].rstrip('\r\n')
+            if timestamp:
+                # all data before the last timestamp is complete
+                rows = _first_row_at_or_after(table, timestamp)
+                _commit_checkpoint(file, checkpoint_node, checkpoint_key,
+                                   interval, timestamp,
+                                   {table._v_pathname: rows})
             # update progressbar every .5 seconds
             if (progress and time.time() - prev_update > .5 and
                     not timestamp == 0.):
@@ -204,17 +248,106 @@ def download_data(file, group, station_number, start=None, end=None,
     if progress:
         pbar.finish()
 
-    if line[0][0] == '#':
-        if len(line[0]) == 1:
+    if line[0] == '#':
+        if len(line) == 1:
             # No events recieved, and no success line
             raise Exception('Failed to download data, no data recieved.')
         else:
             # Successful download because last line is a non-empty comment
+            _remove_checkpoint(file, checkpoint_node, checkpoint_key)
             return
     else:
         # Last line is data, report failed download and date/time of last line
         raise Exception('Failed to complete download, last received data '
-                        'from: %s %s.' % tuple(line[:2]))
+                        'from: %s %s.' % tuple(line.split('\t')[:2]))
+
+
+def download_many(file, stations, start=None, end=None, type='events',
+                  group='', n_workers=4, progress=True):
+    """Download event summary data for many stations in parallel
+
+    The requested interval is split into (station, day) work units, which
+    are downloaded concurrently by a pool of worker threads. Each worker
+    reuses its HTTP connection and retries failed or incomplete downloads
+    with an exponential backoff. The data is stored by a single writer,
+    in order of station and time, so the result is equal to calling
+    :func:`download_data` for each station.
+
+    :param file: the PyTables datafile handler.
+    :param stations: list of HiSPARC station numbers for which to get data.
+    :param start: a datetime instance defining the start of the search
+        interval.
+    :param end: a datetime instance defining the end of the search
+        interval.
+    :param type: the datatype to download, either 'events' or 'weather'.
+    :param group: path of the parent group, the data for each station is
+        stored in '<group>/s<station_number>'.
+    :param n_workers: number of simultaneous downloads.
+    :param progress: if True, show a progressbar while downloading.
+
+    The start and end parameters may both be None.  In that case,
+    yesterday's data is downloaded.  If only end is None, a single day's
+    worth of data is downloaded, starting at the datetime specified with
+    start.
+
+    Example::
+
+        >>> import tables
+        >>> import datetime
+        >>> import sapphire.esd
+        >>> data = tables.open_file('data.h5', 'w')
+        >>> sapphire.esd.download_many(data, [501, 502, 503],
+        ...     datetime.datetime(2013, 9, 1), datetime.datetime(2013, 9, 8))
+
+    """
+    if type == 'events':
+        url = EVENTS_URL
+        get_or_create_table = _get_or_create_events_table
+        read_and_store = _read_lines_and_store_event_class
+    elif type == 'weather':
+        url = WEATHER_URL
+        get_or_create_table = _get_or_create_weather_table
+        read_and_store = _read_lines_and_store_weather_class
+    else:
+        raise ValueError("Data type not recognized.")
+
+    # sensible defaults for start and end
+    start, end = _get_start_and_end(start, end)
+
+    units = [(station_number, day_start, day_end)
+             for station_number in stations
+             for day_start, day_end in _split_in_days(start, end)]
+    if progress:
+        pbar = ProgressBar(maxval=len(units),
+                           widgets=[Percentage(), Bar(), ETA()]).start()
+
+    connections = threading.local()
+    pool = ThreadPool(n_workers)
+    pending = collections.deque()
+    n_stored = 0
+    try:
+        for idx, (station_number, day_start, day_end) in enumerate(units):
+            query = urllib.urlencode({'start': day_start, 'end': day_end})
+            unit_url = url.format(station_number=station_number, query=query)
+            result = pool.apply_async(_retry_with_backoff,
+                                      (_fetch_tsv, unit_url, connections))
+            pending.append(('%s/s%d' % (group, station_number), result))
+
+            # store downloads in order, limit the number of downloads which
+            # are kept in memory.
+            last_unit = idx == len(units) - 1
+            while pending and (len(pending) > 2 * n_workers or last_unit):
+                station_group, result = pending.popleft()
+                table = get_or_create_table(file, station_group)
+                _store_tsv(table, read_and_store, result.get())
+                n_stored += 1
+                if progress:
+                    pbar.update(n_stored)
+    finally:
+        pool.terminate()
+        pool.join()
+    if progress:
+        pbar.finish()
 
 
 def load_coincidences(file, tsv_file, group=''):
@@ -281,7 +414,8 @@ def load_coincidences(file, tsv_file, group=''):
 
 
 def download_coincidences(file, group='', cluster=None, stations=None,
-                          start=None, end=None, n=2, progress=True):
+                          start=None, end=None, n=2, progress=True,
+                          update=False):
     """Download event summary data coincidences
 
     :param file: PyTables datafile handler.
@@ -293,6 +427,9 @@ def download_coincidences(file, group='', cluster=None, stations=None,
     :param end: a datetime instance defining the end of the search
         interval.
     :param n: the minimum number of events in the coincidence.
+    :param progress: if True, show a progressbar while downloading.
+    :param update: if True, only download coincidences newer than the
+        coincidences already in the destination group.
 
     The start and end parameters may both be None.  In that case,
     yesterday's data is downloaded.  If only end is None, a single day's
@@ -302,6 +439,9 @@ def download_coincidences(file, group='', cluster=None, stations=None,
     Optionally either a cluster or stations can be defined to limit the
     results to include only events from those stations.
 
+    As with :func:`download_data`, an incomplete download is resumed when
+    this function is called again with the same arguments.
+
     Example::
 
         >>> import tables
@@ -314,37 +454,49 @@ def download_coincidences(file, group='', cluster=None, stations=None,
 
     """
     # sensible defaults for start and end
-    if start is None:
-        if end is not None:
-            raise RuntimeError("Start is None, but end is not. "
-                               "I can't go on like this.")
-        else:
-            yesterday = datetime.date.today() - datetime.timedelta(days=1)
-            start = datetime.datetime.combine(yesterday, datetime.time(0, 0))
-    if end is None:
-        end = start + datetime.timedelta(days=1)
+    start, end = _get_start_and_end(start, end)
 
     if stations is not None and len(stations) < n:
         raise Exception('To few stations in query, give at least n.')
 
-    # build and open url, create tables and set read function
-    query = urllib.urlencode({'cluster': cluster, 'stations': stations,
-                              'start': start, 'end': end, 'n': n})
-    url = COINCIDENCES_URL.format(query=query)
+    # create tables
     station_groups = _read_or_get_station_groups(file, group)
     c_group = _get_or_create_coincidences_tables(file, group, station_groups)
-
-    try:
-        data = urllib2.urlopen(url, timeout=1800)
-    except BadStatusLine:
-        # Unexplained transient error, retry once
-        data = urllib2.urlopen(url, timeout=1800)
+    coincidences = file.get_node(c_group, 'coincidences')
 
     # keep track of event timestamp within [start, end] interval for
     # progressbar
     t_start = calendar.timegm(start.utctimetuple())
     t_end = calendar.timegm(end.utctimetuple())
     t_delta = t_end - t_start
+
+    # resume an incomplete download or continue after the existing data
+    checkpoint_key = 'coincidences'
+    interval = {'cluster': cluster, 'stations': stations, 'start': start,
+                'end': end, 'n': n}
+    checkpoint = _get_checkpoint(c_group, checkpoint_key)
+    if checkpoint is not None and checkpoint['query'] == interval:
+        _rollback(file, checkpoint['rows'])
+        t_resume = checkpoint['timestamp']
+    elif update and len(coincidences):
+        t_resume = max(t_start, int(coincidences.cols.timestamp[-1]))
+        if t_resume >= t_end:
+            return
+        _rollback(file, _coincidence_rows_before(file, c_group, t_resume))
+    else:
+        t_resume = t_start
+    rows = _coincidence_rows(file, c_group, station_groups)
+    _commit_checkpoint(file, c_group, checkpoint_key, interval, t_resume,
+                       rows)
+
+    # build and open url
+    if t_resume != t_start:
+        start = datetime.datetime.utcfromtimestamp(t_resume)
+    query = urllib.urlencode({'cluster': cluster, 'stations': stations,
+                              'start': start, 'end': end, 'n': n})
+    url = COINCIDENCES_URL.format(query=query)
+    data = _retry_with_backoff(urllib2.urlopen, url, timeout=1800)
+
     if progress:
         pbar = ProgressBar(maxval=1.,
                            widgets=[Percentage(), Bar(), ETA()]).start()
@@ -352,6 +504,8 @@ def download_coincidences(file, group='', cluster=None, stations=None,
     # loop over lines in tsv as they come streaming in, keep temporary
     # lists until a full coincidence is in.
     prev_update = time.time()
+    prev_commit = time.time()
+    stored_timestamp = t_resume
     reader = csv.reader(data, delimiter='\t')
     current_coincidence = 0
     coincidence = []
@@ -360,11 +514,25 @@ def download_coincidences(file, group='', cluster=None, stations=None,
             continue
         elif int(line[0]) == current_coincidence:
             coincidence.append(line)
+        elif not coincidence:
+            # First coincidence
+            coincidence = [line]
+            current_coincidence = int(line[0])
         else:
+            # all coincidences before this one are complete, commit them
+            # regularly if all stored coincidences are before this timestamp.
+            timestamp = int(coincidence[0][4])
+            if (time.time() - prev_commit >= CHECKPOINT_INTERVAL and
+                    timestamp > stored_timestamp):
+                _commit_checkpoint(file, c_group, checkpoint_key, interval,
+                                   timestamp, rows)
+                prev_commit = time.time()
             # Full coincidence has been received, store it.
-            timestamp = _read_lines_and_store_coincidence(file, c_group,
-                                                          coincidence,
-                                                          station_groups)
+            _read_lines_and_store_coincidence(file, c_group, coincidence,
+                                              station_groups)
+            _update_coincidence_rows(rows, c_group, coincidence,
+                                     station_groups)
+            stored_timestamp = timestamp
             # update progressbar every .5 seconds
             if (progress and time.time() - prev_update > .5 and
                     not timestamp == 0.):
@@ -387,7 +555,7 @@ def download_coincidences(file, group='', cluster=None, stations=None,
             raise Exception('Failed to download data, no data recieved.')
         else:
             # Successful download because last line is a non-empty comment
-            pass
+            _remove_checkpoint(file, c_group, checkpoint_key)
     else:
         # Last line is data, report failed download and date/time of last line
         raise Exception('Failed to complete download, last received data '
@@ -396,6 +564,288 @@ def download_coincidences(file, group='', cluster=None, stations=None,
     file.flush()
 
 
+def _get_start_and_end(start, end):
+    """Get sensible defaults for the start and end of a download
+
+    If both are None, return the start and end of yesterday. If only end
+    is None, return an interval of one day starting at start.
+
+    """
+    if start is None:
+        if end is not None:
+            raise RuntimeError("Start is None, but end is not. "
+                               "I can't go on like this.")
+        else:
+            yesterday = datetime.date.today() - datetime.timedelta(days=1)
+            start = datetime.datetime.combine(yesterday, datetime.time(0, 0))
+    if end is None:
+        end = start + datetime.timedelta(days=1)
+    return start, end
+
+
+def _split_in_days(start, end):
+    """Split an interval into consecutive intervals of at most one day
+
+    :param start,end: datetime instances defining the interval.
+    :return: list of (start, end) tuples.
+
+    """
+    intervals = []
+    while start < end:
+        next_start = min(start + datetime.timedelta(days=1), end)
+        intervals.append((start, next_start))
+        start = next_start
+    return intervals
+
+
+class _IncompleteDownloadError(Exception):
+
+    """The download did not end with the success line"""
+
+    pass
+
+
+def _retry_with_backoff(function, *args, **kwargs):
+    """Call function, retry after transient network errors
+
+    Failed attempts are retried up to :data:`MAX_ATTEMPTS` times, waiting
+    :data:`RETRY_DELAY` seconds before the first retry and twice as long
+    before each next retry. Client errors (HTTP 4xx) are not retried.
+
+    :param function: the function to call, e.g. urllib2.urlopen.
+    :return: the return value of the function.
+
+    """
+    delay = RETRY_DELAY
+    for attempt in range(1, MAX_ATTEMPTS + 1):
+        try:
+            return function(*args, **kwargs)
+        except urllib2.HTTPError as exc:
+            if exc.code < 500 or attempt == MAX_ATTEMPTS:
+                raise
+        except (httplib.HTTPException, urllib2.URLError, socket.error,
+                _IncompleteDownloadError):
+            if attempt == MAX_ATTEMPTS:
+                raise
+        time.sleep(delay)
+        delay *= 2
+
+
+def _fetch_tsv(url, connections):
+    """Fetch a complete TSV download
+
+    An HTTP(S) connection is kept per thread and per host in connections
+    and is reused for subsequent requests.  Redirects are followed at most
+    :data:`MAX_REDIRECTS` times.
+
+    :param url: the url to download.
+    :param connections: a threading.local instance to hold the connections.
+    :return: the downloaded TSV data.
+
+    """
+    for _ in range(MAX_REDIRECTS + 1):
+        response, tsv = _get_response(url, connections)
+        location = response.getheader('Location')
+        if response.status in (301, 302, 303, 307, 308) and location:
+            url = urlparse.urljoin(url, location)
+        else:
+            break
+
+    if response.status != 200:
+        raise urllib2.HTTPError(url, response.status, response.reason,
+                                response.msg, None)
+
+    line = tsv.rstrip('\r\n').rsplit('\n', 1)[-1].rstrip('\r')
+    if not line.startswith('#') or len(line) == 1:
+        raise _IncompleteDownloadError('Failed to complete download of %s.' %
+                                       url)
+    return tsv
+
+
+def _get_response(url, connections):
+    """Perform a GET request on a reused connection
+
+    :param url: the url to request.
+    :param connections: a threading.local instance to hold the connections.
+    :return: the response and its body.
+
+    """
+    parts = urlparse.urlsplit(url)
+    path = urlparse.urlunsplit(('', '', parts.path, parts.query, ''))
+    key = (parts.scheme, parts.netloc)
+    connection = connections.__dict__.get(key)
+    if connection is None:
+        if parts.scheme == 'https':
+            connection = httplib.HTTPSConnection(parts.netloc, timeout=1800)
+        else:
+            connection = httplib.HTTPConnection(parts.netloc, timeout=1800)
+        connections.__dict__[key] = connection
+
+    try:
+        connection.request('GET', path)
+        response = connection.getresponse()
+        body = response.read()
+    except (httplib.HTTPException, socket.error):
+        # Start with a fresh connection on the next attempt
+        connection.close()
+        del connections.__dict__[key]
+        raise
+    return response, body
+
+
+def _store_tsv(table, read_and_store, tsv):
+    """Store downloaded TSV data in a table
+
+    :param table: the destination table.
+    :param read_and_store: class to parse and store blocks of lines.
+    :param tsv: TSV data as a string.
+
+    """
+    with read_and_store(table) as writer:
+        for lines in _iter_line_blocks(StringIO(tsv)):
+            writer.store_lines(lines)
+
+
+def _get_checkpoint(node, key):
+    """Get a download checkpoint from the attributes of a node
+
+    :param node: the group containing the checkpoints.
+    :param key: identifier of the download, e.g. 'events_s501'.
+    :return: the checkpoint, or None if there is no checkpoint.
+
+    """
+    try:
+        checkpoints = node._v_attrs.download_checkpoints
+    except AttributeError:
+        return None
+    return checkpoints.get(key)
+
+
+def _commit_checkpoint(file, node, key, query, timestamp, rows):
+    """Store a download checkpoint in the attributes of a node
+
+    All data before timestamp has been downloaded and is stored in the
+    first rows of the tables. The file is flushed to commit the data.
+
+    :param node: the group containing the checkpoints.
+    :param key: identifier of the download, e.g. 'events_s501'.
+    :param query: dictionary with the parameters of the download.
+    :param timestamp: timestamp up to which the download is complete.
+    :param rows: dictionary with the number of complete rows per path.
+    :return: the new checkpoint.
+
+    """
+    checkpoint = {'query': query, 'timestamp': timestamp, 'rows': dict(rows)}
+    checkpoints = getattr(node._v_attrs, 'download_checkpoints', {})
+    checkpoints[key] = checkpoint
+    node._v_attrs.download_checkpoints = checkpoints
+    file.flush()
+    return checkpoint
+
+
+def _remove_checkpoint(file, node, key):
+    """Remove a download checkpoint, the download is complete"""
+
+    checkpoints = getattr(node._v_attrs, 'download_checkpoints', {})
+    checkpoints.pop(key, None)
+    if checkpoints:
+        node._v_attrs.download_checkpoints = checkpoints
+    elif 'download_checkpoints' in node._v_attrs:
+        del node._v_attrs.download_checkpoints
+    file.flush()
+
+
+def _rollback(file, rows):
+    """Remove rows which were stored after a checkpoint
+
+    :param rows: dictionary with the number of rows to keep per path.
+
+    """
+    for path, n in rows.iteritems():
+        try:
+            node = file.get_node(path)
+        except tables.NoSuchNodeError:
+            continue
+        if len(node) > n:
+            node.truncate(n)
+            if isinstance(node, tables.VLArray):
+                # Appending to a truncated VLArray leaves an empty row,
+                # unless the node is reloaded first.
+                node._f_close()
+    file.flush()
+
+
+def _first_row_at_or_after(table, timestamp):
+    """Find the first row of the trailing rows with a given timestamp
+
+    :param table: table which is sorted by timestamp.
+    :param timestamp: the timestamp.
+    :return: index of the first row such that it and all following rows
+             have a timestamp equal to or larger than timestamp.
+
+    """
+    stop = len(table)
+    while stop:
+        start = max(stop - BLOCK_SIZE, 0)
+        timestamps = table.read(start, stop, field='timestamp')
+        before = (timestamps < timestamp).nonzero()[0]
+        if len(before):
+            return start + before[-1] + 1
+        stop = start
+    return 0
+
+
+def _coincidence_rows(file, c_group, station_groups):
+    """Get the number of rows in the coincidence and event tables
+
+    :return: dictionary with the number of rows per path.
+
+    """
+    rows = {}
+    for station_group in station_groups.itervalues():
+        try:
+            events = file.get_node(station_group['group'], 'events')
+        except tables.NoSuchNodeError:
+            rows[station_group['group'] + '/events'] = 0
+        else:
+            rows[events._v_pathname] = len(events)
+    for name in ['coincidences', 'c_index']:
+        node = file.get_node(c_group, name)
+        rows[node._v_pathname] = len(node)
+    return rows
+
+
+def _update_coincidence_rows(rows, c_group, coincidence, station_groups):
+    """Count the rows added by storing a coincidence"""
+
+    for name in ['coincidences', 'c_index']:
+        rows[c_group._v_pathname + '/' + name] += 1
+    for event in coincidence:
+        path = station_groups[int(event[1])]['group'] + '/events'
+        rows[path] = rows.get(path, 0) + 1
+
+
+def _coincidence_rows_before(file, c_group, timestamp):
+    """Get the number of rows which contain coincidences before timestamp
+
+    Coincidences with the given or later timestamps are at the end of the
+    coincidences table, and their events at the end of the event tables.
+
+    :return: dictionary with the number of rows to keep per path.
+
+    """
+    coincidences = file.get_node(c_group, 'coincidences')
+    c_index = file.get_node(c_group, 'c_index')
+    s_index = file.get_node(c_group, 's_index')
+    n = _first_row_at_or_after(coincidences, timestamp)
+    rows = {coincidences._v_pathname: n, c_index._v_pathname: n}
+    for c_idx in c_index[n:]:
+        for s_idx, e_idx in c_idx:
+            path = s_index[s_idx] + '/events'
+            rows[path] = min(rows.get(path, e_idx), e_idx)
+    return rows
+
+
 def _read_or_get_station_groups(file, group):
     """Get station numbers from existing cluster attribute or a new set
 
@@ -608,7 +1058,7 @@ def _read_lines_and_store_coincidence(file, c_group, coincidence,
     return int(coincidence[0][4])
 
 
-class _read_line_and_store_weather_class(object):
+class _read_line_and_store_event_class(object):
 
     def __init__(self, table):
         self.table = table
@@ -623,31 +1073,28 @@ class _read_line_and_store_weather_class(object):
             return 0.
 
         # break up TSV line
-        (date, time, timestamp, temperature_inside, temperature_outside,
-         humidity_inside, humidity_outside, atmospheric_pressure,
-         wind_direction, wind_speed, solar_radiation, uv_index,
-         evapotranspiration, rain_rate, heat_index, dew_point,
-         wind_chill) = line
+        (date, time_str, timestamp, nanoseconds, ph1, ph2, ph3, ph4, int1,
+         int2, int3, int4, n1, n2, n3, n4, t1, t2, t3, t4, t_trigger, zenith,
+         azimuth) = line[:23]
 
         row = self.table.row
 
-        # convert string values to correct data types
+        # convert string values to correct data types or calculate values
         row['event_id'] = self.event_counter
         row['timestamp'] = int(timestamp)
-        row['temp_inside'] = float(temperature_inside)
-        row['temp_outside'] = float(temperature_outside)
-        row['humidity_inside'] = int(humidity_inside)
-        row['humidity_outside'] = int(humidity_outside)
-        row['barometer'] = float(atmospheric_pressure)
-        row['wind_dir'] = int(wind_direction)
-        row['wind_speed'] = int(wind_speed)
-        row['solar_rad'] = int(solar_radiation)
-        row['uv'] = int(uv_index)
-        row['evapotranspiration'] = float(evapotranspiration)
-        row['rain_rate'] = float(rain_rate)
-        row['heat_index'] = int(heat_index)
-        row['dew_point'] = float(dew_point)
-        row['wind_chill'] = float(wind_chill)
+        row['nanoseconds'] = int(nanoseconds)
+        row['ext_timestamp'] = int(timestamp) * int(1e9) + int(nanoseconds)
+        row['pulseheights'] = [int(ph1), int(ph2), int(ph3), int(ph4)]
+        row['integrals'] = [int(int1), int(int2), int(int3), int(int4)]
+        row['n1'] = float(n1)
+        row['n2'] = float(n2)
+        row['n3'] = float(n3)
+        row['n4'] = float(n4)
+        row['t1'] = float(t1)
+        row['t2'] = float(t2)
+        row['t3'] = float(t3)
+        row['t4'] = float(t4)
+        row['t_trigger'] = float(t_trigger)
 
         # store event
         row.append()
@@ -663,7 +1110,77 @@ class _read_line_and_store_weather_class(object):
         self.table.flush()
 
 
-class _read_line_and_store_event_class(object):
+def _iter_line_blocks(data, size=None):
+    """Read lines from a file-like object in blocks
+
+    :param data: file-like object which can be iterated over by line.
+    :param size: maximum number of lines per block, by default
+                 :data:`BLOCK_SIZE`.
+    :return: generator which yields lists of lines.
+
+    """
+    if size is None:
+        size = BLOCK_SIZE
+    while True:
+        lines = list(itertools.islice(data, size))
+        if not lines:
+            return
+        yield lines
+
+
+def _parse_tsv_lines(lines, n_columns):
+    """Parse the numerical values of TSV data lines
+
+    The first two columns (date and time) are skipped, as well as all
+    columns beyond the requested number of columns. Comment and empty
+    lines are ignored.
+
+    :param lines: lines from a TSV download.
+    :param n_columns: number of numerical columns to read, starting at the
+                      third column (timestamp).
+    :return: array of shape (number of data lines, n_columns).
+
+    """
+    data_lines = [line for line in lines
+                  if line.strip() and not line.startswith('#')]
+    n_lines = len(data_lines)
+    if not n_lines:
+        return np.empty((0, n_columns))
+
+    text = '\n'.join(line.split('\t', 2)[-1] for line in data_lines)
+    values = np.fromstring(text, sep='\t')
+    if len(values) == n_lines * n_columns:
+        return values.reshape(n_lines, n_columns)
+    else:
+        # Unexpected number of values, e.g. extra columns, parse per line
+        return np.array([_parse_tsv_line(line, n_columns)
+                         for line in data_lines])
+
+
+def _parse_tsv_line(line, n_columns):
+    """Parse the numerical values of a single TSV data line
+
+    :param line: a data line from a TSV download.
+    :param n_columns: number of numerical columns to read.
+    :return: list of values.
+
+    """
+    values = line.rstrip('\r\n').split('\t')[2:2 + n_columns]
+    if len(values) != n_columns:
+        raise ValueError('Unable to parse incomplete line: %r' % line)
+    return [float(value) for value in values]
+
+
+class _read_lines_and_store_class(object):
+
+    """Parse blocks of TSV lines and append them to a table
+
+    Subclasses define the number of numerical columns in the TSV data
+    (excluding date and time) and how to convert them to table rows.
+
+    """
+
+    n_columns = None
 
     def __init__(self, table):
         self.table = table
@@ -672,44 +1189,64 @@ class _read_line_and_store_event_class(object):
     def __enter__(self):
         return self
 
-    def store_line(self, line):
-        # ignore comment lines
-        if line[0][0] == '#':
-            return 0.
+    def store_lines(self, lines):
+        """Parse and store a block of TSV lines
 
-        # break up TSV line
-        (date, time_str, timestamp, nanoseconds, ph1, ph2, ph3, ph4, int1,
-         int2, int3, int4, n1, n2, n3, n4, t1, t2, t3, t4, t_trigger, zenith,
-         azimuth) = line[:23]
+        :param lines: list of (unsplit) lines from the TSV data.
+        :return: timestamp of the last stored row, or 0. if the block
+                 contained no data.
 
-        row = self.table.row
+        """
+        values = _parse_tsv_lines(lines, self.n_columns)
+        n_rows = len(values)
+        if not n_rows:
+            return 0.
 
-        # convert string values to correct data types or calculate values
-        row['event_id'] = self.event_counter
-        row['timestamp'] = int(timestamp)
-        row['nanoseconds'] = int(nanoseconds)
-        row['ext_timestamp'] = int(timestamp) * int(1e9) + int(nanoseconds)
-        row['pulseheights'] = [int(ph1), int(ph2), int(ph3), int(ph4)]
-        row['integrals'] = [int(int1), int(int2), int(int3), int(int4)]
-        row['n1'] = float(n1)
-        row['n2'] = float(n2)
-        row['n3'] = float(n3)
-        row['n4'] = float(n4)
-        row['t1'] = float(t1)
-        row['t2'] = float(t2)
-        row['t3'] = float(t3)
-        row['t4'] = float(t4)
-        row['t_trigger'] = float(t_trigger)
+        rows = np.zeros(n_rows, dtype=self.table.dtype)
+        rows['event_id'] = np.arange(self.event_counter,
+                                     self.event_counter + n_rows)
+        rows['timestamp'] = values[:, 0]
+        self.fill_rows(rows, values)
 
-        # store event
-        row.append()
+        self.table.append(rows)
+        self.event_counter += n_rows
 
-        self.event_counter += 1
-        # force flush every 1e6 rows to free buffers
-        if not self.event_counter % 1000000:
-            self.table.flush()
+        return int(rows['timestamp'][-1])
 
-        return int(timestamp)
+    def fill_rows(self, rows, values):
+        """Fill the columns of rows using the parsed values"""
+
+        raise NotImplementedError
 
     def __exit__(self, type, value, traceback):
         self.table.flush()
+
+
+class _read_lines_and_store_weather_class(_read_lines_and_store_class):
+
+    n_columns = 15
+
+    def fill_rows(self, rows, values):
+        columns = ['temp_inside', 'temp_outside', 'humidity_inside',
+                   'humidity_outside', 'barometer', 'wind_dir', 'wind_speed',
+                   'solar_rad', 'uv', 'evapotranspiration', 'rain_rate',
+                   'heat_index', 'dew_point', 'wind_chill']
+        for idx, column in enumerate(columns, 1):
+            rows[column] = values[:, idx]
+
+
+class _read_lines_and_store_event_class(_read_lines_and_store_class):
+
+    n_columns = 21
+
+    def fill_rows(self, rows, values):
+        timestamp = values[:, 0].astype(np.uint64)
+        nanoseconds = values[:, 1].astype(np.uint64)
+        rows['nanoseconds'] = nanoseconds
+        rows['ext_timestamp'] = timestamp * np.uint64(int(1e9)) + nanoseconds
+        rows['pulseheights'] = values[:, 2:6]
+        rows['integrals'] = values[:, 6:10]
+        for idx, column in enumerate(['n1', 'n2', 'n3', 'n4',
+                                      't1', 't2', 't3', 't4', 't_trigger'],
+                                     10):
+            rows[column] = values[:, idx]
@@ -19,7 +19,15 @@ Example usage::
     >>> sim = BaseSimulation(cluster, data, '/simulations/this_run', 10)
     >>> sim.run()
 
+Simulations can also be split over several processes with
+:func:`run_simulation_in_parallel`, which merges the results into the
+same tables.
+
 """
+from multiprocessing import Pool, cpu_count
+import os
+import shutil
+import tempfile
 import warnings
 import random
 
@@ -83,6 +91,32 @@ class BaseSimulation(object):
             self.store_coincidence(shower_id, shower_parameters,
                                    station_events)
 
+    def run_many(self, batch_size=1000):
+        """Run the simulations, for many showers at once.
+
+        Instead of simulating one detector of one shower at a time, the
+        response of all detectors in the cluster is simulated for a batch
+        of showers at once.  The results are stored in the same tables as
+        those of :meth:`run`, but the random numbers are drawn in a
+        different order, so the results for a given seed differ.
+
+        Simulations which implement :meth:`generate_shower_parameters_many`
+        and :meth:`simulate_detector_response_many` simulate the showers
+        in batches, others simulate them one at a time.
+
+        :param batch_size: number of showers to simulate at once.
+
+        """
+        shower_id = 0
+        for shower_parameters in self.generate_shower_parameters_many(
+                batch_size):
+
+            event_indexes = self.simulate_events_for_shower_many(
+                shower_parameters)
+            self.store_coincidence_many(shower_id, shower_parameters,
+                                        event_indexes)
+            shower_id += len(event_indexes)
+
     def generate_shower_parameters(self):
         """Generate shower parameters like core position, energy, etc."""
 
@@ -96,6 +130,33 @@ class BaseSimulation(object):
         for i in pbar(range(self.N), show=self.progress):
             yield shower_parameters
 
+    def generate_shower_parameters_many(self, batch_size):
+        """Generate shower parameters for batches of showers.
+
+        By default the showers from :meth:`generate_shower_parameters`
+        are yielded one at a time, as batches of a single shower.  The
+        next shower is only generated once the previous batch has been
+        simulated, so this also works for simulations which move the
+        cluster for each shower.
+
+        :param batch_size: maximum number of showers per batch.
+        :return: dictionaries with the same keys as those from
+                 :meth:`generate_shower_parameters`, but with arrays of
+                 values, core_pos is a tuple of x and y arrays.
+
+        """
+        for shower_parameters in self.generate_shower_parameters():
+            batch = {}
+            for key, value in shower_parameters.iteritems():
+                if key == 'core_pos':
+                    batch[key] = tuple(np.array([v], dtype=float)
+                                       for v in value)
+                elif value is None:
+                    batch[key] = np.array([np.nan])
+                else:
+                    batch[key] = np.array([value])
+            yield batch
+
     def simulate_events_for_shower(self, shower_parameters):
         """Simulate station events for a single shower"""
 
@@ -111,6 +172,40 @@ class BaseSimulation(object):
                 station_events.append((station_id, event_index))
         return station_events
 
+    def simulate_events_for_shower_many(self, shower_parameters):
+        """Simulate station events for many showers
+
+        :param shower_parameters: dictionary with arrays of shower
+                                  parameters.
+        :return: array with the index of the stored event for each shower
+                 (rows) and station (columns), -1 if the station did not
+                 trigger.
+
+        """
+        detector_observables = self.simulate_detector_response_many(
+            shower_parameters)
+        n_showers = len(shower_parameters['ext_timestamp'])
+        event_indexes = np.empty((n_showers, len(self.cluster.stations)),
+                                 dtype=np.int64)
+        event_indexes.fill(-1)
+
+        first_detector = 0
+        for station_id, station in enumerate(self.cluster.stations):
+            detectors = slice(first_detector,
+                              first_detector + len(station.detectors))
+            first_detector = detectors.stop
+            station_detector_observables = {
+                key: values[:, detectors]
+                for key, values in detector_observables.iteritems()}
+
+            has_triggered, station_observables = \
+                self.simulate_station_response_many(
+                    station, station_detector_observables, shower_parameters)
+            event_indexes[has_triggered, station_id] = \
+                self.store_station_observables_many(
+                    station_id, station_observables, has_triggered)
+        return event_indexes
+
     def simulate_station_response(self, station, shower_parameters):
         """Simulate station response to a shower."""
 
@@ -124,6 +219,30 @@ class BaseSimulation(object):
 
         return has_triggered, station_observables
 
+    def simulate_station_response_many(self, station, detector_observables,
+                                       shower_parameters):
+        """Simulate station response to many showers
+
+        :param station: :class:`~sapphire.clusters.Station` instance.
+        :param detector_observables: dictionary with arrays of detector
+            observables, with a row for each shower and a column for each
+            detector of the station.
+        :param shower_parameters: dictionary with arrays of shower
+                                  parameters.
+        :return: boolean array which is True for showers which triggered
+                 the station, and a dictionary with arrays of station
+                 observables.
+
+        """
+        has_triggered = self.simulate_trigger_many(detector_observables)
+        station_observables = \
+            self.process_detector_observables_many(detector_observables)
+        station_observables = self.simulate_gps_many(station_observables,
+                                                     shower_parameters,
+                                                     station)
+
+        return has_triggered, station_observables
+
     def simulate_all_detectors(self, detectors, shower_parameters):
         """Simulate response of all detectors in a station.
 
@@ -153,11 +272,43 @@ class BaseSimulation(object):
 
         return observables
 
+    def simulate_detector_response_many(self, shower_parameters):
+        """Simulate the response of all detectors in the cluster to showers.
+
+        :param shower_parameters: dictionary with arrays of shower
+                                  parameters.
+        :return: dictionary with keys 'n' and/or 't' and arrays with a
+                 row for each shower and a column for each detector in
+                 the cluster, ordered by station.
+
+        """
+        # implement this!
+        shape = (len(shower_parameters['ext_timestamp']),
+                 len(self.get_detectors()))
+        n = np.zeros(shape)
+        t = np.empty(shape)
+        t.fill(-999)
+        observables = {'n': n, 't': t}
+
+        return observables
+
+    def get_detectors(self):
+        """Get all detectors in the cluster, ordered by station"""
+
+        return [detector for station in self.cluster.stations
+                for detector in station.detectors]
+
     def simulate_trigger(self, detector_observables):
         """Simulate a trigger response."""
 
         return True
 
+    def simulate_trigger_many(self, detector_observables):
+        """Simulate the trigger response to many showers."""
+
+        n_showers = len(detector_observables.values()[0])
+        return np.ones(n_showers, dtype=bool)
+
     def simulate_gps(self, station_observables, shower_parameters, station):
         """Simulate gps timestamp."""
 
@@ -166,6 +317,18 @@ class BaseSimulation(object):
 
         return station_observables
 
+    def simulate_gps_many(self, station_observables, shower_parameters,
+                          station):
+        """Simulate gps timestamps for many showers."""
+
+        zeros = np.zeros(len(shower_parameters['ext_timestamp']),
+                         dtype=np.int64)
+        gps_timestamp = {'ext_timestamp': zeros, 'timestamp': zeros,
+                         'nanoseconds': zeros}
+        station_observables.update(gps_timestamp)
+
+        return station_observables
+
     def process_detector_observables(self, detector_observables):
         """Process detector observables for a station.
 
@@ -193,6 +356,31 @@ class BaseSimulation(object):
 
         return station_observables
 
+    def process_detector_observables_many(self, detector_observables):
+        """Process detector observables of a station for many showers.
+
+        Array version of :meth:`process_detector_observables`.
+
+        :param detector_observables: dictionary with arrays of detector
+            observables, with a row for each shower and a column for each
+            detector of the station.
+        :return: dictionary containing arrays of the familiar station
+                 observables like n1, n2, n3, etc.
+
+        """
+        n_showers = len(detector_observables.values()[0])
+        station_observables = {'pulseheights': -np.ones((n_showers, 4)),
+                               'integrals': -np.ones((n_showers, 4))}
+
+        for key, values in detector_observables.iteritems():
+            if key in ['n', 't']:
+                for detector_id, value in enumerate(values.T, 1):
+                    station_observables[key + str(detector_id)] = value
+            elif key in ['pulseheights', 'integrals']:
+                station_observables[key][:, :values.shape[1]] = values
+
+        return station_observables
+
     def store_station_observables(self, station_id, station_observables):
         """Store station observables.
 
@@ -215,6 +403,36 @@ class BaseSimulation(object):
 
         return events_table.nrows - 1
 
+    def store_station_observables_many(self, station_id,
+                                       station_observables, has_triggered):
+        """Store station observables of many showers.
+
+        :param station_id: the id of the station in self.cluster
+        :param station_observables: A dictionary containing arrays of
+            the variables to be stored, one value for each shower.
+        :param has_triggered: boolean array which selects the showers
+            for which an event is stored.
+        :return: The indexes (row numbers) of the newly added events.
+
+        """
+        events_table = self.station_groups[station_id].events
+        first_index = events_table.nrows
+        n_events = np.count_nonzero(has_triggered)
+
+        events = np.zeros(n_events, dtype=events_table.dtype)
+        for key, default in events_table.coldflts.iteritems():
+            events[key] = default
+        events['event_id'] = np.arange(first_index, first_index + n_events)
+        for key, values in station_observables.iteritems():
+            if key in events_table.colnames:
+                events[key] = values[has_triggered]
+            else:
+                warnings.warn('Unsupported variable')
+        events_table.append(events)
+        events_table.flush()
+
+        return events['event_id']
+
     def store_coincidence(self, shower_id, shower_parameters,
                           station_events):
         """Store coincidence.
@@ -262,6 +480,69 @@ class BaseSimulation(object):
         self.c_index.append(station_events)
         self.c_index.flush()
 
+    def store_coincidence_many(self, first_shower_id, shower_parameters,
+                               event_indexes):
+        """Store the coincidences of many showers.
+
+        Array version of :meth:`store_coincidence`.
+
+        :param first_shower_id: The shower number for the first
+            coincidence id.
+        :param shower_parameters: A dictionary with arrays of the
+            parameters of the simulated showers.
+        :param event_indexes: array with the index of the event for each
+            shower (rows) and station (columns), -1 for no event.
+
+        """
+        n_showers = len(event_indexes)
+        has_event = event_indexes >= 0
+
+        coincidences = np.zeros(n_showers, dtype=self.coincidences.dtype)
+        for key, default in self.coincidences.coldflts.iteritems():
+            coincidences[key] = default
+        coincidences['id'] = np.arange(first_shower_id,
+                                       first_shower_id + n_showers)
+        coincidences['N'] = has_event.sum(axis=1)
+        coincidences['x'], coincidences['y'] = shower_parameters['core_pos']
+        for key in ['zenith', 'azimuth', 'size', 'energy']:
+            coincidences[key] = shower_parameters[key]
+
+        ext_timestamps = np.empty(event_indexes.shape, dtype=np.uint64)
+        ext_timestamps.fill(np.iinfo(np.uint64).max)
+        timestamps = np.zeros(event_indexes.shape, dtype=np.int64)
+        nanoseconds = np.zeros(event_indexes.shape, dtype=np.int64)
+        for station_id, station in enumerate(self.cluster.stations):
+            station_has_event = has_event[:, station_id]
+            coincidences['s%d' % station.number] = station_has_event
+            indexes = event_indexes[station_has_event, station_id]
+            if not len(indexes):
+                continue
+            # The events of a batch are stored in consecutive rows
+            events = self.station_groups[station_id].events
+            start, stop = indexes.min(), indexes.max() + 1
+            for values, field in [(ext_timestamps, 'ext_timestamp'),
+                                  (timestamps, 'timestamp'),
+                                  (nanoseconds, 'nanoseconds')]:
+                values[station_has_event, station_id] = events.read(
+                    start, stop, field=field)[indexes - start]
+
+        first = (np.arange(n_showers), ext_timestamps.argmin(axis=1))
+        has_coincidence = coincidences['N'] > 0
+        coincidences['ext_timestamp'] = np.where(has_coincidence,
+                                                 ext_timestamps[first], 0)
+        coincidences['timestamp'] = np.where(has_coincidence,
+                                             timestamps[first], 0)
+        coincidences['nanoseconds'] = np.where(has_coincidence,
+                                               nanoseconds[first], 0)
+        self.coincidences.append(coincidences)
+        self.coincidences.flush()
+
+        for indexes, station_has_event in zip(event_indexes, has_event):
+            station_ids = station_has_event.nonzero()[0]
+            self.c_index.append(np.column_stack((station_ids,
+                                                 indexes[station_ids])))
+        self.c_index.flush()
+
     def _prepare_coincidence_tables(self):
         """Create coincidence tables
 
@@ -315,3 +596,172 @@ class BaseSimulation(object):
         for station_group in self.station_groups:
             self.s_index.append(station_group._v_pathname)
         self.s_index.flush()
+
+
+def run_simulation_in_parallel(simulation_class, data, cluster, args=(),
+                               output_path='/', N=1, seed=None,
+                               n_workers=None, batch_size=None,
+                               progress=True, **kwargs):
+    """Run a simulation in parallel processes
+
+    The N showers are split over n_workers parts, which are simulated
+    in separate processes, each writing to a temporary file.  The parts
+    are then merged into the same tables as those created by a single
+    simulation, with the coincidence ids and the event indexes in
+    c_index renumbered.  The timestamps of each part are shifted by one
+    second per shower in the preceding parts, so they keep increasing as
+    in a single simulation.
+
+    Each part creates its simulation with the master seed, so the
+    simulated station and detector offsets are the same in all parts.
+    The showers of each part are then simulated with their own random
+    seed, derived from the master seed.  The results are reproducible
+    for a given seed and number of workers, except for values which a
+    simulation derives from the clock, like the timestamps of
+    :class:`~sapphire.simulations.groundparticles.GroundParticlesSimulation`.
+
+    :param simulation_class: the :class:`BaseSimulation` subclass to run.
+    :param data: writeable PyTables file handle.
+    :param cluster: :class:`~sapphire.clusters.BaseCluster` instance.
+    :param args: tuple of the arguments the simulation class takes
+                 before the cluster, e.g. the corsikafile_path and
+                 max_core_distance for a ground particles simulation.
+    :param output_path: path (as string) to the PyTables group (need not
+                        exist) in which the result tables will be created.
+    :param N: total number of simulations to perform.
+    :param seed: master seed for the pseudo-random number generators,
+                 if None a random seed is used.
+    :param n_workers: number of processes, the default, None, uses the
+                      number of cores.
+    :param batch_size: if given, use :meth:`BaseSimulation.run_many`
+                       with this batch size instead of
+                       :meth:`BaseSimulation.run`.
+    :param progress: if True, show a progressbar while simulating.
+    :param kwargs: other keyword arguments for the simulation class.
+
+    """
+    if n_workers is None:
+        n_workers = cpu_count()
+    if seed is None:
+        seed = np.random.RandomState().randint(2 ** 31)
+    part_seeds = np.random.RandomState(seed).randint(2 ** 31, size=n_workers)
+
+    tmp_dir = tempfile.mkdtemp()
+    try:
+        tasks = []
+        for part, part_seed in enumerate(part_seeds):
+            part_N = N // n_workers + (part < N % n_workers)
+            tmp_path = os.path.join(tmp_dir, '%d.h5' % part)
+            tasks.append((simulation_class, args, kwargs, cluster, tmp_path,
+                          output_path, part_N, seed, part_seed, batch_size))
+
+        pool = Pool(n_workers)
+        try:
+            paths = list(pbar(pool.imap(_run_simulation_part, tasks),
+                              length=len(tasks), show=progress))
+        finally:
+            pool.terminate()
+
+        _merge_simulation_parts(data, output_path, paths)
+    finally:
+        shutil.rmtree(tmp_dir)
+
+
+def _run_simulation_part(task):
+    """Run part of a simulation into a temporary file
+
+    :param task: tuple of the simulation class, its arguments before the
+        cluster and keyword arguments, the cluster, the path to the
+        temporary file, the output path, the number of showers, the
+        master seed, the seed for the showers and the batch size.
+    :return: the path to the temporary file.
+
+    """
+    (simulation_class, args, kwargs, cluster, tmp_path, output_path, N,
+     seed, part_seed, batch_size) = task
+    with tables.open_file(tmp_path, 'w') as data:
+        simulation = simulation_class(*(tuple(args) +
+                                        (cluster, data, output_path, N)),
+                                      seed=seed, progress=False, **kwargs)
+        random.seed(part_seed)
+        np.random.seed(part_seed)
+        if batch_size is None:
+            simulation.run()
+        else:
+            simulation.run_many(batch_size)
+        del simulation
+    return tmp_path
+
+
+def _merge_simulation_parts(data, output_path, paths):
+    """Merge the results of parts of a simulation
+
+    The tables of the first part are copied, the coincidences and events
+    of the other parts are appended with renumbered ids and indexes, and
+    with their timestamps shifted by one second per preceding shower.
+
+    :param data: writeable PyTables file handle.
+    :param output_path: path to the group containing the results, in
+                        the parts and in data.
+    :param paths: paths to the files with the results of the parts.
+
+    """
+    if output_path in data:
+        parent = data.get_node(output_path)
+    else:
+        where, name = os.path.split(output_path.rstrip('/'))
+        parent = data.create_group(where, name, createparents=True)
+
+    with tables.open_file(paths[0], 'r') as part:
+        for name in ['coincidences', 'cluster_simulations']:
+            part.copy_node(part.get_node(output_path, name), parent,
+                           recursive=True)
+
+    coincidence_group = data.get_node(parent, 'coincidences')
+    coincidences = coincidence_group.coincidences
+    c_index = coincidence_group.c_index
+    events_tables = [data.get_node(station_group, 'events')
+                     for station_group in coincidence_group.s_index]
+
+    for path in paths[1:]:
+        with tables.open_file(path, 'r') as part:
+            part_group = part.get_node(output_path, 'coincidences')
+            event_offsets = np.array([events.nrows
+                                      for events in events_tables],
+                                     dtype=np.uint32)
+            # Each shower is simulated one second after the previous one
+            n_showers = coincidences.nrows
+            for station_group, events in zip(part_group.s_index,
+                                             events_tables):
+                part_events = part.get_node(station_group, 'events').read()
+                part_events['event_id'] += events.nrows
+                _shift_timestamps(part_events, n_showers)
+                events.append(part_events)
+
+            part_coincidences = part_group.coincidences.read()
+            part_coincidences['id'] += n_showers
+            _shift_timestamps(part_coincidences, n_showers)
+            coincidences.append(part_coincidences)
+
+            for station_events in part_group.c_index:
+                station_events[:, 1] += event_offsets[station_events[:, 0]]
+                c_index.append(station_events)
+
+    for table in events_tables + [coincidences, c_index]:
+        table.flush()
+
+
+def _shift_timestamps(rows, seconds):
+    """Shift the timestamps of events or coincidences by whole seconds
+
+    Rows without a timestamp, i.e. coincidences without events, keep
+    their zero timestamps.
+
+    :param rows: array with timestamp and ext_timestamp columns.
+    :param seconds: number of seconds to add.
+
+    """
+    selection = rows['ext_timestamp'] > 0
+    rows['timestamp'][selection] += seconds
+    rows['ext_timestamp'][selection] += (np.uint64(seconds) *
+                                         np.uint64(int(1e9)))
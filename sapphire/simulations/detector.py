@@ -70,6 +70,16 @@ class HiSPARCSimulation(BaseSimulation):
 
         return np.random.normal(0, 4.5)
 
+    @classmethod
+    def simulate_gps_uncertainties(cls, n):
+        """Simulate uncertainties from GPS receiver for multiple events
+
+        :param n: number of uncertainties to return.
+        :return: array of GPS timing uncertainties in ns.
+
+        """
+        return np.random.normal(0, 4.5, n)
+
     @classmethod
     def simulate_adc_sampling(cls, t):
         """Simulate ADC time binning due to the sampling frequency
@@ -162,6 +172,38 @@ class HiSPARCSimulation(BaseSimulation):
         warnings.resetwarnings()
         return mips
 
+    @classmethod
+    def simulate_detector_mips_many(cls, n, theta):
+        """Simulate the detector signals for many detectors at once
+
+        Array version of :meth:`simulate_detector_mips`, which simulates
+        the signal of each particle and sums these per detector.
+
+        :param n: array with the number of particles in each detector.
+        :param theta: angle of incidence of the particles, as float or as
+                      array which can be broadcast to the shape of n.
+        :return: array of signal strengths in number of mips, with the
+                 same shape as n.
+
+        """
+        n = np.asarray(n)
+        costheta = np.broadcast_to(np.cos(theta), n.shape)
+        costheta = np.repeat(costheta.ravel(), n.ravel())
+        y = np.random.random(len(costheta))
+
+        with np.errstate(invalid='ignore'):
+            mips = np.where(y < 0.3394,
+                            (0.48 + 0.8583 * np.sqrt(y)) / costheta,
+                            (0.73 + 0.7366 * y) / costheta)
+            mips = np.where(y < 0.4344, mips,
+                            (1.7752 - 1.0336 * np.sqrt(0.9267 - y)) / costheta)
+            mips = np.where(y < 0.9041, mips,
+                            (2.28 - 2.1316 * np.sqrt(1 - y)) / costheta)
+
+        detectors = np.repeat(np.arange(n.size), n.ravel())
+        mips = np.bincount(detectors, weights=mips, minlength=n.size)
+        return mips.reshape(n.shape)
+
     @classmethod
     def generate_core_position(cls, R):
         """Generate a random core position within a circle
@@ -183,6 +225,21 @@ class HiSPARCSimulation(BaseSimulation):
         y = r * sin(phi)
         return x, y
 
+    @classmethod
+    def generate_core_positions(cls, R, n):
+        """Generate random core positions within a circle
+
+        :param R: Maximum core distance, in meters.
+        :param n: number of core positions to generate.
+        :return: arrays of random x, y positions in the disc with radius R.
+
+        """
+        r = np.sqrt(np.random.uniform(0, R ** 2, n))
+        phi = np.random.uniform(-pi, pi, n)
+        x = r * np.cos(phi)
+        y = r * np.sin(phi)
+        return x, y
+
     @classmethod
     def generate_zenith(cls, min=0, max=pi / 3.):
         """Generate a random zenith
@@ -205,6 +262,20 @@ class HiSPARCSimulation(BaseSimulation):
         p = np.random.uniform(cos(max), cos(min))
         return acos(p)
 
+    @classmethod
+    def generate_zeniths(cls, n, min=0, max=pi / 3.):
+        """Generate random zeniths
+
+        Array version of :meth:`generate_zenith`.
+
+        :param n: number of zeniths to generate.
+        :param min,max: minimum and maximum zenith angles, in radians.
+        :return: random zenith positions on a sphere, in radians.
+
+        """
+        p = np.random.uniform(cos(max), cos(min), n)
+        return np.arccos(p)
+
     @classmethod
     def generate_attenuated_zenith(cls):
         """Generate a random zenith
@@ -222,6 +293,19 @@ class HiSPARCSimulation(BaseSimulation):
         p = np.random.random()
         return cls.inverse_zenith_probability(p)
 
+    @classmethod
+    def generate_attenuated_zeniths(cls, n):
+        """Generate random zeniths from the expected zenith distribution
+
+        Array version of :meth:`generate_attenuated_zenith`.
+
+        :param n: number of zeniths to generate.
+        :return: random zenith angles, in radians.
+
+        """
+        p = np.random.random(n)
+        return np.arccos((1 - p) ** (1 / 8.))
+
     @classmethod
     def inverse_zenith_probability(cls, p):
         """Inverse cumulative probability distribution for zenith
@@ -246,6 +330,16 @@ class HiSPARCSimulation(BaseSimulation):
         """
         return np.random.uniform(-pi, pi)
 
+    @classmethod
+    def generate_azimuths(cls, n):
+        """Generate random azimuths
+
+        :param n: number of azimuths to generate.
+        :return: shower azimuth angles, in radians.
+
+        """
+        return np.random.uniform(-pi, pi, n)
+
     @classmethod
     def generate_energy(cls, min_E=1e14, max_E=1e21, alpha=-2.75):
         """Generate a random shower energy
@@ -265,6 +359,23 @@ class HiSPARCSimulation(BaseSimulation):
         E = (min_E ** a1 + x * (max_E ** a1 - min_E ** a1)) ** (1 / a1)
         return E
 
+    @classmethod
+    def generate_energies(cls, n, min_E=1e14, max_E=1e21, alpha=-2.75):
+        """Generate random shower energies
+
+        Array version of :meth:`generate_energy`.
+
+        :param n: number of energies to generate.
+        :param min_E,max_E: Energy bounds for the distribution (in eV).
+        :param alpha: Steepness of the power law distribution.
+        :return: primary particle energies, in eV.
+
+        """
+        x = np.random.random(n)
+        a1 = alpha + 1.
+        E = (min_E ** a1 + x * (max_E ** a1 - min_E ** a1)) ** (1 / a1)
+        return E
+
 
 class ErrorlessSimulation(HiSPARCSimulation):
 
@@ -288,6 +399,11 @@ class ErrorlessSimulation(HiSPARCSimulation):
 
         return 0.
 
+    @classmethod
+    def simulate_gps_uncertainties(cls, n):
+
+        return np.zeros(n)
+
     @classmethod
     def simulate_adc_sampling(cls, t):
 
@@ -302,3 +418,8 @@ class ErrorlessSimulation(HiSPARCSimulation):
     def simulate_detector_mips(cls, n, theta):
 
         return n
+
+    @classmethod
+    def simulate_detector_mips_many(cls, n, theta):
+
+        return n
@@ -18,7 +18,9 @@ Example usage::
     >>> sim.run()
 
 """
+from collections import OrderedDict
 from math import pi, sin, cos, tan, sqrt, log10
+from multiprocessing import Pool
 from time import time
 
 import numpy as np
@@ -26,11 +28,20 @@ import tables
 
 from .detector import HiSPARCSimulation, ErrorlessSimulation
 from ..corsika.corsika_queries import CorsikaQuery
-from ..utils import pbar, norm_angle, closest_in_list, vector_length, c
+from ..utils import (pbar, norm_angle, closest_in_list, vector_length, c,
+                     ArrayCache)
 
 
 class GroundParticlesSimulation(HiSPARCSimulation):
 
+    # Largest groundparticles table (in rows) of which the leptons are
+    # kept in memory for fast particle lookups. Larger showers are queried
+    # from the file. Set to 0 to always query the file.
+    max_particles_in_memory = 10 ** 6
+
+    _particles_grid = None
+    _gridded_groundparticles = None
+
     def __init__(self, corsikafile_path, max_core_distance, *args, **kwargs):
         """Simulation initialization
 
@@ -140,6 +151,55 @@ class GroundParticlesSimulation(HiSPARCSimulation):
 
         return observables
 
+    def simulate_detector_response_many(self, shower_parameters):
+        """Simulate the response of all detectors to a shower
+
+        Array version of :meth:`simulate_detector_response`.  The cluster
+        is moved for each shower, so the showers are simulated one at a
+        time (see :meth:`generate_shower_parameters_many`), but the
+        particles in all detectors are processed at once.
+
+        :param shower_parameters: dictionary with arrays of the shower
+                                  parameters of a single shower.
+        :return: dictionary with the mips ('n') and arrival time of the
+                 first detected particle ('t') of the shower (row) in each
+                 detector (columns).
+
+        """
+        detectors = self.get_detectors()
+        zenith = shower_parameters['zenith'][0]
+        particles = [self.get_particles_in_detector(detector,
+                                                    {'zenith': zenith})
+                     for detector in detectors]
+        n_detected = np.array([len(p) for p in particles])
+
+        mips = np.zeros(len(detectors))
+        first_signal = np.empty(len(detectors))
+        first_signal.fill(-999)
+
+        detected = n_detected > 0
+        if detected.any():
+            particles = np.concatenate(particles)
+            detector_index = np.repeat(np.arange(len(detectors)), n_detected)
+            mips = self.simulate_detector_mips_for_particles_many(
+                particles, detector_index, len(detectors)).round(3)
+
+            t = particles['t'] + self.simulate_signal_transport_time(
+                len(particles))
+            first_t = np.empty(len(detectors))
+            first_t.fill(np.inf)
+            np.minimum.at(first_t, detector_index, t)
+            offsets = np.array([detector.offset for detector in detectors])
+            z = np.array([detector.get_coordinates()[-1]
+                          for detector in detectors])
+            tproj = z / (c * cos(zenith))
+            first_signal[detected] = self.simulate_adc_sampling(
+                (first_t + offsets - tproj)[detected])
+
+        observables = {'n': mips[np.newaxis], 't': first_signal[np.newaxis]}
+
+        return observables
+
     def simulate_detector_mips_for_particles(self, particles):
         """Simulate the detector signal for particles
 
@@ -156,6 +216,26 @@ class GroundParticlesSimulation(HiSPARCSimulation):
 
         return mips
 
+    def simulate_detector_mips_for_particles_many(self, particles,
+                                                  detector_index, n_detectors):
+        """Simulate the detector signals for the particles of many detectors
+
+        :param particles: particle rows with the p_[x, y, z]
+                          components of the particle momenta.
+        :param detector_index: index of the detector of each particle.
+        :param n_detectors: number of detectors.
+        :return: array with the signal in mips of each detector.
+
+        """
+        theta = np.arccos(abs(particles['p_z']) /
+                          vector_length(particles['p_x'], particles['p_y'],
+                                        particles['p_z']))
+        mips = self.simulate_detector_mips_many(
+            np.ones(len(particles), dtype=int), theta)
+
+        return np.bincount(detector_index, weights=mips,
+                           minlength=n_detectors)
+
     def simulate_trigger(self, detector_observables):
         """Simulate a trigger response.
 
@@ -181,6 +261,30 @@ class GroundParticlesSimulation(HiSPARCSimulation):
         else:
             return False
 
+    def simulate_trigger_many(self, detector_observables):
+        """Simulate the trigger response to many showers.
+
+        Array version of :meth:`simulate_trigger`.
+
+        :param detector_observables: dictionary with arrays of detector
+            observables, with a row for each shower and a column for each
+            detector of the station.
+        :return: boolean array which is True for showers which triggered
+                 the station.
+
+        """
+        n = detector_observables['n']
+        n_detectors = n.shape[1]
+        detectors_low = (n > 0.3).sum(axis=1)
+        detectors_high = (n > 0.5).sum(axis=1)
+
+        if n_detectors == 4:
+            return (detectors_high >= 2) | (detectors_low >= 3)
+        elif n_detectors == 2:
+            return detectors_low >= 2
+        else:
+            return np.zeros(len(n), dtype=bool)
+
     def simulate_gps(self, station_observables, shower_parameters, station):
         """Simulate gps timestamp.
 
@@ -214,6 +318,39 @@ class GroundParticlesSimulation(HiSPARCSimulation):
 
         return station_observables
 
+    def simulate_gps_many(self, station_observables, shower_parameters,
+                          station):
+        """Simulate gps timestamps for many showers.
+
+        Array version of :meth:`simulate_gps`.  Showers in which fewer
+        than two detectors detected particles get no gps timestamp.
+
+        """
+        arrival_times = np.array([
+            np.where(station_observables['n%d' % id] > 0,
+                     station_observables['t%d' % id], np.inf)
+            for id in range(1, 5) if 't%d' % id in station_observables])
+        arrival_times.sort(axis=0)
+        trigger_time = arrival_times[1]
+        has_gps = np.isfinite(trigger_time)
+        trigger_time = np.where(has_gps, trigger_time, -999)
+
+        ext_timestamp = shower_parameters['ext_timestamp'].astype(np.int64)
+        ext_timestamp += (trigger_time + station.gps_offset +
+                          self.simulate_gps_uncertainties(
+                              len(ext_timestamp))).astype(np.int64)
+        ext_timestamp = np.where(has_gps, ext_timestamp, 0)
+        timestamp = ext_timestamp // int(1e9)
+        nanoseconds = ext_timestamp % int(1e9)
+
+        gps_timestamp = {'ext_timestamp': ext_timestamp,
+                         'timestamp': timestamp,
+                         'nanoseconds': nanoseconds,
+                         't_trigger': trigger_time}
+        station_observables.update(gps_timestamp)
+
+        return station_observables
+
     def get_particles_in_detector(self, detector, shower_parameters):
         """Get particles that hit a detector.
 
@@ -230,6 +367,10 @@ class GroundParticlesSimulation(HiSPARCSimulation):
         detectors the CORSIKA showers come from the desired azimuth. In the
         simulation frame the CORSIKA shower azimuth remains unchanged.
 
+        The particles are taken from the in-memory grid if the shower is
+        small enough (see :meth:`get_particles_grid`), otherwise the
+        groundparticles table is queried.
+
         :param detector: :class:`~sapphire.clusters.Detector` for which
                          to get particles.
         :param shower_parameters: dictionary with the shower parameters.
@@ -246,12 +387,136 @@ class GroundParticlesSimulation(HiSPARCSimulation):
         xproj = x - z * nxnz
         yproj = y - z * nynz
 
+        grid = self.get_particles_grid()
+        if grid is not None:
+            return grid.particles_in_box(xproj - detector_boundary,
+                                         xproj + detector_boundary,
+                                         yproj - detector_boundary,
+                                         yproj + detector_boundary)
+
         query = ('(x >= %f) & (x <= %f) & (y >= %f) & (y <= %f)'
                  ' & (particle_id >= 2) & (particle_id <= 6)' %
                  (xproj - detector_boundary, xproj + detector_boundary,
                   yproj - detector_boundary, yproj + detector_boundary))
         return self.groundparticles.read_where(query)
 
+    def get_particles_grid(self):
+        """Get the in-memory grid of leptons for the current shower
+
+        The grid is built the first time it is requested for a
+        groundparticles table and reused until the table changes.
+
+        :return: :class:`GroundParticlesGrid` for the current
+                 groundparticles, or None if the table has more rows than
+                 :attr:`max_particles_in_memory`.
+
+        """
+        if self._gridded_groundparticles is not self.groundparticles:
+            self._gridded_groundparticles = self.groundparticles
+            if self.groundparticles.nrows <= self.max_particles_in_memory:
+                self._particles_grid = GroundParticlesGrid(
+                    _read_leptons(self.groundparticles))
+            else:
+                self._particles_grid = None
+        return self._particles_grid
+
+
+class GroundParticlesGrid(object):
+
+    """Uniform 2D grid of the leptons of a CORSIKA shower
+
+    The electrons and muons (particle ids 2 to 6) of a shower are sorted
+    by the grid cell in which they land.  Particles inside an axis
+    aligned box can then be found by only looking at the cells
+    overlapping the box, instead of querying the table.
+
+    :param particles: the lepton rows of the groundparticles table of a
+                      CORSIKA shower.
+    :param cell_size: width of the square grid cells, in meters.
+
+    """
+
+    def __init__(self, particles, cell_size=1.):
+        self.cell_size = cell_size
+        if len(particles):
+            self.x0 = particles['x'].min()
+            self.y0 = particles['y'].min()
+            self.ny = int((particles['y'].max() - self.y0) // cell_size) + 1
+        else:
+            self.x0 = self.y0 = 0.
+            self.ny = 1
+
+        ix, iy = self._cell_indices(particles['x'], particles['y'])
+        cells = ix * self.ny + iy
+        # A stable sort keeps the table order of particles within a cell
+        self.order = cells.argsort(kind='mergesort')
+        self.cells = cells[self.order]
+        self.particles = particles[self.order]
+
+    def _cell_indices(self, x, y):
+        """Get the grid cell column and row for coordinates"""
+
+        ix = np.floor((np.asarray(x, dtype=np.float64) - self.x0) /
+                      self.cell_size).astype(np.int64)
+        iy = np.floor((np.asarray(y, dtype=np.float64) - self.y0) /
+                      self.cell_size).astype(np.int64)
+        return ix, iy
+
+    def particles_in_box(self, x_min, x_max, y_min, y_max):
+        """Get the particles inside a box, in table order
+
+        :param x_min,x_max: lower and upper limits of x, inclusive.
+        :param y_min,y_max: lower and upper limits of y, inclusive.
+        :return: particle rows in the box.
+
+        """
+        (ix_min, ix_max), (iy_min, iy_max) = self._cell_indices(
+            (x_min, x_max), (y_min, y_max))
+        iy_min = max(iy_min, 0)
+        iy_max = min(iy_max, self.ny - 1)
+        if iy_min > iy_max:
+            return self.particles[:0]
+
+        # Cells of one grid column within the y limits are contiguous
+        columns = np.arange(max(ix_min, 0), max(ix_max + 1, 0))
+        starts = self.cells.searchsorted(columns * self.ny + iy_min)
+        ends = self.cells.searchsorted(columns * self.ny + iy_max,
+                                       side='right')
+        idx = np.concatenate([np.arange(start, end)
+                              for start, end in zip(starts, ends)] +
+                             [np.zeros(0, dtype=np.int64)])
+        idx = idx[self.order[idx].argsort()]
+
+        particles = self.particles[idx]
+        x = particles['x']
+        y = particles['y']
+        return particles[(x >= x_min) & (x <= x_max) &
+                         (y >= y_min) & (y <= y_max)]
+
+
+def _read_leptons(groundparticles):
+    """Read the electrons and muons from a groundparticles table"""
+
+    return groundparticles.read_where('(particle_id >= 2) & '
+                                      '(particle_id <= 6)')
+
+
+def _read_shower_leptons(path, max_particles):
+    """Read the leptons of a CORSIKA shower from its data file
+
+    :param path: path to the corsika.h5 file of the shower.
+    :param max_particles: maximum number of rows of the groundparticles
+                          table to read.
+    :return: the lepton rows, or None if the table is too large.
+    :raises tables.NoSuchNodeError: if the file has no groundparticles.
+
+    """
+    with tables.open_file(path, 'r') as data:
+        groundparticles = data.get_node('/groundparticles')
+        if groundparticles.nrows > max_particles:
+            return None
+        return _read_leptons(groundparticles)
+
 
 class DetectorBoundarySimulation(GroundParticlesSimulation):
 
@@ -271,7 +536,8 @@ class DetectorBoundarySimulation(GroundParticlesSimulation):
         For the remaining particles a more accurate query is used to see
         which actually hit the detector. The advantage of using the
         square is that column indexes can be used, which may speed up
-        queries.
+        queries.  When the in-memory grid is available the same selection
+        is made on the grid instead.
 
         :param detector: :class:`~sapphire.clusters.Detector` for which
                          to get particles.
@@ -292,6 +558,21 @@ class DetectorBoundarySimulation(GroundParticlesSimulation):
 
         cproj = [(cx - znxnz, cy - znynz) for cx, cy in corners]
 
+        grid = self.get_particles_grid()
+        if grid is not None:
+            particles = grid.particles_in_box(xproj - detector_boundary,
+                                              xproj + detector_boundary,
+                                              yproj - detector_boundary,
+                                              yproj + detector_boundary)
+            x = particles['x'].astype(np.float64)
+            y = particles['y'].astype(np.float64)
+            in_detector = np.ones(len(particles), dtype=bool)
+            for p0, p1, p2 in (cproj[0:3], cproj[1:4]):
+                b1, a, b2 = self.get_line_boundary_values(p0, p1, p2)
+                line = x if a is None else y - a * x
+                in_detector &= (b1 < line) & (line < b2)
+            return particles[in_detector]
+
         b11, line1, b12 = self.get_line_boundary_eqs(*cproj[0:3])
         b21, line2, b22 = self.get_line_boundary_eqs(*cproj[1:4])
         query = ("(x >= %f) & (x <= %f) & (y >= %f) & (y <= %f) & "
@@ -323,13 +604,33 @@ class DetectorBoundarySimulation(GroundParticlesSimulation):
             >>> get_line_boundary_eqs((0, 0), (1, 1), (0, 2))
             (0.0, 'y - 1.000000 * x', 2.0)
 
+        """
+        b1, a, b2 = self.get_line_boundary_values(p0, p1, p2)
+        if a is None:
+            line = "x"
+        else:
+            line = "y - %f * x" % a
+
+        return b1, line, b2
+
+    def get_line_boundary_values(self, p0, p1, p2):
+        """Get the slope and boundaries of two parallel lines
+
+        Numerical counterpart of :meth:`get_line_boundary_eqs`.  Points
+        between the lines satisfy b1 < y - a * x < b2, or b1 < x < b2 if
+        the lines are vertical.
+
+        :param p0,p1: (x, y) tuples on the same line.
+        :param p2: (x, y) tuple on the parallel line.
+        :return: b1, a, b2, with a None for vertical lines.
+
         """
         (x0, y0), (x1, y1), (x2, y2) = p0, p1, p2
 
         # Compute the general equation for the lines
         if x0 == x1:
             # line is exactly vertical
-            line = "x"
+            a = None
             b1, b2 = x0, x2
         else:
             # First, compute the slope
@@ -339,13 +640,11 @@ class DetectorBoundarySimulation(GroundParticlesSimulation):
             b1 = y0 - a * x0
             b2 = y2 - a * x2
 
-            line = "y - %f * x" % a
-
         # And order the y-intercepts
         if b1 > b2:
             b1, b2 = b2, b1
 
-        return b1, line, b2
+        return b1, a, b2
 
 
 class ParticleCounterSimulation(GroundParticlesSimulation):
@@ -357,6 +656,11 @@ class ParticleCounterSimulation(GroundParticlesSimulation):
 
         return n
 
+    def simulate_detector_mips_many(self, n, theta):
+        """A mip for a mip, count number of particles in detectors."""
+
+        return n
+
 
 class FixedCoreDistanceSimulation(GroundParticlesSimulation):
 
@@ -399,12 +703,27 @@ class MultipleGroundParticlesSimulation(GroundParticlesSimulation):
 
     Simulations will be selected from the set of available showers.
     Each time an energy and zenith angle is generated a shower is selected
-    from the CORSIKA overview. Each shower is reused multiple times to
-    take advantage of caching, and to reduce IO stress.
+    from the CORSIKA overview. Each selected shower is used
+    :attr:`n_reuse` times.
+
+    All selections are made before the simulation starts, and grouped
+    per shower, so each shower file is read only once.  This changes the
+    order of the simulated showers, but not their distribution.  Within
+    a run a shower is therefore never read twice, but the leptons are
+    kept in an LRU cache (:attr:`shower_cache`) which is shared by all
+    instances, so later simulations in the same process can reuse them.
+    If :attr:`prefetch` is True the next shower is read in a separate
+    process while the current one is simulated.
+
+    The cache holds at most :attr:`SHOWER_CACHE_SIZE` bytes of leptons
+    per process, and keeps them after the simulation has finished.  Call
+    ``shower_cache.clear()`` to release that memory.  The prefetched
+    shower, and a current shower which does not fit in the cache, are
+    held in addition to it.
 
     .. warning::
 
-        This simulation loads a new shower often it is therefore more I/O
+        This simulation loads many showers, it is therefore more I/O
         intensive than :class:`GroundParticlesSimulation`. Do not run many
         of these simulations simultaneously!
 
@@ -413,6 +732,18 @@ class MultipleGroundParticlesSimulation(GroundParticlesSimulation):
     # CORSIKA data location at Nikhef
     DATA = '/data/hisparc/corsika/data/{seeds}/corsika.h5'
 
+    # Memory budget (in bytes) for the cached leptons of showers.
+    SHOWER_CACHE_SIZE = 2 ** 30
+
+    # Leptons of showers, shared by all instances in this process.
+    shower_cache = ArrayCache(SHOWER_CACHE_SIZE)
+
+    # Number of simulated showers for each selected CORSIKA shower.
+    n_reuse = 100
+
+    # Read the next shower in a separate process during the simulation.
+    prefetch = False
+
     def __init__(self, corsikaoverview_path, max_core_distance, min_energy,
                  max_energy, *args, **kwargs):
         """Simulation initialization
@@ -456,45 +787,153 @@ class MultipleGroundParticlesSimulation(GroundParticlesSimulation):
 
         """
         r = self.max_core_distance
-        n_reuse = 100
         now = int(time())
+        plan = self.plan_showers()
+
+        pool = Pool(1) if self.prefetch else None
+        try:
+            next_leptons = self._prefetch_shower(pool, plan, 0)
+            first_shower = 0
+            for i, (seeds, sim, n_selected) in enumerate(
+                    pbar(plan, show=self.progress)):
+                leptons = next_leptons
+                next_leptons = self._prefetch_shower(pool, plan, i + 1)
+                try:
+                    leptons = self.load_shower(seeds, leptons)
+                except tables.NoSuchNodeError:
+                    print 'No groundparticles in %s' % seeds
+                    continue
 
-        for i in pbar(range(self.N), show=self.progress):
+                corsika_parameters = {'zenith': sim['zenith'],
+                                      'size': sim['n_electron'],
+                                      'energy': sim['energy'],
+                                      'particle': sim['particle_id']}
+                self.corsika_azimuth = sim['azimuth']
+                n_showers = n_selected * self.n_reuse
+                showers = self._reuse_shower(r, now, first_shower, n_showers,
+                                             corsika_parameters)
+                first_shower += n_showers
+
+                if leptons is not None:
+                    self._particles_grid = GroundParticlesGrid(leptons)
+                    for shower_parameters in showers:
+                        yield shower_parameters
+                else:
+                    # Too large to keep in memory, query the file instead
+                    self._particles_grid = None
+                    path = self.DATA.format(seeds=seeds)
+                    with tables.open_file(path, 'r') as data:
+                        self.groundparticles = data.get_node(
+                            '/groundparticles')
+                        for shower_parameters in showers:
+                            yield shower_parameters
+        finally:
+            if pool is not None:
+                pool.terminate()
+
+    def _reuse_shower(self, r, now, first_shower, n_showers,
+                      corsika_parameters):
+        """Generate the shower parameters for reuses of a shower
+
+        :param r: maximum core distance.
+        :param now: timestamp of the start of the simulation.
+        :param first_shower: number of the first of these showers.
+        :param n_showers: number of showers to generate.
+        :param corsika_parameters: dictionary with the parameters of the
+                                   CORSIKA shower.
+
+        """
+        for i in range(first_shower, first_shower + n_showers):
+            ext_timestamp = (now + float(i) / self.n_reuse) * int(1e9)
+            x, y = self.generate_core_position(r)
+            shower_azimuth = self.generate_azimuth()
+
+            shower_parameters = {'ext_timestamp': ext_timestamp,
+                                 'core_pos': (x, y),
+                                 'azimuth': shower_azimuth}
+
+            # Subtract CORSIKA shower azimuth from desired shower
+            # azimuth to get rotation angle of the cluster.
+            alpha = shower_azimuth - self.corsika_azimuth
+            alpha = norm_angle(alpha)
+            self._prepare_cluster_for_shower(x, y, alpha)
+
+            shower_parameters.update(corsika_parameters)
+            yield shower_parameters
+
+    def plan_showers(self):
+        """Select the CORSIKA simulations for all showers
+
+        For each of the N selections a simulation is selected using
+        :meth:`select_simulation`.  The selections are grouped per
+        simulation, in the order of their first selection.
+
+        :return: list of (seeds, simulation, number of selections) tuples.
+
+        """
+        plan = OrderedDict()
+        for _ in range(self.N):
             sim = self.select_simulation()
             if sim is None:
                 continue
+            seeds = self.cq.seeds([sim])[0]
+            if seeds in plan:
+                plan[seeds][1] += 1
+            else:
+                plan[seeds] = [sim, 1]
 
-            corsika_parameters = {'zenith': sim['zenith'],
-                                  'size': sim['n_electron'],
-                                  'energy': sim['energy'],
-                                  'particle': sim['particle_id']}
-            self.corsika_azimuth = sim['azimuth']
+        return [(key, selected[0], selected[1])
+                for key, selected in plan.iteritems()]
 
-            seeds = self.cq.seeds([sim])[0]
-            with tables.open_file(self.DATA.format(seeds=seeds), 'r') as data:
-                try:
-                    self.groundparticles = data.get_node('/groundparticles')
-                except tables.NoSuchNodeError:
-                    print 'No groundparticles in %s' % seeds
-                    continue
+    def load_shower(self, seeds, prefetched=None):
+        """Get the leptons of a CORSIKA shower
 
-                for j in range(n_reuse):
-                    ext_timestamp = (now + i + (float(j) / n_reuse)) * int(1e9)
-                    x, y = self.generate_core_position(r)
-                    shower_azimuth = self.generate_azimuth()
+        The leptons are taken from the shower cache, from a prefetch, or
+        read from the shower file, and are then stored in the cache.
 
-                    shower_parameters = {'ext_timestamp': ext_timestamp,
-                                         'core_pos': (x, y),
-                                         'azimuth': shower_azimuth}
+        :param seeds: seeds of the CORSIKA simulation.
+        :param prefetched: optional AsyncResult of a prefetch of the
+                           shower.
+        :return: the lepton rows, or None if the shower has more than
+                 :attr:`max_particles_in_memory` particles.
+        :raises tables.NoSuchNodeError: if the file has no groundparticles.
 
-                    # Subtract CORSIKA shower azimuth from desired shower
-                    # azimuth to get rotation angle of the cluster.
-                    alpha = shower_azimuth - self.corsika_azimuth
-                    alpha = norm_angle(alpha)
-                    self._prepare_cluster_for_shower(x, y, alpha)
+        """
+        leptons = self.shower_cache.get(seeds)
+        if leptons is None:
+            if prefetched is not None:
+                leptons = prefetched.get()
+            else:
+                leptons = _read_shower_leptons(self.DATA.format(seeds=seeds),
+                                               self.max_particles_in_memory)
+            if leptons is not None:
+                leptons = self.shower_cache.put(seeds, leptons)
+        return leptons
+
+    def _prefetch_shower(self, pool, plan, i):
+        """Start reading the leptons of a planned shower in the background
+
+        :return: AsyncResult of the reading, or None if there is nothing
+                 to prefetch.
 
-                    shower_parameters.update(corsika_parameters)
-                    yield shower_parameters
+        """
+        if pool is None or i >= len(plan):
+            return None
+        seeds = plan[i][0]
+        if seeds in self.shower_cache:
+            return None
+        return pool.apply_async(_read_shower_leptons,
+                                (self.DATA.format(seeds=seeds),
+                                 self.max_particles_in_memory))
+
+    def get_particles_grid(self):
+        """Get the in-memory grid of leptons for the current shower
+
+        :return: :class:`GroundParticlesGrid` for the current shower, or
+                 None if it was too large to keep in memory.
+
+        """
+        return self._particles_grid
 
     def select_simulation(self):
         """Generate parameters for selecting a CORSIKA simulation
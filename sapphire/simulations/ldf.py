@@ -20,7 +20,8 @@ Example usage::
 import warnings
 
 from scipy.special import gamma
-from numpy import pi, sin, cos, sqrt, random, arctan2, log10
+from numpy import (pi, sin, cos, sqrt, random, arctan2, log10, arange,
+                   array, zeros, newaxis)
 
 from .detector import HiSPARCSimulation, ErrorlessSimulation
 from ..utils import pbar, vector_length
@@ -75,6 +76,33 @@ class BaseLdfSimulation(HiSPARCSimulation):
 
             yield shower_parameters
 
+    def generate_shower_parameters_many(self, batch_size):
+        """Generate shower parameters for batches of showers
+
+        Array version of :meth:`generate_shower_parameters`.
+
+        :param batch_size: maximum number of showers per batch.
+        :return: dictionaries with arrays of shower parameters.
+
+        """
+        r = self.max_core_distance
+        giga = int(1e9)
+
+        for first in pbar(range(0, self.N, batch_size), show=self.progress):
+            n = min(batch_size, self.N - first)
+            energy = self.generate_energies(n, self.min_energy,
+                                            self.max_energy)
+            size = 10 ** (log10(energy) - 15 + 4.8)
+            shower_parameters = {
+                'ext_timestamp': (giga + arange(first, first + n)) * giga,
+                'azimuth': self.generate_azimuths(n),
+                'zenith': zeros(n),
+                'core_pos': self.generate_core_positions(r, n),
+                'size': size,
+                'energy': energy}
+
+            yield shower_parameters
+
     def simulate_detector_response(self, detector, shower_parameters):
         """Simulate detector response to a shower
 
@@ -96,6 +124,24 @@ class BaseLdfSimulation(HiSPARCSimulation):
             observables = {'n': 0.}
         return observables
 
+    def simulate_detector_response_many(self, shower_parameters):
+        """Simulate the response of all detectors to many showers
+
+        Get the mips in all detectors from the LDF.
+
+        :param shower_parameters: dictionary with arrays of shower
+                                  parameters.
+        :return: dictionary with the mips ('n') of each shower (rows) in
+                 each detector (columns).
+
+        """
+        n_detected = self.get_num_particles_in_detectors(self.get_detectors(),
+                                                         shower_parameters)
+        theta = shower_parameters['zenith'][:, newaxis]
+        mips = self.simulate_detector_mips_many(n_detected, theta)
+
+        return {'n': mips}
+
     def get_num_particles_in_detector(self, detector, shower_parameters):
         """Get the number of particles in a detector
 
@@ -120,6 +166,35 @@ class BaseLdfSimulation(HiSPARCSimulation):
 
         return num_particles
 
+    def get_num_particles_in_detectors(self, detectors, shower_parameters):
+        """Get the number of particles in detectors for many showers
+
+        :param detectors: list of :class:`~sapphire.clusters.Detector`
+                          for which the number of particles will be
+                          determined.
+        :param shower_parameters: dictionary with arrays of shower
+                                  parameters.
+        :return: array with the number of particles for each shower (rows)
+                 in each detector (columns).
+
+        """
+        x, y = array([detector.xy_coordinates for detector in detectors]).T
+        area = array([detector.get_area() for detector in detectors])
+        core_x, core_y = [core[:, newaxis]
+                          for core in shower_parameters['core_pos']]
+        zenith = shower_parameters['zenith'][:, newaxis]
+        azimuth = shower_parameters['azimuth'][:, newaxis]
+        size = shower_parameters['size'][:, newaxis]
+
+        r = self.ldf.calculate_core_distance(x, y, core_x, core_y, zenith,
+                                             azimuth)
+
+        p_shower = self.ldf.calculate_ldf_value(r, Ne=size)
+        p_ground = p_shower * cos(zenith)
+        num_particles = self.simulate_particles_for_density(p_ground * area)
+
+        return num_particles
+
     @staticmethod
     def simulate_particles_for_density(p):
         """Get number of particles in detector given a particle density
@@ -216,6 +291,33 @@ class EllipsLdfSimulation(BaseLdfSimulation):
 
             yield shower_parameters
 
+    def generate_shower_parameters_many(self, batch_size):
+        """Generate shower parameters for batches of showers
+
+        Array version of :meth:`generate_shower_parameters`.
+
+        :param batch_size: maximum number of showers per batch.
+        :return: dictionaries with arrays of shower parameters.
+
+        """
+        r = self.max_core_distance
+        giga = int(1e9)
+
+        for first in pbar(range(0, self.N, batch_size), show=self.progress):
+            n = min(batch_size, self.N - first)
+            energy = self.generate_energies(n, self.min_energy,
+                                            self.max_energy)
+            size = 10 ** (log10(energy) - 15 + 4.8)
+            shower_parameters = {
+                'ext_timestamp': (giga + arange(first, first + n)) * giga,
+                'azimuth': self.generate_azimuths(n),
+                'zenith': self.generate_zeniths(n),
+                'core_pos': self.generate_core_positions(r, n),
+                'size': size,
+                'energy': energy}
+
+            yield shower_parameters
+
     def get_num_particles_in_detector(self, detector, shower_parameters):
         """Get the number of particles in a detector
 
@@ -239,6 +341,34 @@ class EllipsLdfSimulation(BaseLdfSimulation):
 
         return num_particles
 
+    def get_num_particles_in_detectors(self, detectors, shower_parameters):
+        """Get the number of particles in detectors for many showers
+
+        :param detectors: list of :class:`~sapphire.clusters.Detector`
+                          for which the number of particles will be
+                          determined.
+        :param shower_parameters: dictionary with arrays of shower
+                                  parameters.
+        :return: array with the number of particles for each shower (rows)
+                 in each detector (columns).
+
+        """
+        x, y = array([detector.xy_coordinates for detector in detectors]).T
+        area = array([detector.get_area() for detector in detectors])
+        core_x, core_y = [core[:, newaxis]
+                          for core in shower_parameters['core_pos']]
+        zenith = shower_parameters['zenith'][:, newaxis]
+        azimuth = shower_parameters['azimuth'][:, newaxis]
+        size = shower_parameters['size'][:, newaxis]
+
+        r, phi = self.ldf.calculate_core_distance_and_angle(x, y, core_x,
+                                                            core_y)
+
+        p_ground = self.ldf.calculate_ldf_value(r, phi, size, zenith, azimuth)
+        num_particles = self.simulate_particles_for_density(p_ground * area)
+
+        return num_particles
+
 
 class BaseLdf(object):
 
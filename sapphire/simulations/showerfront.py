@@ -57,6 +57,31 @@ class FlatFrontSimulation(HiSPARCSimulation):
 
             yield shower_parameters
 
+    def generate_shower_parameters_many(self, batch_size):
+        """Generate shower parameters for batches of showers
+
+        Array version of :meth:`generate_shower_parameters`.
+
+        :param batch_size: maximum number of showers per batch.
+        :return: dictionaries with arrays of shower parameters.
+
+        """
+        giga = int(1e9)
+
+        for first in pbar(range(0, self.N, batch_size), show=self.progress):
+            n = min(batch_size, self.N - first)
+            unknown = np.empty(n)
+            unknown.fill(np.nan)
+            shower_parameters = {
+                'ext_timestamp': (giga + np.arange(first, first + n)) * giga,
+                'azimuth': self.generate_azimuths(n),
+                'zenith': self.generate_attenuated_zeniths(n),
+                'core_pos': (unknown, unknown),
+                'size': unknown,
+                'energy': unknown}
+
+            yield shower_parameters
+
     def simulate_detector_response(self, detector, shower_parameters):
         """Simulate detector response to a shower.
 
@@ -72,6 +97,25 @@ class FlatFrontSimulation(HiSPARCSimulation):
 
         return observables
 
+    def simulate_detector_response_many(self, shower_parameters):
+        """Simulate the response of all detectors to many showers
+
+        :param shower_parameters: dictionary with arrays of shower
+                                  parameters.
+        :return: dictionary with the arrival times ('t') for each shower
+                 (rows) in each detector (columns).
+
+        """
+        detectors = self.get_detectors()
+        offsets = np.array([detector.offset for detector in detectors])
+        arrival_times = self.get_arrival_times(detectors, shower_parameters)
+        transport_times = self.simulate_signal_transport_time(
+            arrival_times.size).reshape(arrival_times.shape)
+        arrival_times = self.simulate_adc_sampling(
+            arrival_times + transport_times + offsets)
+
+        return {'t': arrival_times}
+
     def get_arrival_time(self, detector, shower_parameters):
         """Calculate arrival time
 
@@ -95,6 +139,24 @@ class FlatFrontSimulation(HiSPARCSimulation):
         dt = cdt / c
         return dt
 
+    def get_arrival_times(self, detectors, shower_parameters):
+        """Calculate arrival times for many showers
+
+        Array version of :meth:`get_arrival_time`.
+
+        :return: Shower front arrival times in ns, for each shower (rows)
+                 in each detector (columns).
+
+        """
+        r1, phi1, z1 = np.array([detector.cylindrical_coordinates
+                                 for detector in detectors]).T
+        phi = shower_parameters['azimuth'][:, np.newaxis]
+        theta = shower_parameters['zenith'][:, np.newaxis]
+        r = r1 * np.cos(phi - phi1) - z1 * np.tan(theta)
+        cdt = - (r * np.sin(theta) + z1 / np.cos(theta))
+        dt = cdt / c
+        return dt
+
     def simulate_gps(self, station_observables, shower_parameters, station):
         """Simulate gps timestamp
 
@@ -126,6 +188,42 @@ class FlatFrontSimulation(HiSPARCSimulation):
 
         return station_observables
 
+    def simulate_gps_many(self, station_observables, shower_parameters,
+                          station):
+        """Simulate gps timestamps for many showers
+
+        Array version of :meth:`simulate_gps`.
+
+        """
+        n_detectors = len(station.detectors)
+        ids = range(1, n_detectors + 1)
+        arrival_times = np.array([station_observables['t%d' % id]
+                                  for id in ids])
+        ext_timestamp = shower_parameters['ext_timestamp']
+
+        first_time = arrival_times.min(axis=0)
+        for id in ids:
+            key = 't%d' % id
+            station_observables[key] = station_observables[key] - first_time
+
+        arrival_times = np.sort(arrival_times - first_time, axis=0)
+        trigger_time = arrival_times[1]
+
+        ext_timestamp = ext_timestamp + (
+            first_time + trigger_time + station.gps_offset +
+            self.simulate_gps_uncertainties(len(ext_timestamp))
+        ).astype(np.int64)
+        timestamp = ext_timestamp // int(1e9)
+        nanoseconds = ext_timestamp % int(1e9)
+
+        gps_timestamp = {'ext_timestamp': ext_timestamp,
+                         'timestamp': timestamp,
+                         'nanoseconds': nanoseconds,
+                         't_trigger': trigger_time}
+        station_observables.update(gps_timestamp)
+
+        return station_observables
+
 
 class FlatFrontSimulationWithoutErrors(ErrorlessSimulation,
                                        FlatFrontSimulation):
@@ -160,6 +258,21 @@ class FlatFrontSimulation2D(FlatFrontSimulation):
         dt = cdt / c
         return dt
 
+    def get_arrival_times(self, detectors, shower_parameters):
+        """Calculate arrival times for many showers
+
+        Ignore detector altitudes
+
+        """
+        r1, phi1, _ = np.array([detector.cylindrical_coordinates
+                                for detector in detectors]).T
+        phi = shower_parameters['azimuth'][:, np.newaxis]
+        theta = shower_parameters['zenith'][:, np.newaxis]
+        r = r1 * np.cos(phi - phi1)
+        cdt = -r * np.sin(theta)
+        dt = cdt / c
+        return dt
+
 
 class FlatFrontSimulation2DWithoutErrors(FlatFrontSimulation2D,
                                          FlatFrontSimulationWithoutErrors):
@@ -231,6 +344,17 @@ class ConeFrontSimulation(FlatFrontSimulation):
 
             yield shower_parameters
 
+    def generate_shower_parameters_many(self, batch_size):
+        """Generate shower parameters for batches of a single shower
+
+        The cluster is moved for each shower, so the showers are simulated
+        one at a time, see
+        :meth:`~sapphire.simulations.base.BaseSimulation.generate_shower_parameters_many`.
+
+        """
+        base = super(FlatFrontSimulation, self)
+        return base.generate_shower_parameters_many(batch_size)
+
     def _prepare_cluster_for_shower(self, x, y, alpha):
         """Prepare the cluster object for the simulation of a shower.
 
@@ -263,7 +387,39 @@ class ConeFrontSimulation(FlatFrontSimulation):
 
         r_core = sqrt(x ** 2 + y ** 2 + z ** 2 -
                       (x * nx + y * ny + z * nz) ** 2)
-        t_shape = self.delay_at_r(r_core)
+        t_shape = self.front.delay_at_r(r_core)
+        dt = t_shape + (cdt / c)
+
+        return dt
+
+    def get_arrival_times(self, detectors, shower_parameters):
+        """Calculate arrival times for a shower
+
+        Array version of :meth:`get_arrival_time`.  The detector
+        coordinates are those of the cluster as moved for the current
+        shower, so the shower parameters may contain only that shower.
+
+        :return: Shower front arrival times in ns, for the shower (row)
+                 in each detector (columns).
+
+        """
+        x, y, z = np.array([detector.get_coordinates()
+                            for detector in detectors]).T
+        r1 = vector_length(x, y)
+        phi1 = np.arctan2(y, x)
+
+        phi = shower_parameters['azimuth'][:, np.newaxis]
+        theta = shower_parameters['zenith'][:, np.newaxis]
+        r = r1 * np.cos(phi - phi1) - z * np.tan(theta)
+        cdt = - (r * np.sin(theta) + z / np.cos(theta))
+
+        nx = np.sin(theta) * np.cos(phi)
+        ny = np.sin(theta) * np.sin(phi)
+        nz = np.cos(theta)
+
+        r_core = np.sqrt(x ** 2 + y ** 2 + z ** 2 -
+                         (x * nx + y * ny + z * nz) ** 2)
+        t_shape = self.front.delay_at_r(r_core)
         dt = t_shape + (cdt / c)
 
         return dt
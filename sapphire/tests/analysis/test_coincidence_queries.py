@@ -1,9 +1,14 @@
+import os
 import unittest
+import warnings
 
 from mock import sentinel, patch, call
+from numpy.testing import assert_array_equal
 
 from sapphire.analysis import coincidence_queries
 
+TEST_DATA_FILE = 'test_data/esd_coincidences.h5'
+
 
 class BaseCoincidenceQueryTest(unittest.TestCase):
 
@@ -182,5 +187,60 @@ class BaseCoincidenceQueryTest(unittest.TestCase):
         self.assertEqual(result, sentinel.coincidence_events)
 
 
+class GatherEventsTest(unittest.TestCase):
+
+    def setUp(self):
+        warnings.filterwarnings('ignore')
+        dir_path = os.path.dirname(__file__)
+        self.cq = coincidence_queries.CoincidenceQuery(
+            os.path.join(dir_path, TEST_DATA_FILE))
+
+    def tearDown(self):
+        warnings.resetwarnings()
+        self.cq.finish()
+
+    def assert_events_equal(self, events, expected):
+        self.assertEqual(len(events), len(expected))
+        for (number, event), (expected_number, expected_event) in zip(events, expected):
+            self.assertEqual(number, expected_number)
+            assert_array_equal(event, expected_event)
+
+    def test_gather_events(self):
+        coincidences = self.cq.all_coincidences()
+        ids = [1, 0, 1]
+        c_events = self.cq.gather_events(ids)
+        self.assertEqual(len(c_events), 3)
+        assert_array_equal(c_events.offsets, [0, 2, 4, 6])
+        self.assertEqual(sorted(c_events.events.keys()), [501, 502])
+        for events, id in zip(c_events, ids):
+            self.assert_events_equal(events, self.cq._get_events(coincidences[id]))
+        self.assert_events_equal(c_events[-1], self.cq._get_events(coincidences[1]))
+        self.assertRaises(IndexError, c_events.__getitem__, 3)
+
+        self.assertEqual(len(self.cq.gather_events([])), 0)
+
+    def test_gather_events_missing_station(self):
+        self.cq.s_nodes[1] = None
+        coincidences = self.cq.all_coincidences()
+        c_events = self.cq.gather_events([0, 1])
+        self.assertEqual(list(c_events.events.keys()), [501])
+        for events, coincidence in zip(c_events, coincidences):
+            self.assert_events_equal(events, self.cq._get_events(coincidence))
+
+    def test_all_events_bulk(self):
+        self.cq.BULK_SIZE = 1
+        coincidences = self.cq.all_coincidences(iterator=True)
+        result = list(self.cq.all_events(coincidences, bulk=True))
+        expected = list(self.cq.all_events(self.cq.all_coincidences()))
+        self.assertEqual(len(result), 2)
+        for events, expected_events in zip(result, expected):
+            self.assert_events_equal(events, expected_events)
+
+        coincidences = self.cq.all_coincidences(iterator=True)
+        result = list(self.cq.events_from_stations(coincidences, [502], n=1, bulk=True))
+        self.assertEqual(len(result), 2)
+        self.assertTrue(all(number == 502 for events in result for number, _ in events))
+
+
 if __name__ == '__main__':
     unittest.main()
@@ -5,7 +5,7 @@ import shutil
 
 from mock import sentinel, patch, Mock
 import tables
-from numpy import uint64
+from numpy import uint64, random, cumsum, zeros
 
 from sapphire.analysis import coincidences
 from sapphire.tests.validate_results import validate_results
@@ -36,70 +36,130 @@ class CoincidencesTests(unittest.TestCase):
         mock_process.assert_called_with()
         mock_store.assert_called_with()
 
-    def test__retrieve_timestamps(self):
+    def test__retrieve_timestamp_arrays(self):
         station1 = Mock()
         station2 = Mock()
         # Station 2 timestamps are not already correctly sorted.
         station1.col.return_value = [uint64(1400000002000000050), uint64(1400000018000000500)]
         station2.col.return_value = [uint64(1400000002000000510), uint64(1400000030000000000)][::-1]
         stations = [station1, station2]
-        timestamps = self.c._retrieve_timestamps(stations)
-        self.assertEqual(timestamps,
+
+        def retrieve(**kwargs):
+            timestamps, station_ids, event_ids = self.c._retrieve_timestamp_arrays(stations, **kwargs)
+            self.assertEqual(timestamps.dtype, uint64)
+            return zip(timestamps, station_ids, event_ids)
+
+        self.assertEqual(retrieve(),
                          [(uint64(1400000002000000050), 0, 0), (uint64(1400000002000000510), 1, 1),
                           (uint64(1400000018000000500), 0, 1), (uint64(1400000030000000000), 1, 0)])
         # Shift both
-        timestamps = self.c._retrieve_timestamps(stations, shifts=[1, 17])
-        self.assertEqual(timestamps,
+        self.assertEqual(retrieve(shifts=[1, 17]),
                          [(uint64(1400000003000000050), 0, 0), (uint64(1400000019000000500), 0, 1),
                           (uint64(1400000019000000510), 1, 1), (uint64(1400000047000000000), 1, 0)])
         # Wrong value type shifts
-        self.assertRaises(TypeError, self.c._retrieve_timestamps, stations, shifts=['', ''])
-        self.assertRaises(TypeError, self.c._retrieve_timestamps, stations, shifts=['', 90])
+        self.assertRaises(TypeError, self.c._retrieve_timestamp_arrays, stations, shifts=['', ''])
+        self.assertRaises(TypeError, self.c._retrieve_timestamp_arrays, stations, shifts=['', 90])
         # Different length shifts
-        timestamps = self.c._retrieve_timestamps(stations, shifts=[110])
-        self.assertEqual(timestamps,
+        self.assertEqual(retrieve(shifts=[110]),
                          [(uint64(1400000002000000510), 1, 1), (uint64(1400000030000000000), 1, 0),
                           (uint64(1400000112000000050), 0, 0), (uint64(1400000128000000500), 0, 1)])
-        timestamps = self.c._retrieve_timestamps(stations, shifts=[None, 60])
-        self.assertEqual(timestamps,
+        self.assertEqual(retrieve(shifts=[None, 60]),
                          [(uint64(1400000002000000050), 0, 0), (uint64(1400000018000000500), 0, 1),
                           (uint64(1400000062000000510), 1, 1), (uint64(1400000090000000000), 1, 0)])
+        # Negative shifts
+        self.assertEqual(retrieve(shifts=[-1, None]),
+                         [(uint64(1400000001000000050), 0, 0), (uint64(1400000002000000510), 1, 1),
+                          (uint64(1400000017000000500), 0, 1), (uint64(1400000030000000000), 1, 0)])
         # Subsecond shifts
-        timestamps = self.c._retrieve_timestamps(stations, shifts=[3e-9, 5e-9])
-        self.assertEqual(timestamps,
+        self.assertEqual(retrieve(shifts=[3e-9, 5e-9]),
                          [(uint64(1400000002000000053), 0, 0), (uint64(1400000002000000515), 1, 1),
                           (uint64(1400000018000000503), 0, 1), (uint64(1400000030000000005), 1, 0)])
         # Using limits
-        timestamps = self.c._retrieve_timestamps(stations, limit=1)
+        timestamps = retrieve(limit=1)
         self.assertEqual(timestamps,
                          [(uint64(1400000002000000050), 0, 0), (uint64(1400000030000000000), 1, 0)])
-        # This should fail but does not
-        self.assertEqual(timestamps,
-                         [(1400000002000000049, 0, 0), (1400000030000000000, 1, 0)])
-        # Using uint64 does work correctly
+        # Using uint64 keeps the nanosecond precision
         self.assertNotEqual(timestamps,
                             [(uint64(1400000002000000049), 0, 0), (uint64(1400000030000000000), 1, 0)])
         self.assertNotEqual(timestamps,
                             [(uint64(1400000002000000051), 0, 0), (uint64(1400000030000000001), 1, 0)])
-
-    def test__do_search_coincidences(self):
-        # [(timestamp, station_idx, event_idx), ..]
-        timestamps = [(uint64(0), 0, 0), (uint64(0), 1, 0), (uint64(10), 1, 1),
-                      (uint64(15), 2, 0), (uint64(100), 1, 2), (uint64(200), 2, 1),
-                      (uint64(250), 0, 1), (uint64(251), 0, 2)]
-
-        c = self.c._do_search_coincidences(timestamps, window=6)
+        # Equal timestamps are sorted by station and event index
+        station1.col.return_value = [uint64(5), uint64(5)]
+        station2.col.return_value = [uint64(5), uint64(4)]
+        self.assertEqual(retrieve(), [(4, 1, 1), (5, 0, 0), (5, 0, 1), (5, 1, 0)])
+        # No stations
+        timestamps, station_ids, event_ids = self.c._retrieve_timestamp_arrays([])
+        self.assertEqual(len(timestamps), 0)
+
+    def test__do_search_coincidences_arrays(self):
+        timestamps = [uint64(0), uint64(0), uint64(10), uint64(15), uint64(100), uint64(200),
+                      uint64(250), uint64(251)]
+
+        c = self.c._do_search_coincidences_arrays(timestamps, window=6)
         expected_coincidences = [[0, 1], [2, 3], [6, 7]]
         self.assertEqual(c, expected_coincidences)
 
-        c = self.c._do_search_coincidences(timestamps, window=150)
+        c = self.c._do_search_coincidences_arrays(timestamps, window=150)
         expected_coincidences = [[0, 1, 2, 3, 4], [4, 5], [5, 6, 7]]
         self.assertEqual(c, expected_coincidences)
 
-        c = self.c._do_search_coincidences(timestamps, window=300)
+        c = self.c._do_search_coincidences_arrays(timestamps, window=300)
         expected_coincidences = [[0, 1, 2, 3, 4, 5, 6, 7]]
         self.assertEqual(c, expected_coincidences)
 
+        # Windows are rounded up to whole nanoseconds
+        c = self.c._do_search_coincidences_arrays(timestamps, window=5.5)
+        self.assertEqual(c, [[0, 1], [2, 3], [6, 7]])
+
+        c = self.c._do_search_coincidences_arrays(timestamps, window=0)
+        self.assertEqual(c, [])
+        c = self.c._do_search_coincidences_arrays([], window=6)
+        self.assertEqual(c, [])
+
+    def test__search_coincidences_in_chunks(self):
+        random.seed(27182)
+        with tables.open_file('chunks.h5', 'w', driver='H5FD_CORE',
+                              driver_core_backing_store=0) as data:
+            station_groups = []
+            for station in range(3):
+                timestamps = cumsum(random.exponential(5000, size=500))
+                timestamps = timestamps.astype(uint64) + uint64(1400000000000000000)
+                events = zeros(len(timestamps), dtype=[('ext_timestamp', uint64)])
+                events['ext_timestamp'] = timestamps
+                # Include some equal timestamps within and across stations
+                events['ext_timestamp'][10:13] = events['ext_timestamp'][10]
+                group = '/station_%d' % station
+                data.create_table(group, 'events', events, createparents=True)
+                station_groups.append(group)
+            data.root.station_2.events.modify_column(
+                0, 1, column=data.root.station_0.events.col('ext_timestamp')[:1],
+                colname='ext_timestamp')
+
+            self.c.data = data
+            self.c.station_groups = station_groups
+            for window, shifts, limit in [(10000, None, None), (2000, None, None),
+                                          (30000, [1e-6, None, -2e-6], None),
+                                          (10000, None, 300)]:
+                expected_c, expected_ts = self.c._search_coincidences(window, shifts, limit)
+                for chunksize in [1, 7, 100, 1000]:
+                    c_index = []
+                    timestamps = []
+                    for offset, ts, n_final, c in self.c._search_coincidences_in_chunks(
+                            window, shifts, limit, chunksize):
+                        self.assertEqual(offset, len(timestamps))
+                        timestamps.extend(ts[:n_final].tolist())
+                        for coincidence in c:
+                            self.assertTrue(coincidence[-1] - offset < len(ts))
+                        c_index.extend(c)
+                    self.assertEqual(c_index, expected_c)
+                    self.assertEqual(timestamps, expected_ts.tolist())
+
+            # Unsorted event tables are not supported
+            data.root.station_1.events.modify_column(
+                100, 101, column=[0], colname='ext_timestamp')
+            self.assertRaises(RuntimeError, list,
+                              self.c._search_coincidences_in_chunks(chunksize=30))
+
 
 class CoincidencesESDTests(CoincidencesTests):
 
@@ -151,6 +211,18 @@ class CoincidencesDataTests(unittest.TestCase):
 
         validate_results(self, self.get_testdata_path(), self.data_path)
 
+    def test_coincidences_output_in_chunks(self):
+        with tables.open_file(self.data_path, 'a') as data:
+            with patch('sapphire.analysis.process_events.ProcessIndexedEventsWithoutTraces'):
+                c = coincidences.Coincidences(data, '/coincidences',
+                                              ['/station_501', '/station_502'],
+                                              progress=False)
+                c.search_coincidences(chunksize=50)
+                c.process_events()
+                c.store_coincidences()
+
+        validate_results(self, self.get_testdata_path(), self.data_path)
+
     def create_tempfile_from_testdata(self):
         tmp_path = self.create_tempfile_path()
         data_path = self.get_testdata_path()
@@ -184,6 +256,24 @@ class CoincidencesESDDataTests(CoincidencesDataTests):
             c.search_and_store_coincidences(station_numbers=[501, 502])
         validate_results(self, self.get_testdata_path(), self.data_path)
 
+    def test_coincidences_output_in_chunks(self):
+        with tables.open_file(self.data_path, 'a') as data:
+            c = coincidences.CoincidencesESD(data, '/coincidences',
+                                             ['/station_501', '/station_502'],
+                                             progress=False)
+            c.search_and_store_coincidences(station_numbers=[501, 502],
+                                            chunksize=50)
+        validate_results(self, self.get_testdata_path(), self.data_path)
+
+    @patch.object(coincidences, 'STORE_BATCH_SIZE', 3)
+    def test_coincidences_output_small_batches(self):
+        with tables.open_file(self.data_path, 'a') as data:
+            c = coincidences.CoincidencesESD(data, '/coincidences',
+                                             ['/station_501', '/station_502'],
+                                             progress=False)
+            c.search_and_store_coincidences(station_numbers=[501, 502])
+        validate_results(self, self.get_testdata_path(), self.data_path)
+
     def get_testdata_path(self):
         dir_path = os.path.dirname(__file__)
         return os.path.join(dir_path, TEST_DATA_ESD)
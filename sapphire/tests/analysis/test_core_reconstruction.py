@@ -1,5 +1,8 @@
 import unittest
 
+from numpy import nan, isnan
+from numpy.testing import assert_allclose
+
 from sapphire.analysis import core_reconstruction
 
 
@@ -38,12 +41,98 @@ class AverageIntersectionAlgorithmTest(unittest.TestCase, BaseAlgorithm):
     def setUp(self):
         self.algorithm = core_reconstruction.AverageIntersectionAlgorithm()
 
+    def test_reconstruct_common(self):
+        """Check results for some coincidences"""
+
+        p = (10., 4., 2.5, 1.2)
+        x = (0., 100., 50., -80.)
+        y = (0., 20., 120., 60.)
+        result = self.algorithm.reconstruct_common(p, x, y)
+        assert_allclose(result, (30.496574, 36.278863), rtol=1e-6)
+
+        # Only some of the lines are intersected, low densities are ignored
+        p = (5., 3., 0.001, 2., 1.5, 4.)
+        x = (0., 60., 120., -40., 30., 10.)
+        y = (0., 10., -50., 70., 90., -30.)
+        result = self.algorithm.reconstruct_common(p, x, y)
+        assert_allclose(result, (0.37324852, -8.7442825), rtol=1e-6)
+
+    def test_too_few_detections(self):
+        self.assertRaises(Exception, self.algorithm.reconstruct_common,
+                          (1., 1., 1.), (0., 0., 10.), (0., 10., 10.))
+
+    def test_reconstruct_common_many(self):
+        """Reconstruct coincidences with a varying number of detections"""
+
+        p = [(10., 4., 2.5, 1.2, nan, nan), (3.1, 7.7, 1.3, 0.6, 2.2, nan),
+             (1., 1., nan, 1., nan, nan), (5., 3., 0.001, 2., 1.5, 4.)]
+        x = [(0., 100., 50., -80., 0., 0.), (-30., 40., 140., 60., -120., 0.),
+             (0., 0., 10., 10., 0., 0.), (0., 60., 120., -40., 30., 10.)]
+        y = [(0., 20., 120., 60., 0., 0.), (10., -70., 30., 150., 90., 0.),
+             (0., 10., 10., 0., 0., 0.), (0., 10., -50., 70., 90., -30.)]
+        results = self.algorithm.reconstruct_common_many(p, x, y)
+
+        for i in (0, 1, 3):
+            detected = ~isnan(p[i])
+            expected = self.algorithm.reconstruct_common(
+                [v for v, d in zip(p[i], detected) if d],
+                [v for v, d in zip(x[i], detected) if d],
+                [v for v, d in zip(y[i], detected) if d])
+            assert_allclose([result[i] for result in results], expected)
+        self.assertTrue(all(isnan(result[2]) for result in results))
+
 
 class EllipsLdfAlgorithmTest(unittest.TestCase, BaseAlgorithm):
 
     def setUp(self):
         self.algorithm = core_reconstruction.EllipsLdfAlgorithm()
 
+    def test_reconstruct(self):
+        """Check results of the grid search for some coincidences"""
+
+        p = (10., 4., 2.5, 1.2)
+        x = (0., 100., 50., -80.)
+        y = (0., 20., 120., 60.)
+        result = self.algorithm.reconstruct(p, x, y, 0., 0.)
+        assert_allclose(result, (31.237288, 32.536723, 0.024749495,
+                                 390184.85), rtol=1e-6)
+        result = self.algorithm.reconstruct(p, x, y, .4, 1.)
+        assert_allclose(result, (31.237288, 32.536723, 0.034935600,
+                                 388214.85), rtol=1e-6)
+
+        p = (3.1, 7.7, 1.3, 0.6, 2.2)
+        x = (-30., 40., 140., 60., -120.)
+        y = (10., -70., 30., 150., 90.)
+        result = self.algorithm.reconstruct(p, x, y, .3, -2.)
+        assert_allclose(result, (-59.657718, -136.74765, 0.81405795,
+                                 2467183.6), rtol=1e-6)
+
+    def test_too_few_detections(self):
+        self.assertRaises(Exception, self.algorithm.reconstruct,
+                          (1., 1., 1.), (0., 0., 10.), (0., 10., 10.), 0., 0.)
+
+    def test_reconstruct_many(self):
+        """Reconstruct coincidences with a varying number of detections"""
+
+        p = [(10., 4., 2.5, 1.2, nan), (3.1, 7.7, 1.3, 0.6, 2.2),
+             (1., 1., nan, 1., nan), (10., 4., nan, 2.5, 1.2)]
+        x = [(0., 100., 50., -80., 0.), (-30., 40., 140., 60., -120.),
+             (0., 0., 10., 10., 0.), (0., 100., 0., 50., -80.)]
+        y = [(0., 20., 120., 60., 0.), (10., -70., 30., 150., 90.),
+             (0., 10., 10., 0., 0.), (0., 20., 0., 120., 60.)]
+        theta = (.4, .3, 0., 0.)
+        phi = (1., -2., 0., 0.)
+        results = self.algorithm.reconstruct_many(p, x, y, theta, phi)
+
+        for i in (0, 1, 3):
+            detected = ~isnan(p[i])
+            expected = self.algorithm.reconstruct(
+                [v for v, d in zip(p[i], detected) if d],
+                [v for v, d in zip(x[i], detected) if d],
+                [v for v, d in zip(y[i], detected) if d], theta[i], phi[i])
+            assert_allclose([result[i] for result in results], expected)
+        self.assertTrue(all(isnan(result[2]) for result in results))
+
 
 if __name__ == '__main__':
     unittest.main()
@@ -2,9 +2,11 @@ import unittest
 import warnings
 
 from mock import sentinel, patch, Mock, MagicMock
-from numpy import isnan, nan, pi, sqrt, arcsin, arctan
+from numpy import isnan, nan, pi, sqrt, arcsin, arctan, array
+from numpy.testing import assert_array_equal
 
 from sapphire.analysis import direction_reconstruction
+from sapphire.clusters import BaseCluster
 from sapphire.simulations.showerfront import ConeFront
 
 
@@ -77,6 +79,8 @@ class EventDirectionReconstructionTest(unittest.TestCase):
     def test_reconstruct_events(self, mock_reconstruct_event):
         mock_reconstruct_event.return_value = [sentinel.theta, sentinel.phi, sentinel.ids]
         dirrec = direction_reconstruction.EventDirectionReconstruction(sentinel.station)
+        dirrec.direct = sentinel.direct
+        dirrec.fit = sentinel.fit
         self.assertEqual(dirrec.reconstruct_events([sentinel.event, sentinel.event],
                                                    sentinel.detector_ids, sentinel.offsets, progress=False),
                          ((sentinel.theta, sentinel.theta), (sentinel.phi, sentinel.phi), (sentinel.ids, sentinel.ids)))
@@ -86,6 +90,59 @@ class EventDirectionReconstructionTest(unittest.TestCase):
                          ((), (), ()))
         self.assertEqual(mock_reconstruct_event.call_count, 2)
 
+    @patch.object(direction_reconstruction, 'detector_arrival_time')
+    def test_reconstruct_events_in_bulk(self, mock_detector_arrival_time):
+        mock_detector_arrival_time.side_effect = lambda event, id, offsets: event['t'][id]
+        station = MagicMock()
+        station.timestamps = [0]
+        positions = [(0., 0., 0.), (5., 0., 0.), (5., 5., 0.), (0., 5., 1.)]
+        station.detectors = [Mock(timestamps=[0], get_coordinates=Mock(return_value=position))
+                             for position in positions]
+        dirrec = direction_reconstruction.EventDirectionReconstruction(station)
+        events = [{'timestamp': 0, 't': [0., 5., 8., 3.]},
+                  {'timestamp': 0, 't': [0., 5., nan, 3.]},
+                  {'timestamp': 0, 't': [0., nan, nan, 3.]},
+                  {'timestamp': 0, 't': [2., 6., 7., 1.]},
+                  {'timestamp': 0, 't': [nan, 2., 4., 3.]},
+                  {'timestamp': 0, 't': [0., 3., nan, 2.]}]
+        theta, phi, ids = dirrec.reconstruct_events(events, progress=False)
+        for event, event_theta, event_phi, event_ids in zip(events, theta, phi, ids):
+            expected = dirrec.reconstruct_event(event)
+            if isnan(expected[0]):
+                self.assertTrue(isnan(event_theta))
+                self.assertTrue(isnan(event_phi))
+            else:
+                self.assertAlmostEqual(event_theta, expected[0])
+                self.assertAlmostEqual(event_phi, expected[1])
+            self.assertEqual(event_ids, expected[2])
+        self.assertEqual(dirrec.reconstruct_events([], progress=False), ((), (), ()))
+
+    @patch.object(direction_reconstruction, 'detector_arrival_time')
+    def test_reconstruct_events_layout_epochs(self, mock_detector_arrival_time):
+        mock_detector_arrival_time.side_effect = lambda event, id, offsets: event['t'][id]
+        cluster = BaseCluster()
+        cluster._add_station((0, 0, 0), 0, [(([0, 0], [0, 0], [0, 0]), 'UD'),
+                                            (([5, 10], [0, 0], [0, 0]), 'UD'),
+                                            (([5, 5], [5, 5], [0, 2]), 'UD'),
+                                            (([0, 0], [5, 10], [1, 1]), 'UD')],
+                             detector_timestamps=[0, 100])
+        station = cluster.get_station(0)
+        dirrec = direction_reconstruction.EventDirectionReconstruction(station)
+        events = [{'timestamp': 50, 't': [0., 5., 8., 3.]},
+                  {'timestamp': 150, 't': [0., 5., 8., 3.]},
+                  {'timestamp': 60, 't': [0., 5., nan, 3.]},
+                  {'timestamp': 160, 't': [0., 5., nan, 3.]},
+                  {'timestamp': 70, 't': [2., 6., 7., 1.]}]
+        with patch.object(cluster, 'set_timestamp', wraps=cluster.set_timestamp) as mock_set_timestamp:
+            theta, phi, ids = dirrec.reconstruct_events(events, progress=False)
+            self.assertEqual(mock_set_timestamp.call_count, 2)
+        self.assertNotAlmostEqual(theta[0], theta[1])
+        for event, event_theta, event_phi, event_ids in zip(events, theta, phi, ids):
+            expected = dirrec.reconstruct_event(event)
+            self.assertAlmostEqual(event_theta, expected[0])
+            self.assertAlmostEqual(event_phi, expected[1])
+            self.assertEqual(event_ids, expected[2])
+
 
 class CoincidenceDirectionReconstructionTest(unittest.TestCase):
 
@@ -179,6 +236,57 @@ class CoincidenceDirectionReconstructionTest(unittest.TestCase):
                          ((), (), ()))
         self.assertEqual(mock_reconstruct_coincidence.call_count, 2)
 
+    @patch.object(direction_reconstruction.CoincidenceDirectionReconstruction, 'reconstruct_coincidence')
+    def test_reconstruct_coincidences_with_cores(self, mock_reconstruct_coincidence):
+        mock_reconstruct_coincidence.return_value = [sentinel.theta, sentinel.phi, sentinel.nums]
+        detections = {'a': ([1., 2., 3.], [0., 1., 2.], [3., 4., 5.], [6., 7., 8.], [1, 2, 3]),
+                      'c': ([1., 2., 3., 4.], [0., 1., 2., 3.], [3., 4., 5., 6.], [6., 7., 8., 9.], [1, 2, 3, 4]),
+                      'd': ([1., 2.], [0., 1.], [3., 4.], [6., 7.], [1, 2])}
+        dirrec = self.dirrec
+        dirrec._get_detections = Mock(side_effect=lambda coincidence, *args: detections[coincidence[0]])
+        dirrec.curved = Mock()
+        dirrec.curved.reconstruct_common_many.return_value = ([sentinel.theta_a, sentinel.theta_c],
+                                                              [sentinel.phi_a, sentinel.phi_c])
+        core = {'core_x': 1., 'core_y': 2.}
+        coincidences = [['a'] * 3, ['b'] * 3, ['c'] * 4, ['d'] * 3]
+        initials = [core, {}, core, core]
+
+        theta, phi, nums = dirrec.reconstruct_coincidences(coincidences, sentinel.station_numbers, sentinel.offsets,
+                                                           progress=False, initials=initials)
+
+        self.assertEqual(theta[:3], (sentinel.theta_a, sentinel.theta, sentinel.theta_c))
+        self.assertEqual(phi[:3], (sentinel.phi_a, sentinel.phi, sentinel.phi_c))
+        self.assertTrue(isnan(theta[3]))
+        self.assertTrue(isnan(phi[3]))
+        self.assertEqual(nums, ([1, 2, 3], sentinel.nums, [1, 2, 3, 4], [1, 2]))
+        mock_reconstruct_coincidence.assert_called_once_with(['b'] * 3, sentinel.station_numbers, sentinel.offsets, {})
+
+        self.assertEqual(dirrec.curved.reconstruct_common_many.call_count, 1)
+        t, x, y, z, curved_initials = dirrec.curved.reconstruct_common_many.call_args[0]
+        assert_array_equal(t, [[1., 2., 3., nan], [1., 2., 3., 4.]])
+        assert_array_equal(x, [[0., 1., 2., nan], [0., 1., 2., 3.]])
+        assert_array_equal(z, [[6., 7., 8., nan], [6., 7., 8., 9.]])
+        self.assertEqual(curved_initials, [core, core])
+
+    def test_reconstruct_coincidences_with_cores_in_chunks(self):
+        detections = {'a': ([1., 2., 3.], [0., 1., 2.], [3., 4., 5.], [6., 7., 8.], [1, 2, 3]),
+                      'c': ([1., 2., 3., 4.], [0., 1., 2., 3.], [3., 4., 5., 6.], [6., 7., 8., 9.], [1, 2, 3, 4])}
+        dirrec = self.dirrec
+        dirrec.BULK_SIZE = 2
+        dirrec._get_detections = Mock(side_effect=lambda coincidence, *args: detections[coincidence[0]])
+        dirrec.curved = Mock()
+        dirrec.curved.reconstruct_common_many.side_effect = lambda t, x, y, z, initials: (
+            [len(t)] * len(t), [len(t[0])] * len(t))
+        core = {'core_x': 1., 'core_y': 2.}
+        coincidences = [['a'] * 3, ['a'] * 3, ['c'] * 4, ['a'] * 3, ['a'] * 3]
+
+        theta, phi, nums = dirrec.reconstruct_coincidences(coincidences, progress=False, initials=[core] * 5)
+
+        self.assertEqual(dirrec.curved.reconstruct_common_many.call_count, 3)
+        # Each chunk is only padded to its own maximum number of detections
+        self.assertEqual(theta, (2, 2, 2, 2, 1))
+        self.assertEqual(phi, (3, 3, 4, 4, 3))
+
 
 class CoincidenceDirectionReconstructionDetectorsTest(CoincidenceDirectionReconstructionTest):
 
@@ -592,6 +700,65 @@ class CurvedAltitudeAlgorithm(CurvedAlgorithm):
         self.assertTrue(-pi <= phi < pi)
 
 
+class ManyAlgorithm(object):
+
+    """Use this class to check the reconstruct_common_many methods
+
+    This reconstructs a single event using the reconstruct_common_many method.
+
+    """
+
+    def call_reconstruct(self, t, x, y, z, initial={}):
+        theta, phi = self.algorithm.reconstruct_common_many([t], x, y, z)
+        return theta[0], phi[0]
+
+
+class CurvedManyAlgorithm(object):
+
+    """Use this class to check the reconstruct_common_many methods
+
+    This reconstructs a single coincidence using the reconstruct_common_many
+    method of algorithms supporting a curved shower front.
+
+    """
+
+    def call_reconstruct(self, t, x, y, z, initial={}):
+        theta, phi = self.algorithm.reconstruct_common_many([t], x, y, z,
+                                                            [initial])
+        return theta[0], phi[0]
+
+
+class ReconstructManyAlgorithm(object):
+
+    """Check that reconstruct_many gives the same results as reconstruct"""
+
+    def test_reconstruct_many(self):
+        x = (0., 5., 5., 0., 10.)
+        y = (0., 0., 5., 5., 2.)
+        z = (0., 1., -2., 3., 0.)
+        t = array([[0., 5., 8., 3., 10.],
+                   [0., 5., nan, 3., -4.],
+                   [2., 6., 7., 1., nan],
+                   [0., 0., 0., 0., 0.],
+                   [0., 1., nan, nan, nan],
+                   [0., 0., nan, 0., nan],
+                   [0., 100., 0., 0., 0.]])
+
+        theta, phi = self.algorithm.reconstruct_common_many(t, x, y, z)
+        self.assertEqual(theta.shape, (len(t),))
+
+        for event_t, event_theta, event_phi in zip(t, theta, phi):
+            valid = ~isnan(event_t)
+            expected = self.call_reconstruct(
+                event_t[valid], array(x)[valid], array(y)[valid], array(z)[valid])
+            if isnan(expected[0]):
+                self.assertTrue(isnan(event_theta))
+                self.assertTrue(isnan(event_phi))
+            else:
+                self.assertAlmostEqual(event_theta, expected[0], 9)
+                self.assertAlmostEqual(event_phi, expected[1], 9)
+
+
 class DirectAlgorithmTest(unittest.TestCase, DirectAlgorithm):
 
     def setUp(self):
@@ -610,6 +777,41 @@ class DirectAlgorithmCartesian3DTest(unittest.TestCase,
     def setUp(self):
         self.algorithm = direction_reconstruction.DirectAlgorithmCartesian3D()
 
+    def test_reconstruct_many(self):
+        x = (0., 5., 5.)
+        y = (0., 0., 5.)
+        z = (0., 1., -2.)
+        t = array([[0., 5., 8.],
+                   [0., 5., -3.],
+                   [2., 6., 7.],
+                   [0., 0., 0.],
+                   [0., 100., 0.],
+                   [0., -10., 10.]])
+
+        theta, phi = self.algorithm.reconstruct_common_many(t, x, y, z)
+        self.assertEqual(theta.shape, (len(t),))
+
+        for event_t, event_theta, event_phi in zip(t, theta, phi):
+            expected = self.call_reconstruct(event_t, x, y, z)
+            if isnan(expected[0]):
+                self.assertTrue(isnan(event_theta))
+                self.assertTrue(isnan(event_phi))
+            else:
+                self.assertAlmostEqual(event_theta, expected[0], 9)
+                self.assertAlmostEqual(event_phi, expected[1], 9)
+
+        # Detectors on a line
+        theta, phi = self.algorithm.reconstruct_common_many(t, (0., 5., 10.), (0., 5., 10.))
+        self.assertTrue(isnan(theta).all())
+        self.assertTrue(isnan(phi).all())
+
+
+class DirectAlgorithmCartesian3DManyTest(unittest.TestCase, ManyAlgorithm,
+                                         DirectAltitudeAlgorithm):
+
+    def setUp(self):
+        self.algorithm = direction_reconstruction.DirectAlgorithmCartesian3D()
+
 
 class FitAlgorithm3DTest(unittest.TestCase, MultiAltitudeAlgorithm):
 
@@ -617,13 +819,22 @@ class FitAlgorithm3DTest(unittest.TestCase, MultiAltitudeAlgorithm):
         self.algorithm = direction_reconstruction.FitAlgorithm3D()
 
 
-class RegressionAlgorithmTest(unittest.TestCase, MultiAlgorithm):
+class RegressionAlgorithmTest(unittest.TestCase, MultiAlgorithm,
+                              ReconstructManyAlgorithm):
 
     def setUp(self):
         self.algorithm = direction_reconstruction.RegressionAlgorithm()
 
 
-class RegressionAlgorithm3DTest(unittest.TestCase, MultiAltitudeAlgorithm):
+class RegressionAlgorithm3DTest(unittest.TestCase, MultiAltitudeAlgorithm,
+                                ReconstructManyAlgorithm):
+
+    def setUp(self):
+        self.algorithm = direction_reconstruction.RegressionAlgorithm3D()
+
+
+class RegressionAlgorithm3DManyTest(unittest.TestCase, ManyAlgorithm,
+                                    MultiAltitudeAlgorithm):
 
     def setUp(self):
         self.algorithm = direction_reconstruction.RegressionAlgorithm3D()
@@ -643,6 +854,45 @@ class CurvedRegressionAlgorithm3DTest(unittest.TestCase,
         self.algorithm = direction_reconstruction.CurvedRegressionAlgorithm3D()
         self.algorithm.front = ConeFront()
 
+    def test_reconstruct_many(self):
+        x = (0., 100., 50., 0., 120.)
+        y = (0., 0., 100., 50., 20.)
+        z = (10., 0., 40., 3., 0.)
+        t = array([[0., 5., 8., 3., 10.],
+                   [0., 5., nan, 3., -4.],
+                   [2., 6., 7., 1., nan],
+                   [0., 0., 0., 0., 0.],
+                   [0., 1., nan, nan, nan],
+                   [0., 100., 0., 0., 0.],
+                   [0., 5., 8., 3., 10.]])
+        initials = [{'core_x': 50., 'core_y': 0.}, {'core_x': 0., 'core_y': 80.},
+                    {'core_x': -30., 'core_y': 10.}, {'core_x': 50., 'core_y': 50.},
+                    {'core_x': 50., 'core_y': 0.}, {'core_x': 50., 'core_y': 0.},
+                    {'core_x': nan, 'core_y': 0.}]
+
+        theta, phi = self.algorithm.reconstruct_common_many(t, x, y, z, initials)
+        self.assertEqual(theta.shape, (len(t),))
+
+        for event_t, initial, event_theta, event_phi in zip(t, initials, theta, phi):
+            valid = ~isnan(event_t)
+            expected = self.algorithm.reconstruct_common(
+                event_t[valid], array(x)[valid], array(y)[valid], array(z)[valid], initial)
+            if isnan(expected[0]):
+                self.assertTrue(isnan(event_theta))
+                self.assertTrue(isnan(event_phi))
+            else:
+                self.assertAlmostEqual(event_theta, expected[0], 9)
+                self.assertAlmostEqual(event_phi, expected[1], 9)
+        self.assertTrue(isnan(theta[-1]))
+
+
+class CurvedRegressionAlgorithm3DManyTest(unittest.TestCase, CurvedManyAlgorithm,
+                                          CurvedAltitudeAlgorithm):
+
+    def setUp(self):
+        self.algorithm = direction_reconstruction.CurvedRegressionAlgorithm3D()
+        self.algorithm.front = ConeFront()
+
 
 if __name__ == '__main__':
     unittest.main()
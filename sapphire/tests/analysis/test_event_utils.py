@@ -2,7 +2,8 @@ import unittest
 import warnings
 
 from mock import MagicMock, patch, sentinel
-from numpy import isnan, nan
+from numpy import isnan, nan, array
+from numpy.testing import assert_array_equal
 
 from sapphire.analysis import event_utils
 
@@ -198,6 +199,63 @@ class DetectorArrivalTimeTests(unittest.TestCase):
         self.event.__getitem__.assert_called_with('t1')
 
 
+class ArrivalTimesManyTests(unittest.TestCase):
+
+    """Compare the array versions to the functions for single events"""
+
+    def setUp(self):
+        self.events = array(
+            [(1000, 10., 2.5, 5., 7.5, 5., [100, 100, 100, 100]),
+             (2000, 20., 2.5, -999, 7.5, -1, [100, 100, 100, 100]),
+             (3000, -999, 2.5, 5., 7.5, 5., [100, 100, 100, 100]),
+             (4000, 15., -999, -999, -999, -999, [100, 100, 100, 100]),
+             (5000, 10., 2.5, 5., 0., -999, [100, 100, -1, -1])],
+            dtype=[('ext_timestamp', 'u8'), ('t_trigger', 'f4'),
+                   ('t1', 'f4'), ('t2', 'f4'), ('t3', 'f4'), ('t4', 'f4'),
+                   ('pulseheights', 'i2', (4,))])
+        self.offsets = [[1., 2., 3., 4.], [0., 0., 0., 0.], [1., 0., 1., 0.],
+                        [0., 1., 0., 1.], [-1., -2., -3., -4.]]
+
+    def test_detector_arrival_times_many(self):
+        t = event_utils.detector_arrival_times_many(self.events, range(4),
+                                                    self.offsets)
+        self.assertEqual(t.shape, (5, 4))
+        for event, offsets, times in zip(self.events, self.offsets, t):
+            assert_array_equal(times, event_utils.detector_arrival_times(
+                event, range(4), offsets))
+
+        # Detectors which are not present give nan
+        t = event_utils.detector_arrival_times_many(self.events)
+        self.assertEqual(t.shape, (5, 4))
+        assert_array_equal(t[4], [2.5, 5., nan, nan])
+
+        t = event_utils.detector_arrival_times_many(self.events, [1, 2])
+        assert_array_equal(t[0], [5., 7.5])
+
+    def test_relative_detector_arrival_times_many(self):
+        t = event_utils.relative_detector_arrival_times_many(
+            self.events, 500, range(4), self.offsets)
+        for event, offsets, times in zip(self.events, self.offsets, t):
+            assert_array_equal(times, event_utils.relative_detector_arrival_times(
+                event, 500, range(4), offsets))
+
+    def test_station_arrival_time_many(self):
+        references = self.events['ext_timestamp'] + 100
+        with warnings.catch_warnings(record=True):
+            t = event_utils.station_arrival_time_many(
+                self.events, references, range(4), self.offsets)
+            self.assertEqual(t.shape, (5,))
+            for event, reference, offsets, time in zip(self.events,
+                                                       references,
+                                                       self.offsets, t):
+                assert_array_equal(time, event_utils.station_arrival_time(
+                    event, reference, range(4), offsets))
+
+        t = event_utils.station_arrival_time_many(self.events, 500,
+                                                  [0, 1, 2, 3])
+        assert_array_equal(t, [492.5, 1482.5, nan, nan, 4490.])
+
+
 class GetDetectorIdsTests(unittest.TestCase):
 
     def test_get_detector_ids(self):
@@ -6,9 +6,13 @@ import warnings
 import operator
 
 import tables
-from mock import Mock
+from mock import Mock, patch
+from numpy import array, int16
+from numpy.testing import assert_array_equal
 
 from sapphire.analysis import process_events
+from sapphire.utils import trace_cache
+from sapphire.tests.validate_results import validate_results
 
 
 TEST_DATA_FILE = 'test_data/process_events.h5'
@@ -71,6 +75,38 @@ class ProcessEventsTests(unittest.TestCase):
         self.assertEqual(self.proc.first_above_threshold(trace, 4), 2)
         self.assertEqual(self.proc.first_above_threshold(trace, 5), -999)
 
+    def test_first_above_thresholds(self):
+        traces = array([[0, 2, 4, 2, 0], [0, 2, 4, 2, 0], [5, 0, 0, 0, 0],
+                        [0, 2, 4, 2, 0]])
+        idx = self.proc.first_above_thresholds(traces, [1, 4, 5, 5])
+        assert_array_equal(idx, [1, 2, 0, -999])
+
+    def test__get_traces(self):
+        idx = self.proc.source[10]['traces']
+        traces = self.proc._get_traces(idx)
+        self.assertEqual(traces.dtype, int16)
+        for trace, trace_idx in zip(traces, idx):
+            assert_array_equal(trace, list(self.proc._get_trace(trace_idx)))
+        traces = self.proc._get_traces([idx[0]])
+        self.assertEqual(traces.shape, (1, len(list(self.proc._get_trace(idx[0])))))
+        self.assertEqual(self.proc._get_traces([]).shape, (0, 0))
+
+    def test__get_trace_uses_cache(self):
+        idx = self.proc.source[10]['traces'][0]
+        trace_cache.clear()
+        trace = list(self.proc._get_trace(idx))
+        self.assertEqual(trace_cache.misses, 1)
+        self.assertEqual(list(self.proc._get_trace(idx)), trace)
+        self.assertEqual(trace_cache.hits, 1)
+
+    @patch.object(process_events, 'TRACE_BLOCK_SIZE', 7)
+    def test__process_traces_from_event_list(self):
+        events = self.proc.source[:50]
+        expected = [self.proc._reconstruct_time_from_traces(event)
+                    for event in events]
+        timings = self.proc._process_traces_from_event_list(events)
+        assert_array_equal(timings, expected)
+
 #     @patch.object(process_events.FindMostProbableValueInSpectrum, 'find_mpv')
     def test__process_pulseintegrals(self):
         self.proc.limit = 1
@@ -262,6 +298,72 @@ class ProcessEventsFromSourceTests(ProcessEventsTests):
         self.proc.process_and_store_results()
 
 
+class ProcessEventsInParallelTests(unittest.TestCase):
+    def setUp(self):
+        warnings.filterwarnings('ignore')
+        self.groups = [DATA_GROUP, '/station/s502']
+        self.data_path = self.create_tempfile_with_groups()
+        self.expected_path = self.create_tempfile_with_groups()
+        self.dest_path = self.create_tempfile_path()
+
+    def tearDown(self):
+        warnings.resetwarnings()
+        for path in [self.data_path, self.expected_path, self.dest_path]:
+            os.remove(path)
+
+    def test_process_events_in_parallel(self):
+        with tables.open_file(self.expected_path, 'a') as data:
+            for group in self.groups:
+                process_events.ProcessEvents(
+                    data, group, progress=False).process_and_store_results()
+
+        process_events.process_events_in_parallel(
+            self.data_path, self.groups, n_workers=2, progress=False)
+        validate_results(self, self.expected_path, self.data_path)
+
+        # Do not overwrite previous results, unless asked to
+        self.assertRaises(RuntimeError,
+                          process_events.process_events_in_parallel,
+                          self.data_path, self.groups, progress=False)
+        process_events.process_events_in_parallel(
+            self.data_path, self.groups, overwrite=True, progress=False)
+        validate_results(self, self.expected_path, self.data_path)
+
+    def test_process_events_in_parallel_with_destination(self):
+        process_events.process_events_in_parallel(
+            self.data_path, self.groups, destination=self.dest_path,
+            trigger_offset=True, n_workers=2, progress=False)
+
+        with tables.open_file(self.data_path, 'r') as data, \
+                tables.open_file(self.expected_path, 'w') as expected:
+            for group in self.groups:
+                process_events.ProcessEventsFromSourceWithTriggerOffset(
+                    data, expected, group, group).process_and_store_results()
+            self.assertNotIn('_events', data.get_node(DATA_GROUP))
+        validate_results(self, self.expected_path, self.dest_path)
+        self.assertRaises(RuntimeError,
+                          process_events.process_events_in_parallel,
+                          self.data_path, self.groups,
+                          destination=self.dest_path, progress=False)
+
+    def create_tempfile_with_groups(self):
+        path = self.create_tempfile_path()
+        shutil.copyfile(self.get_testdata_path(), path)
+        with tables.open_file(path, 'a') as data:
+            data.copy_node(DATA_GROUP, '/station', 's502', createparents=True,
+                           recursive=True)
+        return path
+
+    def create_tempfile_path(self):
+        fd, path = tempfile.mkstemp('.h5')
+        os.close(fd)
+        return path
+
+    def get_testdata_path(self):
+        dir_path = os.path.dirname(__file__)
+        return os.path.join(dir_path, TEST_DATA_FILE)
+
+
 class ProcessEventsFromSourceWithTriggerOffsetTests(ProcessEventsFromSourceTests,
                                                     ProcessEventsWithTriggerOffsetTests):
     def setUp(self):
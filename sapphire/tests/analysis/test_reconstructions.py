@@ -1,8 +1,16 @@
+import os
+import shutil
+import tempfile
 import unittest
 
 from mock import sentinel, MagicMock, patch
+import tables
 
 from sapphire.analysis import reconstructions
+from sapphire.clusters import BaseCluster
+from sapphire.tests.validate_results import validate_results
+
+TEST_DATA_FILE = 'test_data/esd_coincidences.h5'
 
 
 class ReconstructESDEventsTest(unittest.TestCase):
@@ -276,5 +284,148 @@ class ReconstructESDCoincidencesFromSourceTest(ReconstructESDCoincidencesTest):
         pass
 
 
+class ReconstructCoincidencesInParallelTest(unittest.TestCase):
+
+    def setUp(self):
+        self.expected_path = create_tempfile_from_testdata()
+        self.data_path = create_tempfile_from_testdata()
+        self.cluster = BaseCluster()
+        self.cluster._add_station((0, 0, 0), 0, number=501)
+        self.cluster._add_station((50, 80, 5), 0, number=502)
+
+    def tearDown(self):
+        os.remove(self.expected_path)
+        os.remove(self.data_path)
+
+    def test_reconstruct_coincidences_in_parallel(self):
+        with tables.open_file(self.expected_path, 'a') as data:
+            rec = reconstructions.ReconstructESDCoincidences(
+                data, progress=False, cluster=self.cluster)
+            rec.reconstruct_and_store()
+
+        reconstructions.reconstruct_coincidences_in_parallel(
+            self.data_path, progress=False, cluster=self.cluster, n_workers=2,
+            chunk_size=1)
+        validate_results(self, self.expected_path, self.data_path)
+
+        # Do not overwrite previous results, unless asked to
+        self.assertRaises(RuntimeError,
+                          reconstructions.reconstruct_coincidences_in_parallel,
+                          self.data_path, progress=False, cluster=self.cluster)
+        reconstructions.reconstruct_coincidences_in_parallel(
+            self.data_path, overwrite=True, progress=False,
+            cluster=self.cluster, n_workers=1)
+        validate_results(self, self.expected_path, self.data_path)
+
+    def test_reconstruct_coincidences_in_parallel_incremental(self):
+        with tables.open_file(self.expected_path, 'a') as data:
+            rec = reconstructions.ReconstructESDCoincidences(
+                data, progress=False, cluster=self.cluster)
+            rec.reconstruct_and_store()
+
+        reconstructions.reconstruct_coincidences_in_parallel(
+            self.data_path, progress=False, cluster=self.cluster, n_workers=1)
+        with tables.open_file(self.data_path, 'a') as data:
+            data.root.coincidences.reconstructions.remove_rows(1)
+        reconstructions.reconstruct_coincidences_in_parallel(
+            self.data_path, progress=False, cluster=self.cluster, n_workers=1,
+            incremental=True)
+        validate_results(self, self.expected_path, self.data_path)
+
+
+class IncrementalReconstructionTest(unittest.TestCase):
+
+    def setUp(self):
+        self.expected_path = create_tempfile_from_testdata()
+        self.data_path = create_tempfile_from_testdata()
+        self.cluster = self.create_cluster(0.)
+
+    def tearDown(self):
+        os.remove(self.expected_path)
+        os.remove(self.data_path)
+
+    def test_events(self):
+        station = self.cluster.get_station(501)
+        with tables.open_file(self.expected_path, 'a') as data:
+            rec = reconstructions.ReconstructESDEvents(
+                data, '/station_501', station, progress=False)
+            rec.reconstruct_and_store()
+
+        with tables.open_file(self.data_path, 'a') as data:
+            rec = reconstructions.ReconstructESDEvents(
+                data, '/station_501', station, progress=False)
+            rec.reconstruct_and_store()
+            data.root.station_501.reconstructions.remove_rows(44)
+
+            rec = reconstructions.ReconstructESDEvents(
+                data, '/station_501', station, progress=False,
+                incremental=True)
+            rec.reconstruct_and_store()
+            self.assertEqual(rec.start, 44)
+            self.assertEqual(len(rec.theta), 30)
+
+            # Nothing new to reconstruct
+            rec = reconstructions.ReconstructESDEvents(
+                data, '/station_501', station, progress=False,
+                incremental=True)
+            rec.reconstruct_and_store()
+            self.assertEqual(rec.start, 74)
+        validate_results(self, self.expected_path, self.data_path)
+
+        # Station has moved
+        station = self.create_cluster(10.).get_station(501)
+        with tables.open_file(self.data_path, 'a') as data:
+            rec = reconstructions.ReconstructESDEvents(
+                data, '/station_501', station, progress=False,
+                incremental=True)
+            self.assertRaises(RuntimeError, rec.reconstruct_and_store)
+
+    def test_coincidences(self):
+        with tables.open_file(self.expected_path, 'a') as data:
+            rec = reconstructions.ReconstructESDCoincidences(
+                data, progress=False, cluster=self.cluster)
+            rec.reconstruct_and_store()
+
+        with tables.open_file(self.data_path, 'a') as data:
+            rec = reconstructions.ReconstructESDCoincidences(
+                data, progress=False, cluster=self.cluster)
+            rec.reconstruct_and_store()
+            data.root.coincidences.reconstructions.remove_rows(1)
+
+            rec = reconstructions.ReconstructESDCoincidences(
+                data, progress=False, cluster=self.cluster, incremental=True)
+            rec.reconstruct_and_store()
+            self.assertEqual(rec.start, 1)
+            self.assertEqual(len(rec.theta), 1)
+        validate_results(self, self.expected_path, self.data_path)
+
+        with tables.open_file(self.data_path, 'a') as data:
+            # Station has moved
+            rec = reconstructions.ReconstructESDCoincidences(
+                data, progress=False, cluster=self.create_cluster(10.),
+                incremental=True)
+            self.assertRaises(RuntimeError, rec.reconstruct_and_store)
+
+            # Different station offsets
+            rec = reconstructions.ReconstructESDCoincidences(
+                data, progress=False, cluster=self.cluster, incremental=True)
+            rec.offsets = {501: [1., 0., 0., 0.]}
+            self.assertRaises(RuntimeError, rec.prepare_output)
+
+    def create_cluster(self, x):
+        cluster = BaseCluster()
+        cluster._add_station((x, 0, 0), 0, number=501)
+        cluster._add_station((50, 80, 5), 0, number=502)
+        return cluster
+
+
+def create_tempfile_from_testdata():
+    fd, path = tempfile.mkstemp('.h5')
+    os.close(fd)
+    dir_path = os.path.dirname(__file__)
+    shutil.copyfile(os.path.join(dir_path, TEST_DATA_FILE), path)
+    return path
+
+
 if __name__ == '__main__':
     unittest.main()
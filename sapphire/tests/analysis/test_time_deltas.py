@@ -44,6 +44,18 @@ class ProcessTimeDeltasTests(unittest.TestCase):
                           sentinel.station2: mock_offsets.detector_timing_offset,
                           sentinel.station3: mock_offsets.detector_timing_offset})
 
+    def test_determine_time_deltas_for_pair(self):
+        offsets = {501: [1., 2., 0., -1.], 502: [0., .5, 0., 0.]}
+        self.td.detector_timing_offsets = {
+            station: lambda timestamp, station=station: offsets[station]
+            for station in offsets}
+        ets, dt = self.td.determine_time_deltas_for_pair(501, 502)
+        self.assertEqual(ets, [1325376065905523886, 1325376105905397625])
+        self.assertEqual(dt, [65.5, -1.])
+
+        ets, dt = self.td.determine_time_deltas_for_pair(502, 501)
+        self.assertEqual(dt, [-65.5, 1.])
+
     def test_store_time_deltas(self):
         pair = (501, 502)
         node_path = '/time_deltas/station_%d/station_%d' % pair
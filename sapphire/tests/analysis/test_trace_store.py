@@ -0,0 +1,106 @@
+import unittest
+import tempfile
+import os
+import shutil
+import zlib
+
+import tables
+from mock import patch
+from numpy import int16
+from numpy.testing import assert_array_equal
+
+from sapphire.analysis import trace_store, process_events, process_traces
+
+
+TEST_DATA_FILE = 'test_data/process_events.h5'
+DATA_GROUP = '/s501'
+
+
+class TraceStoreTests(unittest.TestCase):
+
+    def setUp(self):
+        self.data_path = self.create_tempfile_from_testdata()
+        self.data = tables.open_file(self.data_path, 'a')
+        self.group = self.data.get_node(DATA_GROUP)
+        self.blobs = self.group.blobs
+
+    def tearDown(self):
+        self.data.close()
+        os.remove(self.data_path)
+
+    @patch.object(trace_store, 'CONVERT_BLOCK_SIZE', 100)
+    def test_convert_blobs(self):
+        self.assertFalse(trace_store.has_trace_store(self.group))
+        trace_store.convert_blobs(self.data, DATA_GROUP, progress=False)
+        self.assertTrue(trace_store.has_trace_store(self.group))
+        self.assertEqual(self.group.trace_samples.filters.complib, 'blosc')
+
+        store = trace_store.TraceStore(self.group)
+        self.assertEqual(len(store), len(self.blobs))
+        for idx in [0, 1, 99, 100, 500, len(self.blobs) - 1]:
+            trace = store.get_trace(idx)
+            self.assertEqual(trace.dtype, int16)
+            assert_array_equal(trace, trace_store.decode_blob(self.blobs[idx]))
+
+        self.assertRaises(RuntimeError, trace_store.convert_blobs, self.data,
+                          DATA_GROUP, progress=False)
+        trace_store.convert_blobs(self.data, DATA_GROUP, overwrite=True,
+                                  progress=False)
+
+    def test_blobs_which_are_not_traces(self):
+        self.blobs.append(zlib.compress('Error message'))
+        trace_store.convert_blobs(self.data, DATA_GROUP, progress=False)
+        store = trace_store.TraceStore(self.group)
+        self.assertFalse(store.has_trace(len(self.blobs) - 1))
+        self.assertRaises(KeyError, store.get_trace, len(self.blobs) - 1)
+
+        # Blobs added after converting are not in the store
+        self.blobs.append(self.blobs[0])
+        self.assertFalse(store.has_trace(len(self.blobs) - 1))
+
+    def test_get_traces_for_event(self):
+        event = self.group.events[10]
+        proc = process_events.ProcessEvents(self.data, DATA_GROUP,
+                                            progress=False)
+        expected = proc.get_traces_for_event(event)
+        assert_array_equal(trace_store.get_traces_for_event(self.group, event),
+                           expected)
+        trace_store.convert_blobs(self.data, DATA_GROUP, progress=False)
+        assert_array_equal(trace_store.get_traces_for_event(self.group, event),
+                           expected)
+
+    def test_trace_observables_from_event(self):
+        event = self.group.events[10]
+        expected = process_traces.TraceObservables(
+            trace_store.get_traces_for_event(self.group, event))
+        trace_store.convert_blobs(self.data, DATA_GROUP, progress=False)
+        observables = process_traces.TraceObservables.from_event(self.group,
+                                                                 event)
+        self.assertEqual(observables.baselines, expected.baselines)
+        self.assertEqual(observables.pulseheights, expected.pulseheights)
+
+    def test_process_events_uses_trace_store(self):
+        proc = process_events.ProcessEvents(self.data, DATA_GROUP,
+                                            progress=False)
+        expected = proc.process_traces()
+
+        trace_store.convert_blobs(self.data, DATA_GROUP, progress=False)
+        proc = process_events.ProcessEvents(self.data, DATA_GROUP,
+                                            progress=False)
+        with patch.object(trace_store, 'decode_blob') as mock_decode:
+            assert_array_equal(proc.process_traces(), expected)
+            idx = self.group.events[10]['traces'][0]
+            self.assertEqual(list(proc._get_trace(idx)),
+                             proc._trace_store.get_trace(idx).tolist())
+            self.assertFalse(mock_decode.called)
+
+    def create_tempfile_from_testdata(self):
+        fd, path = tempfile.mkstemp('.h5')
+        os.close(fd)
+        dir_path = os.path.dirname(__file__)
+        shutil.copyfile(os.path.join(dir_path, TEST_DATA_FILE), path)
+        return path
+
+
+if __name__ == '__main__':
+    unittest.main()
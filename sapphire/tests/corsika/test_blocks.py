@@ -58,6 +58,14 @@ class CorsikaBlocksTests(unittest.TestCase):
                          msg=('The particle format ({particle}) is incorrect.'
                               .format(particle=self.format.particle_format)))
 
+    def test_dtypes(self):
+        """Verify that the NumPy dtypes match the block format"""
+
+        self.assertEqual(self.format.block_dtype.itemsize, self.format.block_size)
+        self.assertEqual(self.format.subblock_dtype.itemsize, self.format.subblock_size)
+        self.assertEqual(self.format.subblock_dtype['fields'].shape[0],
+                         self.format.fields_per_particle * self.format.particles_per_subblock)
+
 
 class CorsikaBlocksThinTests(CorsikaBlocksTests):
     def setUp(self):
@@ -95,6 +103,17 @@ class ParticleDataTests(unittest.TestCase):
         """ verify conversion of particle information by particle_data() """
         self.assertAlmostEqual(blocks.particle_data(self.subblock), self.result)
 
+    def test_particles_data(self):
+        """ verify conversion of particle information by particles_data() """
+        data = blocks.particles_data([self.subblock, self.subblock])
+        self.assertEqual(len(data), 2)
+        for value, expected in zip(data[1], self.result):
+            self.assertAlmostEqual(value, expected)
+
+        data = blocks.particles_data([self.subblock + (.5,)])
+        self.assertEqual(data['weight'][0], .5)
+        self.assertAlmostEqual(data['r'][0], self.result[7])
+
     @unittest.skipUnless(numba_available, "Numba required")
     def test_numba_jit(self):
         """ verify particle_data() with numba JIT disabled  """
@@ -88,6 +88,25 @@ class CorsikaFileTests(unittest.TestCase):
         particle = particles.next()
         self.assertEqual(corsika.particles.name(particle[6]), 'muon_m')
 
+    def test_blocks(self):
+        """Verify that the blocks are memory-mapped"""
+
+        blocks = self.file.get_blocks()
+        self.assertEqual(len(blocks), 48)
+        self.assertEqual(blocks['subblocks']['id'][0, 0], 'RUNH')
+        self.assertTrue((blocks['head'] == blocks['tail']).all())
+
+    def test_particles_array(self):
+        """Verify that the Particles are read as an array"""
+
+        event = self.file.get_events().next()
+        particles = event.get_particles_array()
+        expected = list(event.get_particles())
+        self.assertEqual(len(particles), len(expected))
+        self.assertEqual(tuple(particles[0]), expected[0])
+        self.assertEqual(tuple(particles[-1]), expected[-1])
+        self.assertEqual(corsika.particles.name(particles['id'][1]), 'muon_m')
+
 
 if __name__ == '__main__':
     unittest.main()
@@ -4,8 +4,11 @@ import unittest
 import warnings
 
 import tables
+from numpy import array, ones, zeros, arange, nan, diff, testing
 
-from sapphire.simulations.base import BaseSimulation
+from sapphire.simulations.base import BaseSimulation, run_simulation_in_parallel
+from sapphire.simulations.showerfront import FlatFrontSimulation
+from sapphire.clusters import SimpleCluster
 from sapphire import storage
 
 
@@ -60,6 +63,59 @@ class BaseSimulationTest(unittest.TestCase):
         mock_store.assert_called_with(1, sentinel.params2,
                                       sentinel.events)
 
+    @patch.object(BaseSimulation, 'generate_shower_parameters_many')
+    @patch.object(BaseSimulation, 'simulate_events_for_shower_many')
+    @patch.object(BaseSimulation, 'store_coincidence_many')
+    def test_run_many(self, mock_store, mock_simulate, mock_generate):
+        mock_generate.return_value = [sentinel.params1, sentinel.params2]
+        mock_simulate.side_effect = [zeros((3, 2)), zeros((2, 2))]
+        self.simulation.run_many(sentinel.batch_size)
+
+        mock_generate.assert_called_once_with(sentinel.batch_size)
+        expected = [call(sentinel.params1), call(sentinel.params2)]
+        self.assertEqual(mock_simulate.call_args_list, expected)
+
+        # The second batch starts at the shower id after the first batch
+        self.assertEqual(mock_store.call_args_list[0][0][:2],
+                         (0, sentinel.params1))
+        self.assertEqual(mock_store.call_args_list[1][0][:2],
+                         (3, sentinel.params2))
+
+    def test_generate_shower_parameters_many(self):
+        self.simulation.N = 3
+        output = self.simulation.generate_shower_parameters_many(10)
+        self.assertIsInstance(output, types.GeneratorType)
+        batches = list(output)
+        self.assertEqual(len(batches), 3)
+        for shower_parameters in batches:
+            x, y = shower_parameters['core_pos']
+            testing.assert_array_equal(x, [nan])
+            testing.assert_array_equal(y, [nan])
+            testing.assert_array_equal(shower_parameters['zenith'], [nan])
+            testing.assert_array_equal(shower_parameters['ext_timestamp'],
+                                       [nan])
+
+    @patch.object(BaseSimulation, 'generate_shower_parameters')
+    def test_generate_shower_parameters_many_one_at_a_time(self,
+                                                           mock_generate):
+        mock_generate.return_value = iter([
+            {'core_pos': (1., 2.), 'zenith': .5, 'ext_timestamp': 10 ** 18},
+            {'core_pos': (3., 4.), 'zenith': .1, 'ext_timestamp': 10 ** 18 + 1}])
+        batches = list(self.simulation.generate_shower_parameters_many(10))
+        self.assertEqual(len(batches), 2)
+        x, y = batches[1]['core_pos']
+        testing.assert_array_equal(x, [3.])
+        testing.assert_array_equal(y, [4.])
+        testing.assert_array_equal(batches[1]['zenith'], [.1])
+        self.assertEqual(batches[1]['ext_timestamp'].tolist(), [10 ** 18 + 1])
+
+    def test_simulate_detector_response_many(self):
+        self.simulation.get_detectors = Mock(return_value=[sentinel.d] * 4)
+        observables = self.simulation.simulate_detector_response_many(
+            {'ext_timestamp': zeros(3)})
+        testing.assert_array_equal(observables['n'], zeros((3, 4)))
+        testing.assert_array_equal(observables['t'], -999 * ones((3, 4)))
+
     def test_generate_shower_parameters(self):
         self.simulation.N = 10
         output = self.simulation.generate_shower_parameters()
@@ -103,6 +159,59 @@ class BaseSimulationTest(unittest.TestCase):
         self.assertEqual(events, [(0, sentinel.index1),
                                   (2, sentinel.index2)])
 
+    @patch.object(BaseSimulation, 'simulate_detector_response_many')
+    @patch.object(BaseSimulation, 'simulate_station_response_many')
+    @patch.object(BaseSimulation, 'store_station_observables_many')
+    def test_simulate_events_for_shower_many(self, mock_store, mock_simulate,
+                                             mock_response):
+        self.simulation.cluster = SimpleCluster()
+        stations = self.simulation.cluster.stations
+        mock_response.return_value = {'n': arange(3 * 16).reshape(3, 16)}
+        mock_simulate.side_effect = [
+            (array([True, False, True]), sentinel.obs1),
+            (array([False, False, False]), sentinel.obs2),
+            (array([True, True, True]), sentinel.obs3),
+            (array([False, True, False]), sentinel.obs4)]
+        mock_store.side_effect = [array([0, 1]), array([], dtype=int),
+                                  array([0, 1, 2]), array([0])]
+        parameters = {'ext_timestamp': zeros(3)}
+        event_indexes = self.simulation.simulate_events_for_shower_many(
+            parameters)
+
+        mock_response.assert_called_once_with(parameters)
+        # Each station gets the observables of its own detectors
+        for i, (args, kwargs) in enumerate(mock_simulate.call_args_list):
+            station, observables, shower_parameters = args
+            self.assertIs(station, stations[i])
+            testing.assert_array_equal(observables['n'],
+                                       arange(3 * 16).reshape(3, 16)[:, 4 * i:4 * i + 4])
+            self.assertIs(shower_parameters, parameters)
+
+        expected = [[0, -1, 0, -1], [-1, -1, 1, 0], [1, -1, 2, -1]]
+        testing.assert_array_equal(event_indexes, expected)
+
+    @patch.object(BaseSimulation, 'simulate_trigger_many')
+    @patch.object(BaseSimulation, 'process_detector_observables_many')
+    @patch.object(BaseSimulation, 'simulate_gps_many')
+    def test_simulate_station_response_many(self, mock_gps, mock_process,
+                                            mock_trigger):
+        mock_trigger.return_value = sentinel.has_triggered
+        mock_process.return_value = sentinel.station_observables
+        mock_gps.return_value = sentinel.gps_observables
+
+        has_triggered, station_observables = \
+            self.simulation.simulate_station_response_many(
+                sentinel.station, sentinel.detector_observables,
+                sentinel.parameters)
+
+        mock_trigger.assert_called_once_with(sentinel.detector_observables)
+        mock_process.assert_called_once_with(sentinel.detector_observables)
+        mock_gps.assert_called_once_with(sentinel.station_observables,
+                                         sentinel.parameters,
+                                         sentinel.station)
+        self.assertIs(has_triggered, sentinel.has_triggered)
+        self.assertIs(station_observables, sentinel.gps_observables)
+
     @patch.object(BaseSimulation, 'simulate_all_detectors')
     @patch.object(BaseSimulation, 'simulate_trigger')
     @patch.object(BaseSimulation, 'process_detector_observables')
@@ -159,6 +268,23 @@ class BaseSimulationTest(unittest.TestCase):
         has_triggered = self.simulation.simulate_trigger(Mock())
         self.assertIsInstance(has_triggered, bool)
 
+    def test_simulate_trigger_many(self):
+        has_triggered = self.simulation.simulate_trigger_many({'n': zeros((3, 4))})
+        testing.assert_array_equal(has_triggered, [True, True, True])
+
+    def test_get_detectors(self):
+        self.simulation.cluster = SimpleCluster()
+        detectors = self.simulation.get_detectors()
+        self.assertEqual(len(detectors), 16)
+        self.assertEqual(detectors[:4],
+                         self.simulation.cluster.stations[0].detectors)
+
+    def test_simulate_gps_many(self):
+        observables = self.simulation.simulate_gps_many(
+            {}, {'ext_timestamp': ones(3)}, Mock())
+        for key in ['ext_timestamp', 'timestamp', 'nanoseconds']:
+            testing.assert_array_equal(observables[key], [0, 0, 0])
+
     def test_simulate_gps(self):
         mock_observables = Mock()
         self.simulation.simulate_gps(mock_observables, Mock(), Mock())
@@ -185,6 +311,23 @@ class BaseSimulationTest(unittest.TestCase):
 
         self.assertEqual(expected, actual)
 
+    def test_process_detector_observables_many(self):
+        detector_observables = {'n': array([[1., 5.], [9., 10.]]),
+                                't': array([[2., 6.], [11., 12.]]),
+                                'pulseheights': array([[3., 7.], [13., 14.]]),
+                                'foo': array([[-999., -999.], [-999., -999.]])}
+
+        actual = self.simulation.process_detector_observables_many(
+            detector_observables)
+
+        self.assertEqual(sorted(actual.keys()),
+                         ['integrals', 'n1', 'n2', 'pulseheights', 't1', 't2'])
+        testing.assert_array_equal(actual['n1'], [1., 9.])
+        testing.assert_array_equal(actual['t2'], [6., 12.])
+        testing.assert_array_equal(actual['pulseheights'],
+                                   [[3., 7., -1., -1.], [13., 14., -1., -1.]])
+        testing.assert_array_equal(actual['integrals'], -ones((2, 4)))
+
     def test_store_station_observables(self):
         station_groups = MagicMock()
         self.simulation.station_groups = station_groups
@@ -218,6 +361,56 @@ class BaseSimulationTest(unittest.TestCase):
                           self.simulation.store_station_observables,
                           sentinel.station_id, observables)
 
+    def test_store_many(self):
+        self.simulation.cluster = SimpleCluster()
+        self.simulation.data = tables.open_file(
+            'store_many.h5', 'w', driver='H5FD_CORE',
+            driver_core_backing_store=0)
+        self.addCleanup(self.simulation.data.close)
+        self.simulation.output_path = '/'
+        self.simulation.N = 3
+        BaseSimulation._prepare_output_tables(self.simulation)
+
+        observables = {'n1': array([1., 2., 3.]),
+                       'ext_timestamp': array([30, 10, 20]),
+                       'timestamp': array([3, 1, 2]),
+                       'nanoseconds': array([0, 0, 5])}
+        idx = self.simulation.store_station_observables_many(
+            1, observables, array([True, False, True]))
+        testing.assert_array_equal(idx, [0, 1])
+        observables['ext_timestamp'] = array([40, 5, 15])
+        idx = self.simulation.store_station_observables_many(
+            3, observables, array([False, False, True]))
+        testing.assert_array_equal(idx, [0])
+
+        events = self.simulation.station_groups[1].events.read()
+        testing.assert_array_equal(events['event_id'], [0, 1])
+        testing.assert_array_equal(events['n1'], [1., 3.])
+        testing.assert_array_equal(events['n2'], [-1., -1.])
+        testing.assert_array_equal(events['ext_timestamp'], [30, 20])
+
+        parameters = {'core_pos': (array([1., 2., 3.]), array([nan, 5., 6.])),
+                      'zenith': zeros(3), 'azimuth': ones(3),
+                      'size': ones(3), 'energy': ones(3),
+                      'ext_timestamp': zeros(3)}
+        event_indexes = array([[-1, 0, -1, -1], [-1, -1, -1, -1],
+                               [-1, 1, -1, 0]])
+        self.simulation.store_coincidence_many(5, parameters, event_indexes)
+
+        coincidences = self.simulation.coincidences.read()
+        testing.assert_array_equal(coincidences['id'], [5, 6, 7])
+        testing.assert_array_equal(coincidences['N'], [1, 0, 2])
+        testing.assert_array_equal(coincidences['x'], [1., 2., 3.])
+        testing.assert_array_equal(coincidences['s1'], [True, False, True])
+        testing.assert_array_equal(coincidences['s3'], [False, False, True])
+        testing.assert_array_equal(coincidences['ext_timestamp'], [30, 0, 15])
+        testing.assert_array_equal(coincidences['timestamp'], [3, 0, 2])
+        testing.assert_array_equal(coincidences['nanoseconds'], [0, 0, 5])
+        c_index = self.simulation.c_index.read()
+        testing.assert_array_equal(c_index[0], [[1, 0]])
+        self.assertEqual(len(c_index[1]), 0)
+        testing.assert_array_equal(c_index[2], [[1, 1], [3, 0]])
+
     @unittest.skip("WIP")
     def test_store_coincidence(self, shower_id, shower_parameters, station_events):
         pass
@@ -258,5 +451,54 @@ class BaseSimulationTest(unittest.TestCase):
         self.assertIs(self.simulation.coincidence_group._v_attrs.cluster, self.cluster)
 
 
+class RunSimulationInParallelTest(unittest.TestCase):
+
+    def run_simulation(self, filename, n_workers):
+        data = tables.open_file(filename, 'w', driver='H5FD_CORE',
+                                driver_core_backing_store=0)
+        self.addCleanup(data.close)
+        run_simulation_in_parallel(FlatFrontSimulation, data, SimpleCluster(),
+                                   output_path='/simulation', N=11, seed=5,
+                                   n_workers=n_workers, progress=False)
+        return data.get_node('/simulation/coincidences')
+
+    def get_events(self, group, station_id):
+        return group._v_file.get_node(group.s_index[station_id], 'events').read()
+
+    def test_run_simulation_in_parallel(self):
+        group = self.run_simulation('parallel.h5', 3)
+        coincidences = group.coincidences.read()
+        testing.assert_array_equal(coincidences['id'], range(11))
+        testing.assert_array_equal(coincidences['N'], [4] * 11)
+        self.assertTrue((diff(coincidences['ext_timestamp'].astype('int64')) > 0).all())
+        testing.assert_array_equal(coincidences['timestamp'],
+                                   coincidences['ext_timestamp'] // int(1e9))
+
+        c_index = group.c_index.read()
+        self.assertEqual(len(c_index), 11)
+        for station_id in range(4):
+            events = self.get_events(group, station_id)
+            testing.assert_array_equal(events['event_id'], range(11))
+            indexes = [dict(station_events)[station_id]
+                       for station_events in c_index]
+            testing.assert_array_equal(indexes, range(11))
+            self.assertTrue((diff(events['ext_timestamp'].astype('int64')) > 0).all())
+
+        # All parts use the offsets of a simulation with the master seed
+        cluster = group._v_attrs.cluster
+        with tables.open_file('serial.h5', 'w', driver='H5FD_CORE',
+                              driver_core_backing_store=0) as data:
+            simulation = FlatFrontSimulation(SimpleCluster(), data, N=1,
+                                             seed=5, progress=False)
+            self.assertEqual(cluster.stations[1].gps_offset,
+                             simulation.cluster.stations[1].gps_offset)
+
+    def test_reproducible(self):
+        events = [self.get_events(self.run_simulation(filename, 2), 2)
+                  for filename in ['parallel1.h5', 'parallel2.h5']]
+        for name in ['t1', 't2', 't_trigger', 'ext_timestamp']:
+            testing.assert_array_equal(events[0][name], events[1][name])
+
+
 if __name__ == '__main__':
     unittest.main()
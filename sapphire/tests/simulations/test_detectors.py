@@ -37,6 +37,10 @@ class HiSPARCSimulationTest(unittest.TestCase):
         self.assertEqual(self.simulation.simulate_gps_uncertainty(),
                          7.3095541364845875)
 
+    def test_simulate_gps_uncertainties(self):
+        np.testing.assert_allclose(self.simulation.simulate_gps_uncertainties(3),
+                                   [7.3095541364845875, -2.75290386, -2.37677289])
+
     def test_simulate_adc_sampling(self):
         self.assertEqual(self.simulation.simulate_adc_sampling(0), 0)
         self.assertEqual(self.simulation.simulate_adc_sampling(.1), 2.5)
@@ -63,21 +67,58 @@ class HiSPARCSimulationTest(unittest.TestCase):
         self.assertAlmostEqual(self.simulation.simulate_detector_mips(2, .2),
                                1.8313342374)
 
+    def test_simulate_detector_mips_many(self):
+        # Same random numbers as the separate calls in
+        # test_simulate_detector_mips, no particles in the last detector
+        mips = self.simulation.simulate_detector_mips_many(
+            np.array([[1, 2, 0]]), np.array([[.5, .2, .1]]))
+        np.testing.assert_allclose(mips, [[1.1818585, 1.8313342374, 0.]])
+
     def test_generate_core_position(self):
         x, y = self.simulation.generate_core_position(500)
         self.assertAlmostEqual(x, 59.85605947801825)
         self.assertAlmostEqual(y, 317.2896993591305)
 
+    def test_generate_core_positions(self):
+        x, y = self.simulation.generate_core_positions(500, 1)
+        np.testing.assert_allclose(x, [59.85605947801825])
+        np.testing.assert_allclose(y, [317.2896993591305])
+        x, y = self.simulation.generate_core_positions(500, 100)
+        self.assertEqual(x.shape, (100,))
+        self.assertTrue(all(np.sqrt(x ** 2 + y ** 2) <= 500))
+
+    def test_generate_zeniths(self):
+        zeniths = self.simulation.generate_zeniths(3)
+        np.random.seed(1)
+        expected = [self.simulation.generate_zenith() for _ in range(3)]
+        np.testing.assert_allclose(zeniths, expected)
+
+    def test_generate_attenuated_zeniths(self):
+        zeniths = self.simulation.generate_attenuated_zeniths(3)
+        np.random.seed(1)
+        expected = [self.simulation.generate_attenuated_zenith()
+                    for _ in range(3)]
+        np.testing.assert_allclose(zeniths, expected)
+
     def test_generate_azimuth(self):
         self.assertEqual(self.simulation.generate_azimuth(),
                          -0.521366120872004)
 
+    def test_generate_azimuths(self):
+        self.assertEqual(self.simulation.generate_azimuths(1)[0],
+                         -0.521366120872004)
+
     def test_generate_energy(self):
         self.assertEqual(self.simulation.generate_energy(), 136117213526167.64)
         io = 1e17
         self.assertAlmostEqual(self.simulation.generate_energy(io, io) / io, 1.)
         self.assertEqual(self.simulation.generate_energy(alpha=-3), 100005719231473.97)
 
+    def test_generate_energies(self):
+        self.assertEqual(self.simulation.generate_energies(1)[0], 136117213526167.64)
+        energies = self.simulation.generate_energies(100, 1e15, 1e17)
+        self.assertTrue(all((energies >= 1e15) & (energies <= 1e17)))
+
 
 class ErrorlessSimulationTest(HiSPARCSimulationTest):
 
@@ -99,6 +140,9 @@ class ErrorlessSimulationTest(HiSPARCSimulationTest):
     def test_simulate_gps_uncertainty(self):
         self.assertEqual(self.simulation.simulate_gps_uncertainty(), 0)
 
+    def test_simulate_gps_uncertainties(self):
+        self.assertEqual(list(self.simulation.simulate_gps_uncertainties(3)), [0] * 3)
+
     def test_simulate_adc_sampling(self):
         self.assertEqual(self.simulation.simulate_adc_sampling(0), 0)
         self.assertEqual(self.simulation.simulate_adc_sampling(.1), .1)
@@ -115,6 +159,11 @@ class ErrorlessSimulationTest(HiSPARCSimulationTest):
         self.assertEqual(self.simulation.simulate_detector_mips(1, 0.5), 1)
         self.assertEqual(self.simulation.simulate_detector_mips(2, .2), 2)
 
+    def test_simulate_detector_mips_many(self):
+        mips = self.simulation.simulate_detector_mips_many(
+            np.array([[1, 2, 0]]), np.array([[.5, .2, .1]]))
+        np.testing.assert_array_equal(mips, [[1, 2, 0]])
+
 
 if __name__ == '__main__':
     unittest.main()
@@ -3,10 +3,11 @@ import os
 
 from mock import Mock, sentinel
 import tables
-from numpy import pi, sqrt, random, testing, arange
+from numpy import pi, sqrt, random, testing, arange, array
 
 from sapphire.clusters import SingleDiamondStation
 from sapphire.simulations import groundparticles
+from sapphire import utils
 
 
 self_path = os.path.dirname(__file__)
@@ -43,6 +44,7 @@ class GroundParticlesSimulationTest(unittest.TestCase):
 
     def test_get_particles_query_string(self):
         self.simulation.groundparticles = Mock()
+        self.simulation.max_particles_in_memory = 0
 
         # Combinations of shower parameters and detector after transformations
         shower_parameters = {'zenith': 0}
@@ -76,6 +78,93 @@ class GroundParticlesSimulationTest(unittest.TestCase):
             for d, e in zip(self.detectors, expected):
                 self.assertEqual(len(self.simulation.get_particles_in_detector(d, shower_parameters)), e)
 
+    def test_get_particles_without_grid(self):
+        self.simulation.max_particles_in_memory = 0
+        self.test_get_particles()
+        self.assertIsNone(self.simulation.get_particles_grid())
+
+    def test_get_particles_grid(self):
+        self.simulation.groundparticles = self.corsika_data.root.groundparticles
+        grid = self.simulation.get_particles_grid()
+        self.assertIsInstance(grid, groundparticles.GroundParticlesGrid)
+        self.assertIs(self.simulation.get_particles_grid(), grid)
+
+        self.simulation.groundparticles = Mock(nrows=10 ** 7)
+        self.assertIsNone(self.simulation.get_particles_grid())
+
+
+class GroundParticlesSimulationManyTest(unittest.TestCase):
+
+    def run_simulation(self, many):
+        corsika_data_path = os.path.join(self_path, 'test_data/corsika.h5')
+        with tables.open_file('groundparticles_many.h5', 'w',
+                              driver='H5FD_CORE',
+                              driver_core_backing_store=0) as data:
+            simulation = groundparticles.GroundParticlesSimulationWithoutErrors(
+                corsika_data_path, 30, SingleDiamondStation(), data, '/',
+                N=50, seed=1, progress=False)
+            if many:
+                simulation.run_many()
+            else:
+                simulation.run()
+            simulation.finish()
+            coincidences = data.root.coincidences.coincidences.read()
+            events = data.root.cluster_simulations.station_0.events.read()
+        return coincidences, events
+
+    def test_run_many(self):
+        """Without errors the showers are simulated identically"""
+
+        coincidences, events = self.run_simulation(many=False)
+        coincidences_many, events_many = self.run_simulation(many=True)
+        self.assertTrue(len(events))
+        for key in ['N', 'x', 'y', 'azimuth']:
+            testing.assert_array_equal(coincidences_many[key],
+                                       coincidences[key])
+        testing.assert_array_equal(coincidences_many['ext_timestamp'] - coincidences_many['ext_timestamp'][0],
+                                   coincidences['ext_timestamp'] - coincidences['ext_timestamp'][0])
+        for key in ['n1', 'n2', 'n3', 'n4', 't_trigger']:
+            testing.assert_allclose(events_many[key], events[key])
+        for key in ['t1', 't2', 't3', 't4']:
+            testing.assert_allclose(events_many[key], events[key], atol=1e-4)
+
+    def test_simulate_trigger_many(self):
+        simulation = groundparticles.GroundParticlesSimulation.__new__(
+            groundparticles.GroundParticlesSimulation)
+        n = array([[.6, .6, 0, 0], [.4, .4, .4, 0], [.4, .4, 0, 0]])
+        testing.assert_array_equal(
+            simulation.simulate_trigger_many({'n': n}), [True, True, False])
+        testing.assert_array_equal(
+            simulation.simulate_trigger_many({'n': n[:, :2]}),
+            [True, True, True])
+
+
+class GroundParticlesGridTest(unittest.TestCase):
+
+    def setUp(self):
+        corsika_data_path = os.path.join(self_path, 'test_data/corsika.h5')
+        self.corsika_data = tables.open_file(corsika_data_path, 'r')
+        self.groundparticles = self.corsika_data.root.groundparticles
+        leptons = self.groundparticles.read_where('(particle_id >= 2) & (particle_id <= 6)')
+        self.grid = groundparticles.GroundParticlesGrid(leptons)
+
+    def tearDown(self):
+        self.corsika_data.close()
+
+    def test_leptons(self):
+        leptons = self.groundparticles.read_where('(particle_id >= 2) & (particle_id <= 6)')
+        self.assertEqual(len(self.grid.particles), len(leptons))
+        self.assertTrue(all(self.grid.cells[:-1] <= self.grid.cells[1:]))
+
+    def test_particles_in_box(self):
+        boxes = ((-.5, .5, -.5, .5), (-3.2, 1.7, 2.1, 4.),
+                 (-10, 10, -10, 10), (1e5, 1e5 + 1, 0, 1), (0, 1, -1e5, -1e5 + 1))
+        for box in boxes:
+            query = ('(x >= %r) & (x <= %r) & (y >= %r) & (y <= %r) & '
+                     '(particle_id >= 2) & (particle_id <= 6)' % box)
+            expected = self.groundparticles.read_where(query)
+            testing.assert_array_equal(self.grid.particles_in_box(*box), expected)
+
 
 class DetectorBoundarySimulationTest(GroundParticlesSimulationTest):
 
@@ -92,6 +181,7 @@ class DetectorBoundarySimulationTest(GroundParticlesSimulationTest):
 
     def test_get_particles_query_string(self):
         self.simulation.groundparticles = Mock()
+        self.simulation.max_particles_in_memory = 0
 
         # Combinations of shower parameters and detector after transformations
         shower_parameters = {'zenith': 0}
@@ -126,6 +216,14 @@ class DetectorBoundarySimulationTest(GroundParticlesSimulationTest):
             for d, e in zip(self.detectors, expected):
                 self.assertEqual(len(self.simulation.get_particles_in_detector(d, shower_parameters)), e)
 
+    def test_get_line_boundary_values(self):
+        combinations = ((((0, 0), (1, 1), (0, 2)), (0.0, 1.0, 2.0)),
+                        (((0, 0), (0, 1), (1, 2)), (0.0, None, 1)))
+
+        for input, expected in combinations:
+            result = self.simulation.get_line_boundary_values(*input)
+            self.assertEqual(result, expected)
+
     def test_get_line_boundary_eqs(self):
         combinations = ((((0, 0), (1, 1), (0, 2)), (0.0, 'y - 1.000000 * x', 2.0)),
                         (((0, 0), (0, 1), (1, 2)), (0.0, 'x', 1)))
@@ -154,13 +252,15 @@ class MultipleGroundParticlesSimulationTest(unittest.TestCase):
         self.simulation.min_energy = sentinel.min_energy
         self.simulation.max_energy = sentinel.max_energy
         self.simulation.progress = False
+        self.simulation.N = 5
+        self.simulation.shower_cache = utils.ArrayCache(2 ** 24)
+        self.simulation.DATA = os.path.join(self_path, 'test_data/corsika.h5')
 
     def test_finish(self):
         self.simulation.finish()
         self.simulation.cq.finish.assert_called_once_with()
 
     def test_generate_shower_parameters(self):
-        self.simulation.N = 5
         self.simulation.select_simulation = Mock()
         self.simulation.select_simulation.return_value = None
         shower_parameters = self.simulation.generate_shower_parameters()
@@ -168,6 +268,77 @@ class MultipleGroundParticlesSimulationTest(unittest.TestCase):
         self.assertEqual(self.simulation.select_simulation.call_count,
                          self.simulation.N)
 
+    def test_plan_showers(self):
+        sims = [{'id': 1}, None, {'id': 2}, {'id': 1}, {'id': 1}]
+        self.simulation.select_simulation = Mock(side_effect=sims)
+        self.simulation.cq.seeds.side_effect = lambda sims: ['seeds%d' % sim['id'] for sim in sims]
+        plan = self.simulation.plan_showers()
+        self.assertEqual(plan, [('seeds1', {'id': 1}, 3), ('seeds2', {'id': 2}, 1)])
+
+    def test_load_shower(self):
+        leptons = self.simulation.load_shower('seeds')
+        self.assertEqual(len(leptons), 6971)
+        self.assertFalse(leptons.flags.writeable)
+        self.assertIs(self.simulation.load_shower('seeds'), leptons)
+        self.assertEqual(self.simulation.shower_cache.hits, 1)
+        self.simulation.shower_cache.clear()
+        self.simulation.max_particles_in_memory = 1
+        self.assertIsNone(self.simulation.load_shower('seeds'))
+        self.assertEqual(len(self.simulation.shower_cache), 0)
+
+    def test_shared_shower_cache(self):
+        cls = groundparticles.MultipleGroundParticlesSimulation
+        simulation = cls.__new__(cls)
+        self.assertIs(simulation.shower_cache, cls.shower_cache)
+        self.assertEqual(cls.shower_cache.max_bytes, cls.SHOWER_CACHE_SIZE)
+
+    def test_generate_shower_parameters_reuse(self):
+        sim = {'zenith': 0.2, 'azimuth': 0.1, 'n_electron': 1e4,
+               'energy': 1e15, 'particle_id': 14}
+        self.simulation.plan_showers = Mock(return_value=[('seeds', sim, 2)])
+        self.simulation.n_reuse = 3
+        self.simulation.generate_core_position = Mock(return_value=(1., 2.))
+        self.simulation.generate_azimuth = Mock(return_value=0.5)
+        self.simulation._prepare_cluster_for_shower = Mock()
+        shower_parameters = list(self.simulation.generate_shower_parameters())
+        self.assertEqual(len(shower_parameters), 6)
+        timestamps = [p['ext_timestamp'] for p in shower_parameters]
+        self.assertTrue(all(t1 < t2 for t1, t2 in zip(timestamps, timestamps[1:])))
+        self.assertEqual(shower_parameters[0]['zenith'], 0.2)
+        self.assertEqual(shower_parameters[0]['size'], 1e4)
+        x, y, alpha = self.simulation._prepare_cluster_for_shower.call_args[0]
+        self.assertEqual((x, y), (1., 2.))
+        self.assertAlmostEqual(alpha, 0.4)
+        grid = self.simulation.get_particles_grid()
+        self.assertEqual(len(grid.particles), 6971)
+
+    def test_generate_shower_parameters_prefetch(self):
+        sim = {'zenith': 0.2, 'azimuth': 0.1, 'n_electron': 1e4,
+               'energy': 1e15, 'particle_id': 14}
+        self.simulation.plan_showers = Mock(return_value=[('a', sim, 1), ('b', sim, 1)])
+        self.simulation.n_reuse = 1
+        self.simulation.prefetch = True
+        self.simulation.generate_core_position = Mock(return_value=(1., 2.))
+        self.simulation.generate_azimuth = Mock(return_value=0.5)
+        self.simulation._prepare_cluster_for_shower = Mock()
+        shower_parameters = list(self.simulation.generate_shower_parameters())
+        self.assertEqual(len(shower_parameters), 2)
+        self.assertIn('a', self.simulation.shower_cache)
+        self.assertIn('b', self.simulation.shower_cache)
+
+    def test_generate_shower_parameters_large_shower(self):
+        sim = {'zenith': 0.2, 'azimuth': 0.1, 'n_electron': 1e4,
+               'energy': 1e15, 'particle_id': 14}
+        self.simulation.plan_showers = Mock(return_value=[('seeds', sim, 1)])
+        self.simulation.n_reuse = 1
+        self.simulation.max_particles_in_memory = 1
+        self.simulation.generate_core_position = Mock(return_value=(1., 2.))
+        self.simulation.generate_azimuth = Mock(return_value=0.5)
+        self.simulation._prepare_cluster_for_shower = Mock()
+        for _ in self.simulation.generate_shower_parameters():
+            self.assertIsNone(self.simulation.get_particles_grid())
+            self.assertEqual(self.simulation.groundparticles.nrows, 38710)
+
     def test_select_simulation(self):
         self.simulation.generate_zenith = lambda: 0.27  # 15.5 deg
         self.simulation.generate_energy = lambda min_e, max_e: 10 ** 16.4
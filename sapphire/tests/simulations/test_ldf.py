@@ -2,7 +2,9 @@ import unittest
 import random
 
 import numpy as np
+import tables
 
+from sapphire.clusters import SimpleCluster
 from sapphire.simulations import ldf
 
 
@@ -33,6 +35,59 @@ class BaseLdfSimulationWithoutErrorsTest(BaseLdfSimulationTest):
         self.assertEqual(self.simulation.simulate_particles_for_density(0), 0)
 
 
+class LdfSimulationManyTest(unittest.TestCase):
+
+    def setUp(self):
+        self.data = tables.open_file('ldf_many.h5', 'w', driver='H5FD_CORE',
+                                     driver_core_backing_store=0)
+
+    def tearDown(self):
+        self.data.close()
+
+    def create_simulation(self, simulation_class):
+        return simulation_class(400, 1e15, 1e17, SimpleCluster(), self.data,
+                                '/', N=5, seed=1, progress=False)
+
+    def assert_num_particles_equal(self, simulation):
+        simulation.simulate_particles_for_density = lambda p: p
+        detectors = simulation.get_detectors()
+        shower_parameters = simulation.generate_shower_parameters_many(5).next()
+        n = simulation.get_num_particles_in_detectors(detectors,
+                                                      shower_parameters)
+        self.assertEqual(n.shape, (5, 16))
+        for i in range(5):
+            parameters = {key: shower_parameters[key][i]
+                          for key in ['zenith', 'azimuth', 'size']}
+            parameters['core_pos'] = [core[i] for core in shower_parameters['core_pos']]
+            expected = [simulation.get_num_particles_in_detector(detector, parameters)
+                        for detector in detectors]
+            np.testing.assert_allclose(n[i], expected, rtol=1e-12)
+
+    def test_get_num_particles_in_detectors(self):
+        self.assert_num_particles_equal(self.create_simulation(ldf.NkgLdfSimulation))
+
+    def test_ellips_get_num_particles_in_detectors(self):
+        self.assert_num_particles_equal(self.create_simulation(ldf.EllipsLdfSimulation))
+
+    def test_generate_shower_parameters_many(self):
+        simulation = self.create_simulation(ldf.EllipsLdfSimulation)
+        batches = list(simulation.generate_shower_parameters_many(2))
+        self.assertEqual([len(batch['zenith']) for batch in batches], [2, 2, 1])
+        self.assertEqual(batches[2]['ext_timestamp'][0], (int(1e9) + 4) * int(1e9))
+        self.assertTrue(all(batches[0]['zenith'] > 0))
+
+    def test_run_many(self):
+        simulation = self.create_simulation(ldf.NkgLdfSimulationWithoutErrors)
+        simulation.run_many(batch_size=2)
+        coincidences = self.data.root.coincidences.coincidences.read()
+        np.testing.assert_array_equal(coincidences['id'], range(5))
+        np.testing.assert_array_equal(coincidences['N'], [4] * 5)
+        events = self.data.root.cluster_simulations.station_0.events.read()
+        self.assertEqual(len(events), 5)
+        self.assertTrue(all(events['n1'] > 0))
+        self.assertTrue(all(events['t1'] == -1))
+
+
 class BaseLdfTest(unittest.TestCase):
 
     def setUp(self):
@@ -0,0 +1,89 @@
+import unittest
+
+import numpy as np
+import tables
+
+from sapphire.clusters import SimpleCluster
+from sapphire.simulations import showerfront
+
+
+class FlatFrontSimulationManyTest(unittest.TestCase):
+
+    def setUp(self):
+        self.data = tables.open_file('showerfront_many.h5', 'w',
+                                     driver='H5FD_CORE',
+                                     driver_core_backing_store=0)
+        self.simulation = showerfront.FlatFrontSimulationWithoutErrors(
+            SimpleCluster(), self.data, '/', N=5, seed=1, progress=False)
+
+    def tearDown(self):
+        self.data.close()
+
+    def test_get_arrival_times(self):
+        detectors = self.simulation.get_detectors()
+        shower_parameters = self.simulation.generate_shower_parameters_many(5).next()
+        t = self.simulation.get_arrival_times(detectors, shower_parameters)
+        self.assertEqual(t.shape, (5, 16))
+        for i in range(5):
+            parameters = {'azimuth': shower_parameters['azimuth'][i],
+                          'zenith': shower_parameters['zenith'][i]}
+            expected = [self.simulation.get_arrival_time(detector, parameters)
+                        for detector in detectors]
+            np.testing.assert_allclose(t[i], expected, rtol=1e-12, atol=1e-12)
+
+    def test_run_many(self):
+        self.simulation.run_many(batch_size=2)
+        coincidences = self.data.root.coincidences.coincidences.read()
+        np.testing.assert_array_equal(coincidences['N'], [4] * 5)
+        events = self.data.root.cluster_simulations.station_0.events.read()
+        t = np.array([events['t%d' % i] for i in range(1, 5)])
+        # Arrival times are relative to the first detector
+        np.testing.assert_allclose(t.min(axis=0), 0.)
+        np.testing.assert_allclose(np.sort(t, axis=0)[1], events['t_trigger'])
+        np.testing.assert_array_equal(events['ext_timestamp'] // int(1e9),
+                                      events['timestamp'])
+
+
+class ConeFrontSimulationTest(unittest.TestCase):
+
+    def setUp(self):
+        self.data = tables.open_file('coneshowerfront.h5', 'w',
+                                     driver='H5FD_CORE',
+                                     driver_core_backing_store=0)
+        self.simulation = showerfront.ConeFrontSimulation(
+            100, SimpleCluster(), self.data, '/', N=5, seed=1,
+            progress=False)
+
+    def tearDown(self):
+        self.data.close()
+
+    def test_generate_shower_parameters_many(self):
+        batches = list(self.simulation.generate_shower_parameters_many(2))
+        self.assertEqual(len(batches), 5)
+        x, y = batches[-1]['core_pos']
+        self.assertEqual(len(x), 1)
+        # The cluster is moved for each shower
+        self.assertAlmostEqual(self.simulation.cluster.x ** 2 +
+                               self.simulation.cluster.y ** 2,
+                               x[0] ** 2 + y[0] ** 2)
+
+    def test_get_arrival_times(self):
+        detectors = self.simulation.get_detectors()
+        for shower_parameters in self.simulation.generate_shower_parameters_many(1):
+            t = self.simulation.get_arrival_times(detectors, shower_parameters)
+            self.assertEqual(t.shape, (1, 16))
+            parameters = {'azimuth': shower_parameters['azimuth'][0],
+                          'zenith': shower_parameters['zenith'][0]}
+            expected = [self.simulation.get_arrival_time(detector, parameters)
+                        for detector in detectors]
+            np.testing.assert_allclose(t[0], expected, rtol=1e-12, atol=1e-12)
+
+    def test_run_many(self):
+        self.simulation.run_many()
+        coincidences = self.data.root.coincidences.coincidences.read()
+        np.testing.assert_array_equal(coincidences['N'], [4] * 5)
+        np.testing.assert_array_equal(coincidences['id'], range(5))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -7,6 +7,7 @@ from os import path, extsep
 from mock import patch, sentinel
 
 from sapphire import api
+from sapphire.utils import trace_cache
 
 STATION = 501
 
@@ -306,6 +307,7 @@ class StaleNetworkTests(NetworkTests):
 class StationTests(unittest.TestCase):
     def setUp(self):
         self.station = api.Station(STATION, force_fresh=True, force_stale=False)
+        trace_cache.clear()
 
     @patch.object(api.API, '_retrieve_url')
     def test_no_stale_station(self, mock_retrieve_url):
@@ -400,6 +402,10 @@ class StationTests(unittest.TestCase):
         trace = '[%s]' % ', '.join(str(v) for v in range(200, 211))
         mock_urlopen.return_value.read.return_value = '[%s]' % ', '.join(4 * [trace])
         self.assertEqual(self.station.event_trace(1378771205, 571920029, raw=True)[3][9], 209)
+        # Cached traces are reused
+        self.assertEqual(self.station.event_trace(1378771205, 571920029)[3][9], 9)
+        self.assertEqual(mock_urlopen.call_count, 2)
+        self.assertEqual(trace_cache.hits, 1)
 
     def test_event_time(self):
         names = ('timestamp', 'counts')
@@ -575,6 +581,7 @@ class StationTests(unittest.TestCase):
 class StaleStationTests(StationTests):
     def setUp(self):
         self.station = api.Station(STATION, force_stale=True)
+        trace_cache.clear()
 
     def test_detectors(self):
         keys = ['alpha', 'beta', 'radius', 'height']
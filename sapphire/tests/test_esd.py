@@ -1,13 +1,23 @@
 import os
 import unittest
+import datetime
+import threading
+import urllib2
+import urlparse
+import calendar
+import itertools
+from BaseHTTPServer import HTTPServer, BaseHTTPRequestHandler
+from SocketServer import ThreadingMixIn
 
 from mock import patch, ANY, sentinel, MagicMock
+from numpy.testing import assert_array_equal
 import tables
 
 from sapphire import esd, api
 from sapphire.tests.validate_results import validate_results
 
-from esd_load_data import (create_tempfile_path,
+from esd_load_data import (create_tempfile_path, events_source,
+                           coincidences_source,
                            test_data_path, test_data_coincidences_path,
                            perform_load_data, perform_load_coincidences,
                            perform_esd_download_data,
@@ -105,6 +115,32 @@ class ESDTest(unittest.TestCase):
         validate_results(self, test_data_coincidences_path, output_path)
         os.remove(output_path)
 
+    @patch.object(esd, 'BLOCK_SIZE', 7)
+    def test_load_data_output_small_blocks(self):
+        """Load data tsv in many small blocks and verify the output"""
+
+        output_path = create_tempfile_path()
+        perform_load_data(output_path)
+        validate_results(self, test_data_path, output_path)
+        os.remove(output_path)
+
+    def test__parse_tsv_lines(self):
+        """Check parsing of TSV lines, skipping comments and extra columns"""
+
+        lines = ['# comment\n',
+                 '2012-01-01\t00:00:00\t1325376000\t10\t-999\n',
+                 '\n',
+                 '2012-01-01\t00:00:01\t1325376001\t1.5\t2\n']
+        values = esd._parse_tsv_lines(lines, 3)
+        self.assertEqual(values.tolist(), [[1325376000, 10, -999],
+                                           [1325376001, 1.5, 2]])
+        values = esd._parse_tsv_lines(lines, 2)
+        self.assertEqual(values.tolist(), [[1325376000, 10],
+                                           [1325376001, 1.5]])
+        self.assertEqual(esd._parse_tsv_lines(lines[:1], 3).shape, (0, 3))
+        self.assertRaises(ValueError, esd._parse_tsv_lines,
+                          lines + ['2012-01-01\t00:00:02\t13253'], 3)
+
     @patch.object(esd, 'download_data')
     @patch.object(tables, 'open_file')
     def test_quick_download(self, mock_open_file, mock_download_data):
@@ -135,5 +171,311 @@ class ESDTest(unittest.TestCase):
         os.remove(output_path)
 
 
+class StandInServer(ThreadingMixIn, HTTPServer):
+
+    daemon_threads = True
+
+
+class StandInRequestHandler(BaseHTTPRequestHandler):
+
+    """Serve a test TSV file for every request
+
+    If the server has a `timestamp_column`, only data lines within the
+    requested interval are served. The first `failures` requests get the
+    response `failure`, which is either an HTTP status code or 'incomplete'
+    for a download which stops halfway. The first `redirects` requests are
+    redirected to the same path with a '/moved' prefix.
+
+    """
+
+    protocol_version = 'HTTP/1.1'
+
+    def do_GET(self):
+        server = self.server
+        server.requests.append(self.path)
+        if len(server.requests) <= server.redirects:
+            self.send_response(302)
+            self.send_header('Location', '/moved' + self.path)
+            self.send_header('Content-Length', '0')
+            self.end_headers()
+            return
+        with open(server.source, 'rb') as source:
+            lines = source.readlines()
+        if server.timestamp_column is not None:
+            query = urlparse.parse_qs(urlparse.urlsplit(self.path).query)
+            t_start, t_end = [
+                calendar.timegm(datetime.datetime.strptime(
+                    query[key][0], '%Y-%m-%d %H:%M:%S').utctimetuple())
+                for key in ['start', 'end']]
+            lines = [line for line in lines if line.startswith('#') or
+                     t_start <= int(line.split('\t')[server.timestamp_column])
+                     < t_end]
+        if len(server.requests) <= server.failures:
+            if server.failure == 'incomplete':
+                n_data = sum(not line.startswith('#') for line in lines)
+                lines = lines[:-(n_data // 2) - 1]
+            else:
+                self.send_error(server.failure)
+                return
+        tsv = ''.join(lines)
+        self.send_response(200)
+        self.send_header('Content-Length', str(len(tsv)))
+        self.end_headers()
+        self.wfile.write(tsv)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class StandInServerTestCase(unittest.TestCase):
+
+    """Run a stand-in for the data server, and use it for downloads"""
+
+    def setUp(self):
+        self.server = StandInServer(('127.0.0.1', 0), StandInRequestHandler)
+        self.server.source = events_source
+        self.server.timestamp_column = None
+        self.server.requests = []
+        self.server.failures = 0
+        self.server.failure = None
+        self.server.redirects = 0
+        thread = threading.Thread(target=self.server.serve_forever)
+        thread.daemon = True
+        thread.start()
+        base = 'http://127.0.0.1:%d/data/' % self.server.server_port
+        for name, url in [
+                ('EVENTS_URL', '{station_number:d}/events/?{query}'),
+                ('COINCIDENCES_URL', 'network/coincidences/?{query}')]:
+            patcher = patch.object(esd, name, base + url)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        self.output_path = create_tempfile_path()
+
+    def tearDown(self):
+        self.server.shutdown()
+        self.server.server_close()
+        os.remove(self.output_path)
+
+
+@patch.object(esd, 'RETRY_DELAY', 0)
+class DownloadManyTests(StandInServerTestCase):
+
+    def setUp(self):
+        super(DownloadManyTests, self).setUp()
+        self.start = datetime.datetime(2012, 1, 1)
+        self.end = datetime.datetime(2012, 1, 3)
+
+    def download_many(self, stations, n_workers=3):
+        with tables.open_file(self.output_path, 'w') as data:
+            esd.download_many(data, stations, self.start, self.end,
+                              n_workers=n_workers, progress=False)
+            return {station: data.get_node('/s%d' % station, 'events').read()
+                    for station in stations}
+
+    def test_download_many(self):
+        with tables.open_file(test_data_path, 'r') as expected_data:
+            expected = expected_data.root.events.read()
+        events = self.download_many([501, 502, 503])
+        self.assertEqual(len(self.server.requests), 6)
+        for station_events in events.values():
+            n = len(expected)
+            self.assertEqual(len(station_events), 2 * n)
+            self.assertEqual(list(station_events['event_id']), range(2 * n))
+            for column in ['ext_timestamp', 'pulseheights', 't_trigger']:
+                self.assertEqual(station_events[column][:n].tolist(),
+                                 expected[column].tolist())
+                self.assertEqual(station_events[column][n:].tolist(),
+                                 expected[column].tolist())
+
+    def test_retry_server_errors(self):
+        self.server.failures = 2
+        self.server.failure = 500
+        events = self.download_many([501], n_workers=1)
+        self.assertEqual(len(self.server.requests), 4)
+        self.assertEqual(len(events[501]), 78)
+
+    def test_retry_incomplete_download(self):
+        self.server.failures = 1
+        self.server.failure = 'incomplete'
+        events = self.download_many([501], n_workers=1)
+        self.assertEqual(len(self.server.requests), 3)
+        self.assertEqual(len(events[501]), 78)
+
+    def test_give_up(self):
+        self.end = datetime.datetime(2012, 1, 2)
+        self.server.failures = esd.MAX_ATTEMPTS
+        self.server.failure = 503
+        self.assertRaises(urllib2.HTTPError, self.download_many, [501])
+        self.assertEqual(len(self.server.requests), esd.MAX_ATTEMPTS)
+
+    def test_client_error_not_retried(self):
+        self.end = datetime.datetime(2012, 1, 2)
+        self.server.failures = 1
+        self.server.failure = 404
+        self.assertRaises(urllib2.HTTPError, self.download_many, [501], 1)
+        self.assertEqual(len(self.server.requests), 1)
+
+    def test_follow_redirects(self):
+        self.end = datetime.datetime(2012, 1, 2)
+        self.server.redirects = 2
+        events = self.download_many([501], n_workers=1)
+        self.assertEqual(len(self.server.requests), 3)
+        self.assertTrue(self.server.requests[2].startswith('/moved/moved/'))
+        self.assertEqual(len(events[501]), 39)
+
+    def test_too_many_redirects(self):
+        self.end = datetime.datetime(2012, 1, 2)
+        self.server.redirects = esd.MAX_REDIRECTS + 1
+        self.assertRaises(urllib2.HTTPError, self.download_many, [501], 1)
+        self.assertEqual(len(self.server.requests), esd.MAX_REDIRECTS + 1)
+
+
+@patch.object(esd, 'BLOCK_SIZE', 5)
+class ResumeDownloadTests(StandInServerTestCase):
+
+    def setUp(self):
+        super(ResumeDownloadTests, self).setUp()
+        self.server.timestamp_column = 2
+        self.start = datetime.datetime(2012, 1, 1)
+        self.end = datetime.datetime(2012, 1, 1, 0, 1)
+        self.data = tables.open_file(self.output_path, 'w')
+        self.addCleanup(self.data.close)
+        with tables.open_file(test_data_path, 'r') as expected_data:
+            self.expected = expected_data.root.events.read()
+
+    def download_data(self, **kwargs):
+        esd.download_data(self.data, '/s501', 501, self.start, self.end,
+                          progress=False, **kwargs)
+        return self.data.root.s501.events.read()
+
+    def assert_events_equal(self, actual, expected):
+        self.assertEqual(len(actual), len(expected))
+        for column in expected.dtype.names:
+            assert_array_equal(actual[column], expected[column])
+
+    def test_resume(self):
+        self.server.failures = 1
+        self.server.failure = 'incomplete'
+        self.assertRaises(Exception, self.download_data)
+        checkpoint = esd._get_checkpoint(self.data.root.s501, 'events_s501')
+        self.assertGreater(checkpoint['timestamp'], 1325376000)
+        self.assertLess(checkpoint['rows']['/s501/events'],
+                        len(self.expected))
+
+        events = self.download_data()
+        self.assertEqual(len(self.server.requests), 2)
+        self.assertNotIn('00%3A00%3A00', self.server.requests[1].split('&')[0])
+        self.assert_events_equal(events, self.expected)
+        self.assertNotIn('download_checkpoints', self.data.root.s501._v_attrs)
+
+    def test_different_interval_not_resumed(self):
+        self.server.failures = 1
+        self.server.failure = 'incomplete'
+        self.assertRaises(Exception, self.download_data)
+        n = len(self.data.root.s501.events)
+        self.start = datetime.datetime(2012, 1, 1, 0, 0, 30)
+        events = self.download_data()
+        self.assertEqual(len(events), n + sum(self.expected['timestamp'] >=
+                                              1325376030))
+
+    def test_update(self):
+        self.end = datetime.datetime(2012, 1, 1, 0, 0, 30)
+        self.download_data()
+        self.end = datetime.datetime(2012, 1, 1, 0, 1)
+        events = self.download_data(update=True)
+        self.assertIn('00%3A00%3A29', self.server.requests[1].split('&')[0])
+        self.assert_events_equal(events, self.expected)
+
+        # Nothing new to download
+        self.end = datetime.datetime(2012, 1, 1, 0, 0, 50)
+        self.download_data(update=True)
+        self.assertEqual(len(self.server.requests), 2)
+        self.assert_events_equal(self.data.root.s501.events.read(),
+                                 self.expected)
+
+
+@patch.object(esd, 'CHECKPOINT_INTERVAL', 0)
+class ResumeDownloadCoincidencesTests(StandInServerTestCase):
+
+    def setUp(self):
+        super(ResumeDownloadCoincidencesTests, self).setUp()
+        self.server.source = coincidences_source
+        self.server.timestamp_column = 4
+        self.start = datetime.datetime(2016, 3, 10)
+        self.end = datetime.datetime(2016, 3, 10, 0, 1)
+
+    def download_coincidences(self, **kwargs):
+        with tables.open_file(self.output_path, 'a') as data:
+            esd.download_coincidences(data, stations=[501, 510],
+                                      start=self.start, end=self.end,
+                                      progress=False, **kwargs)
+
+    def test_resume(self):
+        self.server.failures = 1
+        self.server.failure = 'incomplete'
+        self.assertRaises(Exception, self.download_coincidences)
+        with tables.open_file(self.output_path, 'r') as data:
+            checkpoint = esd._get_checkpoint(data.root.coincidences,
+                                             'coincidences')
+            self.assertGreater(checkpoint['timestamp'], 1457568000)
+            self.assertGreater(len(data.root.coincidences.coincidences),
+                               checkpoint['rows']['/coincidences/'
+                                                  'coincidences'])
+        self.download_coincidences()
+        self.assertNotIn('00%3A00%3A00', self.server.requests[1])
+        validate_results(self, test_data_coincidences_path, self.output_path)
+
+    def test_resume_same_second(self):
+        """Resume with several coincidences in the same second
+
+        The checkpoints are only committed at some of the coincidences in a
+        second, which must not include earlier coincidences of that second
+        in the checkpoint rows.
+
+        """
+        self.server.source = create_tempfile_path()
+        self.addCleanup(os.remove, self.server.source)
+        with open(coincidences_source) as source, \
+                open(self.server.source, 'w') as tsv:
+            for line in source:
+                if not line.startswith('#'):
+                    fields = line.split('\t')
+                    fields[4] = str(1457568000 + int(fields[0]) // 2)
+                    line = '\t'.join(fields)
+                tsv.write(line)
+        expected_path = create_tempfile_path()
+        self.addCleanup(os.remove, expected_path)
+        with tables.open_file(expected_path, 'w') as data:
+            esd.load_coincidences(data, self.server.source)
+
+        self.server.failures = 1
+        self.server.failure = 'incomplete'
+        with patch.object(esd, 'time') as mock_time, \
+                patch.object(esd, 'CHECKPOINT_INTERVAL', 1):
+            mock_time.time.side_effect = itertools.count(0, .25)
+            self.assertRaises(Exception, self.download_coincidences)
+            self.download_coincidences()
+        validate_results(self, expected_path, self.output_path)
+
+    def test_update(self):
+        self.end = datetime.datetime(2016, 3, 10, 0, 0, 30)
+        self.download_coincidences()
+        self.end = datetime.datetime(2016, 3, 10, 0, 1)
+        self.download_coincidences(update=True)
+        self.assertNotIn('00%3A00%3A00', self.server.requests[1])
+        validate_results(self, test_data_coincidences_path, self.output_path)
+
+
+class SplitInDaysTests(unittest.TestCase):
+
+    def test_split_in_days(self):
+        start = datetime.datetime(2016, 1, 1, 12)
+        end = datetime.datetime(2016, 1, 3)
+        self.assertEqual(esd._split_in_days(start, end),
+                         [(start, datetime.datetime(2016, 1, 2, 12)),
+                          (datetime.datetime(2016, 1, 2, 12), end)])
+        self.assertEqual(esd._split_in_days(end, end), [])
+
+
 if __name__ == '__main__':
     unittest.main()
@@ -2,7 +2,7 @@ import unittest
 import types
 from StringIO import StringIO
 
-from numpy import pi, random, exp, sqrt
+from numpy import pi, random, exp, sqrt, arange, zeros
 import progressbar
 
 from sapphire import utils
@@ -204,5 +204,67 @@ class WhichTests(unittest.TestCase):
                           'a_very_unlikely_program_name_to_exist_cosmic_ray')
 
 
+class ArrayCacheTests(unittest.TestCase):
+
+    """Check the generic LRU array cache"""
+
+    def test_stats(self):
+        cache = utils.ArrayCache(max_bytes=100)
+        cache.put('a', arange(4, dtype='int8'))
+        cache.get('b')
+        self.assertEqual(cache.stats(),
+                         {'hits': 0, 'misses': 1, 'evictions': 0, 'arrays': 1,
+                          'size': 5, 'max_bytes': 100})
+
+
+class TraceCacheTests(unittest.TestCase):
+
+    """Check the LRU trace cache"""
+
+    def setUp(self):
+        self.cache = utils.TraceCache(max_bytes=100)
+
+    def test_get_and_put(self):
+        self.assertIsNone(self.cache.get('a'))
+        trace = self.cache.put('a', arange(4, dtype='int16'))
+        self.assertFalse(trace.flags.writeable)
+        self.assertIs(self.cache.get('a'), trace)
+        self.assertIn('a', self.cache)
+        self.assertEqual(self.cache.stats(),
+                         {'hits': 1, 'misses': 1, 'evictions': 0, 'traces': 1,
+                          'size': 9, 'max_bytes': 100})
+
+    def test_least_recently_used_is_evicted(self):
+        for key in [(1,), (2,), (3,)]:
+            self.cache.put(key, zeros(30, dtype='int8'))
+        self.cache.get((1,))
+        self.cache.put((4,), zeros(30, dtype='int8'))
+        self.assertIn((1,), self.cache)
+        self.assertNotIn((2,), self.cache)
+        self.assertEqual(len(self.cache), 3)
+        self.assertEqual(self.cache.evictions, 1)
+        self.assertEqual(self.cache.size, 90)
+        # Replacing a trace does not evict other traces
+        self.cache.put((4,), zeros(40, dtype='int8'))
+        self.assertEqual(len(self.cache), 3)
+        self.assertEqual(self.cache.size, 100)
+
+    def test_too_large_and_disabled(self):
+        self.cache.put('a', zeros(200, dtype='int8'))
+        self.assertEqual(len(self.cache), 0)
+        self.cache.max_bytes = 0
+        self.cache.put('b', zeros(1, dtype='int8'))
+        self.assertEqual(len(self.cache), 0)
+        self.assertEqual(self.cache.size, 0)
+
+    def test_clear(self):
+        self.cache.put('a', zeros(2))
+        self.cache.get('a')
+        self.cache.clear()
+        self.assertEqual(self.cache.stats(),
+                         {'hits': 0, 'misses': 0, 'evictions': 0, 'traces': 0,
+                          'size': 0, 'max_bytes': 100})
+
+
 if __name__ == '__main__':
     unittest.main()
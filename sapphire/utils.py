@@ -7,7 +7,9 @@ from __future__ import division
 
 from functools import wraps
 from bisect import bisect_right
+from collections import OrderedDict
 from distutils.spawn import find_executable
+from threading import Lock
 
 from numpy import floor, ceil, round, arcsin, sin, pi, sqrt
 from scipy.stats import norm
@@ -22,6 +24,9 @@ ERR = [-1, -999]
 #: Speed of light in vacuum in m / ns.
 c = 0.299792458
 
+#: Default memory budget of the trace cache in bytes.
+TRACE_CACHE_SIZE = 128 * 2 ** 20
+
 
 def pbar(iterable, length=None, show=True, **kwargs):
     """Get a new progressbar with our default widgets
@@ -179,3 +184,152 @@ def memoize(obj):
             cache[key] = obj(*args, **kwargs)
         return cache[key]
     return memoizer
+
+
+class ArrayCache(object):
+
+    """Least recently used cache of NumPy arrays with a memory budget
+
+    When the total size of the cached arrays exceeds the memory budget,
+    the least recently used arrays are evicted.
+
+    The cached arrays are made read-only, because they are shared by all
+    users of the cache.
+
+    """
+
+    def __init__(self, max_bytes):
+        """Initialize the cache
+
+        :param max_bytes: memory budget in bytes, use 0 to disable caching.
+
+        """
+        self.max_bytes = max_bytes
+        self._arrays = OrderedDict()
+        self._lock = Lock()
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def __len__(self):
+        return len(self._arrays)
+
+    def __contains__(self, key):
+        return key in self._arrays
+
+    def get(self, key):
+        """Get an array from the cache
+
+        :param key: key of the array.
+        :return: the array, or None if the array is not cached.
+
+        """
+        with self._lock:
+            try:
+                array = self._arrays.pop(key)
+            except KeyError:
+                self.misses += 1
+                return None
+            self._arrays[key] = array
+            self.hits += 1
+            return array
+
+    def put(self, key, array):
+        """Store an array in the cache
+
+        :param key: key of the array.
+        :param array: the NumPy array.
+        :return: the (read-only) array.
+
+        """
+        array.flags.writeable = False
+        size = self._sizeof(key, array)
+        with self._lock:
+            if key in self._arrays:
+                self.size -= self._sizeof(key, self._arrays.pop(key))
+            if size <= self.max_bytes:
+                self._arrays[key] = array
+                self.size += size
+            while self.size > self.max_bytes:
+                old_key, old_array = self._arrays.popitem(last=False)
+                self.size -= self._sizeof(old_key, old_array)
+                self.evictions += 1
+        return array
+
+    def clear(self):
+        """Remove all arrays from the cache and reset the statistics"""
+
+        with self._lock:
+            self._arrays.clear()
+            self.size = 0
+            self.hits = 0
+            self.misses = 0
+            self.evictions = 0
+
+    def stats(self):
+        """Get the cache statistics
+
+        :return: dictionary with the number of hits, misses and evictions,
+            the number of cached arrays and their size in bytes, and the
+            memory budget.
+
+        """
+        return {'hits': self.hits, 'misses': self.misses,
+                'evictions': self.evictions, 'arrays': len(self._arrays),
+                'size': self.size, 'max_bytes': self.max_bytes}
+
+    @staticmethod
+    def _sizeof(key, array):
+        """Approximate memory used by a cached array, including its key"""
+
+        if isinstance(key, str):
+            return array.nbytes + len(key)
+        return array.nbytes
+
+
+class TraceCache(ArrayCache):
+
+    """Cache for decoded traces with a memory budget
+
+    Decoding traces is expensive, so decoded traces are kept in this cache
+    for reuse.  When the total size of the cached traces exceeds the
+    memory budget, the least recently used traces are evicted.
+
+    The cached traces are NumPy arrays which are made read-only, because
+    they are shared by all users of the cache.
+
+    The cache used by SAPPHiRE is available as :data:`trace_cache`, the
+    statistics can be inspected using :meth:`stats`::
+
+        >>> from sapphire.utils import trace_cache
+        >>> trace_cache.max_bytes = 512 * 2 ** 20
+        >>> trace_cache.stats()
+        {'hits': 0, 'misses': 0, 'evictions': 0, 'traces': 0, 'size': 0,
+         'max_bytes': 536870912}
+
+    """
+
+    def __init__(self, max_bytes=TRACE_CACHE_SIZE):
+        """Initialize the cache
+
+        :param max_bytes: memory budget in bytes, use 0 to disable caching.
+
+        """
+        super(TraceCache, self).__init__(max_bytes)
+
+    def stats(self):
+        """Get the cache statistics
+
+        :return: dictionary with the number of hits, misses and evictions,
+            the number of cached traces and their size in bytes, and the
+            memory budget.
+
+        """
+        stats = super(TraceCache, self).stats()
+        stats['traces'] = stats.pop('arrays')
+        return stats
+
+
+#: The trace cache shared by SAPPHiRE.
+trace_cache = TraceCache()
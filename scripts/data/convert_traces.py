@@ -0,0 +1,38 @@
+#!/usr/bin/env python
+
+"""Convert the trace blobs in a HDF5 file to a binary trace store
+
+Use this script to add a trace store to station groups which contain
+``blobs`` with traces.  Reading traces from the trace store is much
+faster than decoding them from the blobs.  The blobs are not removed.
+
+Usage::
+
+    ./convert_traces.py data.h5 /s501 /s502
+
+"""
+import argparse
+
+import tables
+
+from sapphire.analysis.trace_store import convert_blobs
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Convert trace blobs to a '
+                                                 'binary trace store.')
+    parser.add_argument('path', help='path to the HDF5 file')
+    parser.add_argument('groups', nargs='+',
+                        help='station groups containing the blobs')
+    parser.add_argument('--overwrite', action='store_true',
+                        help='replace existing trace stores')
+    args = parser.parse_args()
+
+    with tables.open_file(args.path, 'a') as data:
+        for group in args.groups:
+            print 'Converting traces in %s' % group
+            convert_blobs(data, group, overwrite=args.overwrite)
+
+
+if __name__ == '__main__':
+    main()
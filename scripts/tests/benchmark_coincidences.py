@@ -0,0 +1,77 @@
+#!/usr/bin/env python
+
+"""Benchmark the coincidence search
+
+This script compares the search using NumPy arrays, which reads all
+timestamps at once, with the search which reads the event tables in chunks.
+Both are run on the same simulated event tables and the results are checked
+to be identical.
+
+"""
+import os
+import tempfile
+import time
+
+import numpy as np
+import tables
+
+from sapphire.analysis.coincidences import Coincidences
+
+
+N_STATIONS = 5
+N_EVENTS = 200000
+RATE = 0.7  # events per second per station
+WINDOW = 10000
+CHUNKSIZE = 10000
+
+
+def create_data(path):
+    """Create event tables with random ext_timestamps for several stations"""
+
+    np.random.seed(1)
+    station_groups = []
+    with tables.open_file(path, 'w') as data:
+        for station in range(N_STATIONS):
+            intervals = np.random.exponential(1e9 / RATE, size=N_EVENTS)
+            ext_timestamps = (np.uint64(1400000000000000000) +
+                              np.cumsum(intervals).astype(np.uint64))
+            events = np.zeros(N_EVENTS, dtype=[('ext_timestamp', np.uint64)])
+            events['ext_timestamp'] = ext_timestamps
+            group = '/s%d' % station
+            data.create_table(group, 'events', events, createparents=True)
+            station_groups.append(group)
+    return station_groups
+
+
+def main():
+    fd, path = tempfile.mkstemp(suffix='.h5')
+    os.close(fd)
+    try:
+        station_groups = create_data(path)
+        with tables.open_file(path, 'r') as data:
+            coin = Coincidences(data, None, station_groups, progress=False)
+            event_tables = [data.get_node(group, 'events')
+                            for group in station_groups]
+
+            t0 = time.time()
+            timestamps, _, _ = coin._retrieve_timestamp_arrays(event_tables)
+            result = coin._do_search_coincidences_arrays(timestamps, WINDOW)
+            t_arrays = time.time() - t0
+
+            t0 = time.time()
+            chunked = []
+            for _, _, _, c in coin._search_coincidences_in_chunks(
+                    WINDOW, chunksize=CHUNKSIZE):
+                chunked.extend(c)
+            t_chunks = time.time() - t0
+    finally:
+        os.remove(path)
+
+    assert chunked == result
+    print "%d events, %d coincidences" % (len(timestamps), len(result))
+    print "arrays: %.2f s" % t_arrays
+    print "chunks of %d events: %.2f s" % (CHUNKSIZE, t_chunks)
+
+
+if __name__ == '__main__':
+    main()